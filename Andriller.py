@@ -21,212 +21,221 @@
 
 import sys
 import os
+import argparse
 import time
 import re
 import hashlib
+import zlib
+import threading
+import queue
+import tarfile
+import mmap
+import random
+import struct
+import shutil
+import heapq
+import csv
+import html
+import tempfile
 import sqlite3 as sq
-from json import loads
+from json import loads, load, dump, dumps
 from binascii import hexlify
+from itertools import groupby
 from datetime import datetime
 from datetime import timedelta
+from datetime import timezone
+from functools import lru_cache
 from subprocess import check_output as co
 from subprocess import call
+from subprocess import Popen, PIPE, STDOUT
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+from urllib.request import pathname2url
 
 # Setting variables
 ANDRILLER_VERSION = "alpha-1.1.0"
 A_BUILD_DATE = "07/11/2013"
-
-# Intro info
-print("\033[93m>>>>>>>>>> Andriller version: %s\033[0m" % ANDRILLER_VERSION)
-print("\033[93m>>>>>>>>>> Build date: %s\033[0m" % A_BUILD_DATE)
-print("\033[93m>>>>>>>>>> http://android.saz.lt\033[0m")
+DL_WORKERS = 4		# Databases pulled and hashed concurrently
+ACQ_MODE = 'stream'	# 'stream': one tar pipe over exec-out; 'staged': per-file copy via /data/local/tmp;
+					# 'chunked': verified byte ranges over exec-out, resumable
+CHUNK_SIZE = 1048576	# Read size when copying and hashing acquired files
 
 REPORT = []		# List to be populated for generating the REPORT.html file
 
-# Check OS and define adb
-download_adb = ' ERROR! \n\'./adb\' file is not present!\n Download it from http://android.saz.lt/download/adb.zip; \n Unzip, and place them into this directory;\n Run the program again.'
-OS_CHECK = sys.platform
-if OS_CHECK == 'linux' or OS_CHECK == 'linux2':
-	if call(['which', 'adb']) == 0:
-		ADB = "adb"
-		SEP = '/'
-	else:
-		ADB = './adb'
-		SEP = '/'
-		if os.path.isfile(ADB) == True:
-			os.chmod(ADB, '0755')
-		else:
-			sys.exit(download_adb)
-elif OS_CHECK == 'win32':
-	ADB = "adb.exe"
+# Path separator
+if sys.platform == 'win32':
 	SEP = '\\'
-	if os.path.isfile(ADB) == False:
-		sys.exit(download_adb)
-elif OS_CHECK == 'darwin':
-	ADB = "./adb_mac"
+else:
 	SEP = '/'
-	if os.path.isfile(ADB) == False:
-		sys.exit(download_adb)
-try:
-	ADB; co([ADB, 'start-server'])
-except NameError:
-	sys.exit(" Cannot determine OS!")
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
-# Unrooted (shell) devices, to print device information, limited extractions 
+# ADB SESSION
+# Keeps one 'adb shell' (or 'su' shell) open and sends commands over its stdin,
+# instead of starting a new adb client and device shell for every command.
+# The output of each command is framed by a sentinel line carrying the exit code.
+# If the session cannot be started (or dies), commands fall back to 'adb shell'.
 #
-print("\033[94m>>>>>>>>>> General Device Information.\033[0m")
-
-# Check for connected Android device
-if 'unknown' in co([ADB, 'get-state']).decode('UTF-8'):
-	sys.exit("\033[91m No Android device found!\033[0m")
-else:
-	ADB_SER = co([ADB, 'get-serialno']).decode('UTF-8').replace('\n', '').replace('\r', '')
-	print(" ADB serial: " + ADB_SER); REPORT.append(["ADB serial", ADB_SER])
-
-# Check permissions
-QPERM = co([ADB, 'shell', 'id']).decode('UTF-8')
-if 'root' in QPERM:
-	PERM = 'root'
-else:
-	QPERMSU = co([ADB, 'shell', 'su', '-c', 'id']).decode('UTF-8')
-	if 'root' in QPERMSU:
-		PERM = 'root(su)'
-	else:
-		PERM = 'shell'
-try:
-	print(" Shell permissions: " + PERM); REPORT.append(["Shell permissions", PERM])
-except NameError:
-	sys.exit("\033[91m Android permission cannot be established!\033[0m")
-
-BUILDPROP = co([ADB, 'shell', 'cat', '/system/build.prop']).decode('UTF-8')
-
-# Make & Model
-for manuf in BUILDPROP.split('\n'):
-	if 'ro.product.manufacturer' in manuf:
-		DEVICE_MANUF = manuf.strip().split('=')[1]
-for model in BUILDPROP.split('\n'):
-	if 'ro.product.model' in model:
-		DEVICE_MODEL = model.strip().split('=')[1]
-try:
-	print(" Device model: %s %s" % (DEVICE_MANUF, DEVICE_MODEL)); REPORT.append(["Manufacturer", DEVICE_MANUF]); REPORT.append(["Model", DEVICE_MODEL])
-except:
-	pass
+ADB_SERIAL = None	# Set with --serial: every adb command is pinned to that device
 
-# IMEI
-IMEI = co([ADB, 'shell', 'dumpsys', 'iphonesubinfo']).decode('UTF-8').split()[-1]
-try:
-	print(" IMEI: " + IMEI); REPORT.append(["IMEI", IMEI])
-except:
-	pass
+def adb(*args):
+	if ADB_SERIAL != None:
+		return [ADB, '-s', ADB_SERIAL] + list(args)
+	return [ADB] + list(args)
 
-# A version
-for aver in BUILDPROP.split('\n'):
-	if 'ro.build.version.release' in aver:
-		ANDROID_VER = aver.strip().split('=')[1]
-try:
-	print(" Android version: " + ANDROID_VER); REPORT.append(["Android version", ANDROID_VER])
-except:
-	pass
+class AdbSession:
+	def __init__(self, su=False):
+		self.su = su
+		self.proc = None
+		self.lock = threading.Lock()
+		self.token = '__ANDRILLER_' + hexlify(os.urandom(6)).decode('ascii') + '_'
+		try:
+			self.proc = Popen(adb('shell') + (['su'] if su else []), stdin=PIPE, stdout=PIPE)
+			if su:
+				if b'uid=0' not in self._exchange('id')[1]:
+					self.close()
+			# A clean shell echoes nothing; ptys echoing our input are not usable
+			if self.proc != None and self._exchange('true') != (0, b''):
+				self.close()
+		except (OSError, ValueError):
+			self.proc = None
 
-# Build ID
-for buildid in BUILDPROP.split('\n'):
-	if 'ro.build.display.id' in buildid:
-		BUILD_ID = buildid.strip().split('=')[1]
-try:
-	print(" Build number: " + BUILD_ID); REPORT.append(["Build name", BUILD_ID])
-except:
-	pass
+	def _send(self, line):
+		self.proc.stdin.write(line.encode('UTF-8') + b'\n')
+		self.proc.stdin.flush()
 
-# Wifi
-DUMPSYS_W = co([ADB, 'shell', 'dumpsys', 'wifi']).decode('UTF-8')
-try:
-	wifi_beg = DUMPSYS_W.index('MAC:')+5
-	wifi_end = DUMPSYS_W[wifi_beg:].index(',')
-	if wifi_end == 17:
-		WIFI_MAC = DUMPSYS_W[wifi_beg:wifi_beg+wifi_end].lower()
-		try:
-			print(" Wi-fi MAC: " + WIFI_MAC); REPORT.append(["Wifi MAC", WIFI_MAC])
-		except:
-			pass
-except:
-	pass
+	def _exchange(self, cmdline):
+		# '$__ar' is not expanded in any echoed input, so only real output matches
+		self._send('{ %s; } </dev/null; __ar=$?; echo; echo %s$__ar' % (cmdline, self.token))
+		out = b''
+		marker = self.token.encode('ascii')
+		while True:
+			line = self.proc.stdout.readline()
+			if line == b'':
+				raise OSError('adb shell session closed')
+			if line.startswith(marker):
+				code = line[len(marker):].strip()
+				if code.isdigit():
+					break
+			out += line
+		# drop the newline added by the bare 'echo' before the sentinel
+		if out.endswith(b'\r\n'):
+			out = out[:-2]
+		elif out.endswith(b'\n'):
+			out = out[:-1]
+		return int(code), out
 
-# Time and date
-LOCAL_TIME = time.strftime('%Y-%m-%d %H:%M:%S %Z')
-try:
-	print(" Local time: " + LOCAL_TIME); REPORT.append(["Local time", LOCAL_TIME])
-except:
-	pass
-ANDROID_TIME = co([ADB, 'shell', 'date', '+%F %T %Z']).decode('UTF-8').replace('\r\n', '')
-try:
-	print(" Android time: " + ANDROID_TIME); REPORT.append(["Android time", ANDROID_TIME])
-except:
-	pass
+	def run_raw(self, *args):
+		cmdline = ' '.join(args)
+		with self.lock:
+			if self.proc != None:
+				try:
+					return self._exchange(cmdline)[1]
+				except (OSError, ValueError):
+					self.close()
+		if self.su:
+			# quoted whole, so the outer (non-root) shell expands nothing in it
+			cmdline = "su -c '%s'" % cmdline.replace("'", "'\\''")
+		return Popen(adb('shell', cmdline), stdout=PIPE).communicate()[0]
 
-# SIM card extraction 
-SIM_LOC = '/data/system/SimCard.dat'
-if co([ADB, 'shell', 'ls', SIM_LOC]).decode('UTF-8').replace('\r', '').replace('\n', '') == SIM_LOC:
-	SIM_DATA = co([ADB, 'shell', 'cat', SIM_LOC]).decode('UTF-8').replace('\r', '')
-	for sim_d in SIM_DATA.split('\n'):
-		if 'CurrentSimSerialNumber' in sim_d:
-			SIM_ICCID = sim_d.split('=')[1]
-			if SIM_ICCID != '' and SIM_ICCID != 'null':
-				REPORT.append(['SIM ICCID', SIM_ICCID])
-		if 'CurrentSimPhoneNumber' in sim_d:
-			SIM_MSISDN = sim_d.split('=')[1]
-			if SIM_MSISDN != '' and SIM_MSISDN != 'null':
-				REPORT.append(['SIM MSISDN', SIM_MSISDN])
-		if 'CurrentSimOperatorName' in sim_d:
-			SIM_OP = sim_d.split('=')[1]
-			if SIM_OP != '' and SIM_OP != 'null':
-				REPORT.append(['SIM Operator', SIM_OP])
-		if 'PreviousSimSerialNumber' in sim_d:
-			PRV_SIM_ICCID = sim_d.split('=')[1]
-			if PRV_SIM_ICCID != '' and PRV_SIM_ICCID != 'null':
-				REPORT.append(['SIM ICCID (Previous)', PRV_SIM_ICCID])
-		if 'PreviousSimPhoneNumber' in sim_d:
-			PRV_SIM_MSISDN = sim_d.split('=')[1]
-			if PRV_SIM_MSISDN != '' and PRV_SIM_MSISDN != 'null':
-				REPORT.append(['SIM MSISDN (Previous)', PRV_SIM_MSISDN])
+	def run(self, *args):
+		return self.run_raw(*args).decode('UTF-8', 'replace')
 
-#
-# Accounts
-ALLACC = co([ADB, 'shell', 'dumpsys', 'account']).decode('UTF-8')
-all_acc = re.compile('Account {name=', re.DOTALL).finditer(ALLACC)
-ACCOUNTS = []
-for acc in all_acc:
-	hit_pos = acc.start()
-	tacc = ALLACC[hit_pos+14:]
-	end_pos = tacc.index('}')
-	acc0 = tacc[:end_pos].replace(' type=', '').split(',')
-	acc = acc0[1]+": "+acc0[0]
-	ACCOUNTS.append(acc)
-if ACCOUNTS != '':
-	print("\033[94m>>>>>>>>>> Sync'ed Accounts.\033[0m")
-	for account in ACCOUNTS:
-		print(account)
-	REPORT.append(["Accounts", ACCOUNTS])
-
-# Create output directory
-OR_DATE = time.strftime('%Y-%m-%d')
-OR_TIME = time.strftime('%H.%M.%S')
-OUTPUT = DEVICE_MANUF+"_"+DEVICE_MODEL+"_"+OR_DATE+"_"+OR_TIME+SEP
-try:
-	os.mkdir(OUTPUT)
-	os.mkdir(OUTPUT+SEP+'db')
-except:
-	sys.exit(" Insufficient permissions to create a folder in this directory!")
+	def close(self):
+		if self.proc != None:
+			try:
+				self._send('exit')
+				self.proc.stdin.close()
+				self.proc.wait()
+			except (OSError, ValueError):
+				self.proc.kill()
+			self.proc = None
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
-# ROOT EXTRACTION
+# DEVICE PROPERTIES
+# build.prop and getprop are read and parsed into one dict on first use (getprop
+# values win, as they are what the running system uses), so each property is an
+# exact key lookup. dumpsys output is fetched per service when first asked for, and
+# its 'key: value' / 'key = value' lines are only parsed if a field is looked up.
 #
-if 'root' in QPERM:
-	SUC = ''
-	print("\033[94m>>>>>>>>>> Downloading databases...\033[0m")
-elif 'root' in QPERMSU:
-	SUC = 'su -c'
-	print("\033[94m>>>>>>>>>> Downloading databases...\033[0m")
+GETPROP_LINE = re.compile(r'^\[(.+?)\]: \[(.*)\]$')
+DUMPSYS_FIELD = re.compile(r'^\s*([A-Za-z][\w .-]*?)\s*(?:=|:)\s*(.*?)\s*$', re.MULTILINE)
+
+def parse_props(text):
+	props = {}
+	for line in text.split('\n'):
+		line = line.strip()
+		if line == '' or line[0] == '#':
+			continue
+		match = GETPROP_LINE.match(line)
+		if match != None:
+			props[match.group(1)] = match.group(2)
+		elif '=' in line:
+			key, value = line.split('=', 1)
+			props[key.strip()] = value.strip()
+	return props
+
+class DeviceProps:
+	def __init__(self, shell):
+		self.shell = shell
+		self.props = None
+		self.dumps = {}
+		self.fields = {}
+
+	def prop(self, key, default=None):
+		if self.props == None:
+			self.props = parse_props(self.shell.run('cat', '/system/build.prop'))
+			self.props.update(parse_props(self.shell.run('getprop')))
+		value = self.props.get(key, '')
+		return value if value != '' else default
+
+	def dumpsys(self, service):
+		if service not in self.dumps:
+			self.dumps[service] = self.shell.run('dumpsys', service).replace('\r', '')
+		return self.dumps[service]
+
+	def dumpsys_field(self, service, key, default=None):
+		if service not in self.fields:
+			self.fields[service] = dict([(x.group(1), x.group(2)) for x in DUMPSYS_FIELD.finditer(self.dumpsys(service))])
+		return self.fields[service].get(key, default)
+
+# (REPORT label, property) reported after the build name when the device has them
+DEVICE_PROPS = [
+('Brand', 'ro.product.brand'),
+('Device', 'ro.product.device'),
+('Product name', 'ro.product.name'),
+('Hardware', 'ro.hardware'),
+('Board', 'ro.product.board'),
+('Platform', 'ro.board.platform'),
+('CPU ABI', 'ro.product.cpu.abi'),
+('Hardware serial', 'ro.serialno'),
+('Bootloader', 'ro.bootloader'),
+('Baseband', 'gsm.version.baseband'),
+('API level', 'ro.build.version.sdk'),
+('Security patch', 'ro.build.version.security_patch'),
+('Build fingerprint', 'ro.build.fingerprint'),
+('Build date', 'ro.build.date'),
+('Build type', 'ro.build.type'),
+('Build tags', 'ro.build.tags'),
+('Secure boot', 'ro.secure'),
+('Debuggable', 'ro.debuggable'),
+('Encryption state', 'ro.crypto.state'),
+('Encryption type', 'ro.crypto.type'),
+('Verified boot state', 'ro.boot.verifiedbootstate'),
+('Time zone', 'persist.sys.timezone'),
+('Locale', 'persist.sys.locale'),
+('Language', 'persist.sys.language'),
+('Country', 'persist.sys.country'),
+('Network operator', 'gsm.operator.alpha'),
+('Network operator code', 'gsm.operator.numeric'),
+('SIM operator', 'gsm.sim.operator.alpha'),
+('SIM operator code', 'gsm.sim.operator.numeric'),
+('SIM country', 'gsm.sim.operator.iso-country'),
+('SIM state', 'gsm.sim.state'),
+('Wi-Fi interface', 'wifi.interface'),
+('Bluetooth name', 'net.bt.name'),
+('Host name', 'net.hostname')
+]
+
 #
 # DATABASE EXTRACTION
 #
@@ -255,70 +264,1188 @@ DBLS = [
 
 DLLS = []	# downloaded databases empty list
 
-def download_database(DB_PATH):
+STAGE_TIMES = {'streaming': [], 'chunked': [], 'staging': [], 'pulling': [], 'hashing': []}	# (start, end) of each file's stage
+
+def timed_stage(stage, func, *args):
+	t_beg = time.time()
+	try:
+		return func(*args)
+	finally:
+		STAGE_TIMES[stage].append((t_beg, time.time()))
+
+# One shell round-trip for all targets; prints 'size mtime path' for every existing file
+def stat_databases(DB_PATHS):
+	DB_STAT = {}
+	stat_cmd = 'for f in %s; do [ -e "$f" ] && echo "$(stat -c \'%%s %%Y\' "$f" 2>/dev/null || echo \'0 0\') $f"; done' % ' '.join(DB_PATHS)
+	for line in ROOT.run(stat_cmd).replace('\r', '').split('\n'):
+		line = line.split(' ', 2)
+		if len(line) == 3 and line[2] in DB_PATHS:
+			try:
+				DB_STAT[line[2]] = (int(line[0]), int(line[1]))
+			except ValueError:
+				DB_STAT[line[2]] = (0, 0)
+	return DB_STAT
+
+# Device side: copy the file out of the app sandbox for 'su' devices
+def stage_database(DB_PATH):
 	DB_NAME = DB_PATH.split('/')[-1]
-	if co([ADB, 'shell', SUC, 'ls', DB_PATH]).decode('UTF-8').replace('\r', '').replace('\n', '') == DB_PATH:
-		if 'su' in PERM:
-			co([ADB, 'shell', SUC, 'dd', 'if='+DB_PATH, 'of=/data/local/tmp/'+DB_NAME])
-			co([ADB, 'shell', SUC, 'chmod', '777', '/data/local/tmp/'+DB_NAME])
-			co([ADB, 'pull', '/data/local/tmp/'+DB_NAME, OUTPUT+SEP+'db'+SEP+DB_NAME])
-			co([ADB, 'shell', SUC, 'rm', '/data/local/tmp/'+DB_NAME])
+	if 'su' in PERM:
+		ROOT.run('dd', 'if='+DB_PATH, 'of=/data/local/tmp/'+DB_NAME)
+		ROOT.run('chmod', '777', '/data/local/tmp/'+DB_NAME)
+		return '/data/local/tmp/'+DB_NAME
+	return DB_PATH
+
+# 'adb pull' cannot be slowed down, so under a rate limit the file is read with
+# 'cat' over exec-out instead
+def pull_database(DB_SRC, DB_NAME, budget=None):
+	try:
+		if budget == None:
+			co(adb('pull', DB_SRC, OUTPUT+SEP+'db'+SEP+DB_NAME))
 		else:
-			co([ADB, 'pull', DB_PATH, OUTPUT+SEP+'db'+SEP+DB_NAME])
-		if os.path.isfile(OUTPUT+SEP+'db'+SEP+DB_NAME) == True:
-			fileh = open(OUTPUT+SEP+'db'+SEP+'md5sums', 'a')
-			DB_MD5 = hashlib.md5(open(OUTPUT+SEP+'db'+SEP+DB_NAME, 'rb').read()).hexdigest()
-			DLLS.append(DB_NAME) #; DLLS.append(DB_MD5)
-			fileh.write(DB_MD5+'\t'+DB_NAME+'\n')
-			fileh.close()
+			proc = Popen(adb('exec-out', 'cat', DB_SRC), stdout=PIPE)
+			src = RateLimitedReader(proc.stdout, budget)
+			try:
+				with open(OUTPUT+SEP+'db'+SEP+DB_NAME, 'wb') as fileh:
+					for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+						fileh.write(chunk)
+			finally:
+				proc.stdout.close()
+				if proc.wait() != 0:
+					if os.path.isfile(OUTPUT+SEP+'db'+SEP+DB_NAME):
+						os.remove(OUTPUT+SEP+'db'+SEP+DB_NAME)
+					raise OSError('exec-out cat %s failed' % DB_SRC)
+	finally:
+		if 'su' in PERM:
+			ROOT.run('rm', DB_SRC)
+
+# MD5, SHA-1 and SHA-256 of the same bytes, fed chunk by chunk
+class MultiHash:
+	def __init__(self):
+		self.hashes = [hashlib.md5(), hashlib.sha1(), hashlib.sha256()]
+		self.size = 0
+
+	def update(self, chunk):
+		for h in self.hashes:
+			h.update(chunk)
+		self.size += len(chunk)
+
+	def hexdigests(self):
+		return [h.hexdigest() for h in self.hashes]
 
-if 'root' in PERM:
-	for db in DBLS:
-		download_database(db)
+def hash_file(path):
+	db_hash = MultiHash()
+	with open(path, 'rb') as fileh:
+		for chunk in iter(lambda: fileh.read(CHUNK_SIZE), b''):
+			db_hash.update(chunk)
+	return db_hash
+
+def hash_database(DB_NAME):
+	if os.path.isfile(OUTPUT+SEP+'db'+SEP+DB_NAME) == True:
+		return hash_file(OUTPUT+SEP+'db'+SEP+DB_NAME)
+
+# Hashes of all acquired files, written once after the download, with the device
+# fingerprint (size and mtime above; SHA-256 when computed on the device) and where
+# each file came from: 'pulled', or 'reused:<case>' for incremental acquisitions
+def write_manifest(DB_PATHS, DB_HASH, DB_STAT={}, DB_SUMS={}, DB_FROM={}):
+	fileh = open(OUTPUT+SEP+'db'+SEP+'manifest.tsv', 'w', encoding='UTF-8')
+	fileh.write('# md5\tsha1\tsha256\tsize\tname\tsource\tmtime\tdevice_sha256\torigin\n')
+	for DB_PATH in DB_PATHS:
+		if DB_PATH in DB_HASH:
+			origin = 'reused:'+DB_FROM[DB_PATH] if DB_PATH in DB_FROM else 'pulled'
+			fileh.write('\t'.join(DB_HASH[DB_PATH].hexdigests() + [str(DB_HASH[DB_PATH].size), DB_PATH.split('/')[-1], DB_PATH, str(DB_STAT.get(DB_PATH, ('', ''))[1]), DB_SUMS.get(DB_PATH, ''), origin]) + '\n')
+	fileh.close()
+
+# Incremental acquisition # # # # # # # # # # # # # # # # # # #
+# With INCREMENTAL set, files whose device fingerprint matches the manifest of the
+# latest earlier case of the same serial are hard-linked from that case (copied if
+# linking fails) rather than transferred. 'stat' compares size and mtime; 'hash' also
+# runs sha256sum on the device and compares it with the recorded SHA-256. A reused
+# file is re-hashed on the host and must match the recorded hashes, and its manifest
+# row names the case it came from.
+INCREMENTAL = None	# None, 'stat' or 'hash'
+
+def device_hashes(DB_PATHS):
+	DB_SUMS = {}
+	for line in ROOT.run('sha256sum ' + ' '.join(DB_PATHS) + ' 2>/dev/null').replace('\r', '').split('\n'):
+		line = line.split(None, 1)
+		if len(line) == 2 and len(line[0]) == 64 and line[1].strip() in DB_PATHS:
+			DB_SUMS[line[1].strip()] = line[0].lower()
+	return DB_SUMS
+
+def read_manifest(path):
+	entries = {}
+	fileh = open(path, encoding='UTF-8')
+	columns = fileh.readline().lstrip('# ').rstrip('\n').split('\t')
+	for line in fileh:
+		entry = dict(zip(columns, line.rstrip('\n').split('\t')))
+		entries[entry['source']] = entry
+	fileh.close()
+	return entries
+
+# Case folder of the latest earlier acquisition of this serial that has a manifest
+def previous_case(serial):
+	CASES_DIR = os.path.dirname(os.path.normpath(OUTPUT)) or '.'
+	found = None
+	for name in os.listdir(CASES_DIR):
+		CASE_DIR = os.path.join(CASES_DIR, name)
+		if os.path.abspath(CASE_DIR) == os.path.abspath(OUTPUT):
+			continue
+		if os.path.isfile(os.path.join(CASE_DIR, 'case.json')) and os.path.isfile(os.path.join(CASE_DIR, 'db', 'manifest.tsv')):
+			try:
+				fileh = open(os.path.join(CASE_DIR, 'case.json'), encoding='UTF-8')
+				case = load(fileh)
+				fileh.close()
+			except (OSError, ValueError):
+				continue
+			t_case = os.path.getmtime(os.path.join(CASE_DIR, 'db', 'manifest.tsv'))
+			if case.get('serial') == serial and (found == None or t_case > found[0]):
+				found = (t_case, CASE_DIR)
+	return found[1] if found != None else None
+
+def reuse_databases(DB_STAT, DB_SUMS):
+	DB_HASH = {}
+	DB_FROM = {}
+	PREV_DIR = previous_case(ADB_SER)
+	if PREV_DIR == None:
+		print(" No earlier case of %s; acquiring everything" % ADB_SER)
+		return DB_HASH, DB_FROM
+	PREV = read_manifest(os.path.join(PREV_DIR, 'db', 'manifest.tsv'))
+	for DB_PATH in DB_STAT:
+		entry = PREV.get(DB_PATH)
+		if entry == None or entry.get('size') != str(DB_STAT[DB_PATH][0]):
+			continue
+		if DB_PATH in DB_SUMS:
+			if DB_SUMS[DB_PATH] != entry.get('sha256'):
+				continue
+		elif entry.get('mtime') != str(DB_STAT[DB_PATH][1]):
+			continue
+		DB_SRC = os.path.join(PREV_DIR, 'db', entry['name'])
+		DB_FILE = OUTPUT+SEP+'db'+SEP+DB_PATH.split('/')[-1]
+		try:
+			os.link(DB_SRC, DB_FILE)
+		except OSError:
+			try:
+				shutil.copyfile(DB_SRC, DB_FILE)
+			except OSError:
+				continue
+		db_hash = hash_file(DB_FILE)
+		if db_hash.hexdigests() != [entry.get('md5'), entry.get('sha1'), entry.get('sha256')]:
+			os.remove(DB_FILE)
+			continue
+		DB_HASH[DB_PATH] = db_hash
+		DB_FROM[DB_PATH] = os.path.basename(os.path.normpath(PREV_DIR))
+	print(" Unchanged since %s: %d of %d files" % (os.path.basename(os.path.normpath(PREV_DIR)), len(DB_HASH), len(DB_STAT)))
+	return DB_HASH, DB_FROM
+
+# Caps the read rate of a pipe from the device; with the pipe unread, adb stops
+# reading the USB side too. rate is in bytes per second, None for no limit, or a
+# RateBudget shared by pipes read at the same time.
+RATE_LIMIT = None
+
+class RateBudget:
+	def __init__(self, rate):
+		self.rate = rate
+		self.lock = threading.Lock()
+		self.t_beg = time.time()
+		self.total = 0
+
+	def spend(self, size):
+		with self.lock:
+			self.total += size
+			ahead = self.total / self.rate - (time.time() - self.t_beg)
+		if ahead > 0:
+			time.sleep(ahead)
+
+class RateLimitedReader:
+	def __init__(self, fileobj, rate):
+		self.fileobj = fileobj
+		self.budget = RateBudget(rate) if isinstance(rate, (int, float)) else rate
+
+	def read(self, size=-1):
+		data = self.fileobj.read(size)
+		if self.budget != None:
+			self.budget.spend(len(data))
+		return data
+
+# Streams the targets through one 'tar' pipe over 'adb exec-out', without a staging
+# copy on the device. Each file is written and hashed as its bytes arrive.
+def stream_databases(DB_PATHS):
+	DB_HASH = {}
+	tar_cmd = 'tar -cf - ' + ' '.join(DB_PATHS) + ' 2>/dev/null'
+	if SUC != '':
+		tar_cmd = "%s '%s'" % (SUC, tar_cmd)
+	proc = Popen(adb('exec-out', tar_cmd), stdout=PIPE)
+	DB_FILE = None
+	try:
+		with tarfile.open(fileobj=RateLimitedReader(proc.stdout, RATE_LIMIT), mode='r|') as tar:
+			for member in tar:
+				if member.isfile() == False or '/'+member.name not in DB_PATHS:
+					continue
+				DB_FILE = OUTPUT+SEP+'db'+SEP+member.name.split('/')[-1]
+				src = tar.extractfile(member)
+				db_hash = MultiHash()
+				with open(DB_FILE, 'wb') as fileh:
+					for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+						db_hash.update(chunk)
+						fileh.write(chunk)
+				DB_HASH['/'+member.name] = db_hash
+				DB_FILE = None
+	except (tarfile.TarError, OSError):
+		if DB_FILE != None and os.path.isfile(DB_FILE):
+			os.remove(DB_FILE)
+	finally:
+		proc.stdout.close()
+		proc.wait()
+	return DB_HASH
+
+# Chunked transfer  # # # # # # # # # # # # # # # # # # # # # #
+# Each file is read on the device in PULL_CHUNK byte ranges ('dd skip/count' over
+# exec-out). A chunk is accepted when its SHA-256 matches one computed on the device
+# (or, without sha256sum there, when its length is right); a bad chunk is fetched
+# again up to CHUNK_RETRIES times. Accepted chunks go into <name>.part and are listed
+# in <name>.journal, so --resume on the same case folder carries on from the last
+# accepted chunk while the device file keeps the size and mtime in the journal.
+# A finished file is renamed into place and its SHA-256 journalled as 'done'; the
+# journals are removed once every file has been acquired.
+PULL_CHUNK = 4194304	# Bytes per chunk
+CHUNK_RETRIES = 3
+RESUME_FILES = ('.part', '.journal')	# Left in db/ by unfinished chunked transfers
+
+def device_chunk_hash(DB_PATH, index):
+	out = ROOT.run('dd if=%s bs=%d skip=%d count=1 2>/dev/null | sha256sum' % (DB_PATH, PULL_CHUNK, index)).strip().split()
+	if out != [] and len(out[0]) == 64:
+		return out[0].lower()
+	return None
+
+def read_device_chunk(DB_PATH, index):
+	dd_cmd = 'dd if=%s bs=%d skip=%d count=1 2>/dev/null' % (DB_PATH, PULL_CHUNK, index)
+	if SUC != '':
+		dd_cmd = "%s '%s'" % (SUC, dd_cmd)
+	proc = Popen(adb('exec-out', dd_cmd), stdout=PIPE)
+	data = RateLimitedReader(proc.stdout, RATE_LIMIT).read()
+	proc.wait()
+	return data
+
+def read_journal(path, DB_PATH, stat):
+	done = {}
+	if os.path.isfile(path):
+		fileh = open(path, encoding='UTF-8')
+		head = fileh.readline().rstrip('\n').split('\t')
+		if head == [DB_PATH, str(stat[0]), str(stat[1]), str(PULL_CHUNK)]:
+			for line in fileh:
+				line = line.rstrip('\n').split('\t')
+				if len(line) == 2 and (line[0].isdigit() or line[0] == 'done'):
+					done[int(line[0]) if line[0] != 'done' else line[0]] = line[1]
+		fileh.close()
+	return done
+
+def pull_chunked(DB_PATH, stat):
+	DB_FILE = OUTPUT+SEP+'db'+SEP+DB_PATH.split('/')[-1]
+	chunks = (stat[0] + PULL_CHUNK - 1) // PULL_CHUNK
+	done = read_journal(DB_FILE+'.journal', DB_PATH, stat)
+	if 'done' in done and os.path.isfile(DB_FILE):
+		db_hash = hash_file(DB_FILE)
+		if db_hash.hexdigests()[2] == done['done']:
+			return db_hash
+		done = {}
+	if done == {} or os.path.isfile(DB_FILE+'.part') == False:
+		done = {}
+		fileh = open(DB_FILE+'.journal', 'w', encoding='UTF-8')
+		fileh.write('\t'.join([DB_PATH, str(stat[0]), str(stat[1]), str(PULL_CHUNK)]) + '\n')
+		fileh.close()
+		open(DB_FILE+'.part', 'wb').close()
+	journal = open(DB_FILE+'.journal', 'a', encoding='UTF-8')
+	part = open(DB_FILE+'.part', 'r+b')
+	try:
+		for index in range(chunks):
+			if index in done:
+				continue
+			length = min(PULL_CHUNK, stat[0] - index*PULL_CHUNK)
+			for attempt in range(CHUNK_RETRIES):
+				expect = device_chunk_hash(DB_PATH, index)
+				data = read_device_chunk(DB_PATH, index)
+				digest = hashlib.sha256(data).hexdigest()
+				if len(data) == length and (expect == None or expect == digest):
+					break
+			else:
+				raise OSError('chunk %d of %s failed verification' % (index, DB_PATH))
+			part.seek(index*PULL_CHUNK)
+			part.write(data)
+			part.flush()
+			os.fsync(part.fileno())
+			journal.write('%d\t%s\n' % (index, digest))
+			journal.flush()
+	finally:
+		part.close()
+		journal.close()
+	# whole-file hashes come from the assembled file, as chunks may span several runs
+	db_hash = hash_file(DB_FILE+'.part')
+	if db_hash.size != stat[0]:
+		raise OSError('%s: %d of %d bytes' % (DB_PATH, db_hash.size, stat[0]))
+	os.replace(DB_FILE+'.part', DB_FILE)
+	journal = open(DB_FILE+'.journal', 'a', encoding='UTF-8')
+	journal.write('done\t%s\n' % db_hash.hexdigests()[2])
+	journal.close()
+	return db_hash
+
+# A live database (or its -wal) may change size between stat and transfer; such a
+# file is sized again and started over, up to CHUNK_RETRIES times. DB_STAT is
+# updated in place, so the manifest records what was read.
+def pull_chunked_databases(DB_PATHS, DB_STAT):
+	DB_HASH = {}
+	for DB_PATH in DB_PATHS:
+		for attempt in range(CHUNK_RETRIES):
+			try:
+				DB_HASH[DB_PATH] = timed_stage('chunked', pull_chunked, DB_PATH, DB_STAT[DB_PATH])
+				break
+			except Exception as e:
+				error = e
+			stat = stat_databases([DB_PATH]).get(DB_PATH)
+			changed = stat != None and stat[0] > 0 and stat != DB_STAT[DB_PATH]
+			if changed == False:
+				break
+			DB_STAT[DB_PATH] = stat
+		if DB_PATH in DB_HASH:
+			continue
+		if changed:
+			print("\033[91m Skipped: %s kept changing while it was read\033[0m" % DB_PATH)
+			continue
+		# most likely the link dropped; the rest would only fail the same way
+		print("\033[91m Incomplete: %s (%s), %d files left; run again with --resume %s\033[0m" % (DB_PATH, error, len(DB_PATHS) - len(DB_HASH), os.path.normpath(OUTPUT)))
+		break
+	return DB_HASH
+
+# Staging runs on one thread (one root shell), pulls and hashes on their own pools,
+# so the next file is staged while earlier ones are still being pulled and hashed.
+# At most 'workers' staged copies wait in /data/local/tmp at any time.
+def stage_and_pull_databases(DB_PATHS, workers=DL_WORKERS):
+	DB_HASH = {}
+	slots = threading.BoundedSemaphore(workers)
+	pulls = ThreadPoolExecutor(workers)
+	hashes = ThreadPoolExecutor(workers)
+	# concurrent pulls share one budget, so together they keep to RATE_LIMIT
+	budget = RateBudget(RATE_LIMIT) if RATE_LIMIT != None else None
+	def pull_and_hash(DB_SRC, DB_NAME):
+		try:
+			timed_stage('pulling', pull_database, DB_SRC, DB_NAME, budget)
+		finally:
+			slots.release()
+		return hashes.submit(timed_stage, 'hashing', hash_database, DB_NAME)
+	jobs = []
+	for DB_PATH in DB_PATHS:
+		DB_NAME = DB_PATH.split('/')[-1]
+		slots.acquire()
+		try:
+			DB_SRC = timed_stage('staging', stage_database, DB_PATH)
+		except Exception:
+			slots.release()
+			continue
+		jobs.append((DB_PATH, pulls.submit(pull_and_hash, DB_SRC, DB_NAME)))
+	for DB_PATH, job in jobs:
+		try:
+			db_hash = job.result().result()
+		except Exception:
+			print("\033[91m Failed to download: %s\033[0m" % DB_PATH)
+			continue
+		if db_hash != None:
+			DB_HASH[DB_PATH] = db_hash
+	pulls.shutdown(); hashes.shutdown()
+	return DB_HASH
+
+# Missing files are skipped up front and the largest files are scheduled first.
+# In 'stream' mode anything the tar pipe did not deliver is fetched the staged way.
+def download_databases(DB_PATHS, mode=ACQ_MODE, workers=DL_WORKERS):
+	t_beg = time.time()
+	DB_STAT = stat_databases(DB_PATHS)
+	DB_SUMS = {}
+	DB_HASH = {}
+	DB_FROM = {}
+	if INCREMENTAL != None:
+		if INCREMENTAL == 'hash':
+			DB_SUMS = device_hashes(list(DB_STAT))
+		DB_HASH, DB_FROM = reuse_databases(DB_STAT, DB_SUMS)
+	DB_TODO = sorted([x for x in DB_STAT if x not in DB_HASH], key=lambda x: DB_STAT[x][0], reverse=True)
+	if mode == 'stream' and DB_TODO != []:
+		DB_HASH.update(timed_stage('streaming', stream_databases, DB_TODO))
+		DB_TODO = [x for x in DB_TODO if x not in DB_HASH]
+	if mode == 'chunked' and DB_TODO != []:
+		# files stat could not size go the staged way
+		DB_HASH.update(pull_chunked_databases([x for x in DB_TODO if DB_STAT[x][0] > 0], DB_STAT))
+		DB_TODO = [x for x in DB_TODO if DB_STAT[x][0] == 0]
+	if DB_TODO != []:
+		DB_HASH.update(stage_and_pull_databases(DB_TODO, workers))
+	for DB_PATH in DB_PATHS:
+		if DB_PATH in DB_HASH:
+			DLLS.append(DB_PATH.split('/')[-1])
+	if DB_HASH != {}:
+		write_manifest(DB_PATHS, DB_HASH, DB_STAT, DB_SUMS, DB_FROM)
+	# until every file is in, finished ones keep their 'done' journal for --resume
+	if all([x in DB_HASH for x in DB_STAT]):
+		for DB_PATH in DB_HASH:
+			if os.path.isfile(OUTPUT+SEP+'db'+SEP+DB_PATH.split('/')[-1]+'.journal'):
+				os.remove(OUTPUT+SEP+'db'+SEP+DB_PATH.split('/')[-1]+'.journal')
+	print_stage_times(time.time() - t_beg)
+
+def print_stage_times(total):
+	times = []
+	for stage in ['streaming', 'chunked', 'staging', 'pulling', 'hashing']:
+		if STAGE_TIMES[stage] != []:
+			wall = max([x[1] for x in STAGE_TIMES[stage]]) - min([x[0] for x in STAGE_TIMES[stage]])
+			times.append('%s %.2fs' % (stage, wall))
+	print(" Download time: %.2fs%s" % (total, ' (%s)' % ', '.join(times) if times != [] else ''))
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# PARTITION IMAGING
+# With --image on a rooted device, a whole partition (userdata by default) is read
+# with 'dd' over 'adb exec-out' and never lands on disk uncompressed. The stream is
+# cut into IMAGE_CHUNK blocks, each compressed on its own by a thread pool into one
+# gzip member, and the members are written in order: image/<name>.img.gz unpacks
+# with plain gunzip, and image/<name>.img.idx gives each block's offset in it, so
+# any block can be read back without inflating the ones before it. All-zero blocks
+# skip compression (one member is made once and reused) and are flagged in the
+# index. MD5, SHA-1 and SHA-256 of the raw image are computed on their own threads
+# while the blocks go by.
+#
+IMAGE_CHUNK = 4194304	# Bytes per compressed block
+IMAGE_LEVEL = 3			# zlib level; higher levels cannot keep up with USB 3 on most hosts
+IMAGE_WORKERS = os.cpu_count() or 1
+BLOCK_DIRS = ['/dev/block/by-name', '/dev/block/bootdevice/by-name', '/dev/block/platform/*/by-name', '/dev/block/platform/*/*/by-name']
+
+# Block device behind a partition name (or a /dev path as given) and its size in
+# bytes, 0 when the device does not report it
+def find_partition(name):
+	if name.startswith('/dev/'):
+		dev = name
+	else:
+		find_cmd = 'for d in %s; do [ -e $d/%s ] && readlink -f $d/%s && break; done' % (' '.join(BLOCK_DIRS), name, name)
+		dev = ROOT.run(find_cmd).replace('\r', '').strip().split('\n')[0]
+		if dev == '':
+			return None, 0
+	size_cmd = 'blockdev --getsize64 %s 2>/dev/null || echo $(( $(cat /sys/class/block/%s/size) * 512 )) 2>/dev/null || stat -Lc %%s %s' % (dev, dev.split('/')[-1], dev)
+	try:
+		size = int(ROOT.run(size_cmd).replace('\r', '').strip().split('\n')[0])
+	except ValueError:
+		size = 0
+	return dev, size
+
+# Encrypted blocks do not compress; those are kept as stored (level 0) members
+def gzip_block(data, level=IMAGE_LEVEL):
+	comp = zlib.compressobj(level, zlib.DEFLATED, 31)
+	member = comp.compress(data) + comp.flush()
+	if level > 0 and len(member) > len(data):
+		return gzip_block(data, 0)
+	return member
+
+# MultiHash with each algorithm fed from its own thread (hashlib drops the GIL on
+# large buffers), so the three digests take about as long as the slowest one
+class ThreadedHash(MultiHash):
+	def __init__(self, depth):
+		MultiHash.__init__(self)
+		self.queues = [queue.Queue(depth) for x in self.hashes]
+		self.threads = [threading.Thread(target=self._run, args=(h, q), daemon=True) for h, q in zip(self.hashes, self.queues)]
+		for thread in self.threads:
+			thread.start()
+
+	def _run(self, h, q):
+		for chunk in iter(q.get, None):
+			h.update(chunk)
+
+	def update(self, chunk):
+		for q in self.queues:
+			q.put(chunk)
+		self.size += len(chunk)
+
+	def close(self):
+		for q in self.queues:
+			q.put(None)
+		for thread in self.threads:
+			thread.join()
+
+def image_partition(name, workers=IMAGE_WORKERS):
+	dev, size = find_partition(name)
+	if dev == None:
+		print("\033[91m Partition not found: %s\033[0m" % name)
+		return
+	IMG_NAME = dev.split('/')[-1] if name.startswith('/dev/') else name
+	IMG_FILE = OUTPUT+'image'+SEP+IMG_NAME+'.img'
+	os.makedirs(OUTPUT+'image', exist_ok=True)
+	print("\033[94m>>>>>>>>>> Imaging %s (%s, %.1f GB)...\033[0m" % (IMG_NAME, dev, size / 1073741824.0))
+	t_beg = time.time()
+	dd_cmd = 'dd if=%s bs=%d 2>/dev/null' % (dev, IMAGE_CHUNK)
+	if SUC != '':
+		dd_cmd = "%s '%s'" % (SUC, dd_cmd)
+	proc = Popen(adb('exec-out', dd_cmd), stdout=PIPE)
+	src = RateLimitedReader(proc.stdout, RATE_LIMIT)
+	img_hash = ThreadedHash(workers*2)
+	pool = ThreadPoolExecutor(workers)
+	pending = []
+	zero_block = bytes(IMAGE_CHUNK)
+	zero_member = gzip_block(zero_block)
+	zeros = 0
+	gz = open(IMG_FILE+'.gz', 'wb')
+	idx = open(IMG_FILE+'.idx', 'w', encoding='UTF-8')
+	idx.write('# offset\tlength\tgz_offset\tgz_length\tzero\n')
+	def write_block(offset, length, member, zero):
+		idx.write('%d\t%d\t%d\t%d\t%d\n' % (offset, length, gz.tell(), len(member), zero))
+		gz.write(member)
+	try:
+		offset = 0
+		for data in iter(lambda: src.read(IMAGE_CHUNK), b''):
+			img_hash.update(data)
+			if data == zero_block:
+				pending.append((offset, len(data), None, 1))
+				zeros += len(data)
+			else:
+				pending.append((offset, len(data), pool.submit(gzip_block, data), 0))
+			offset += len(data)
+			# blocks are written in order; at most about 2 per worker are in flight
+			while len(pending) > workers*2 or (pending != [] and (pending[0][2] == None or pending[0][2].done())):
+				block = pending.pop(0)
+				write_block(block[0], block[1], zero_member if block[2] == None else block[2].result(), block[3])
+			if size > 0:
+				print("\033[95m Imaging: %.1f%% (%.1f MB/s)\033[0m" % (100.0 * offset / size, offset / 1048576.0 / max(time.time() - t_beg, 0.001)), end='\r')
+		for block in pending:
+			write_block(block[0], block[1], zero_member if block[2] == None else block[2].result(), block[3])
+	finally:
+		proc.stdout.close()
+		proc.wait()
+		pool.shutdown()
+		img_hash.close()
+		gz.close()
+		idx.close()
+	digests = img_hash.hexdigests()
+	fileh = open(OUTPUT+'image'+SEP+'manifest.tsv', 'a', encoding='UTF-8')
+	fileh.write('\t'.join(digests + [str(img_hash.size), IMG_NAME+'.img', dev]) + '\n')
+	fileh.close()
+	t_run = time.time() - t_beg
+	print(" Image: %s.img.gz, %d bytes (%d zero) in %.2fs, %.1f MB/s, %.1f%% of raw size" % (IMG_NAME, img_hash.size, zeros, t_run, img_hash.size / 1048576.0 / max(t_run, 0.001), 100.0 * os.path.getsize(IMG_FILE+'.gz') / max(img_hash.size, 1)))
+	if size > 0 and img_hash.size != size:
+		print("\033[91m Image incomplete: %d of %d bytes\033[0m" % (img_hash.size, size))
+	REPORT.append(["Partition image", ['%s (%s): image/%s.img.gz' % (IMG_NAME, dev, IMG_NAME), '%d bytes%s' % (img_hash.size, '' if size == 0 or img_hash.size == size else ', INCOMPLETE (device reports %d)' % size), 'MD5: ' + digests[0], 'SHA-1: ' + digests[1], 'SHA-256: ' + digests[2]]])
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # DECODING DEFINITIONS FOR DATABASES
 # 
 
+# Gesture pattern index  # # # # # # # # # # # # # # # # # # #
+# gesture.key is the SHA-1 of the pattern's dot indices (0-8, row by row). The index
+# holds every valid 3x3 pattern of 4-9 dots as 20-byte SHA-1 + 9 dot bytes (0xff padded),
+# sorted by hash, so a key is found by binary search over the memory-mapped file.
+# It is built on first use next to the script, or in the user's cache folder where
+# the install cannot be written to.
+GESTURE_IDX = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gesture.idx')
+GESTURE_CACHE = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'andriller', 'gesture.idx')
+GIDX_MAGIC = b'ANDGIDX1'
+GIDX_REC = 29
+GIDX_COUNT = 389112		# valid patterns of 4 to 9 dots
+
+def gesture_patterns():
+	# dot a straight line passes over between two dots; it must already be in the pattern
+	over = {}
+	for a in range(9):
+		for b in range(9):
+			if a != b and (a//3 + b//3) % 2 == 0 and (a%3 + b%3) % 2 == 0:
+				over[(a, b)] = (a//3 + b//3)//2*3 + (a%3 + b%3)//2
+	def extend(pattern):
+		if len(pattern) >= 4:
+			yield bytes(pattern)
+		if len(pattern) < 9:
+			for dot in range(9):
+				if dot not in pattern and (over.get((pattern[-1], dot)) in pattern or (pattern[-1], dot) not in over):
+					yield from extend(pattern + [dot])
+	for dot in range(9):
+		yield from extend([dot])
+
+def gesture_index_path():
+	if os.path.isfile(GESTURE_IDX) or os.access(os.path.dirname(GESTURE_IDX), os.W_OK):
+		return GESTURE_IDX
+	return GESTURE_CACHE
+
+def build_gesture_index(path):
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	records = sorted([hashlib.sha1(p).digest() + p.ljust(9, b'\xff') for p in gesture_patterns()])
+	fileh = open(path+'.tmp', 'wb')
+	fileh.write(GIDX_MAGIC + struct.pack('<I', len(records)))
+	fileh.write(b''.join(records))
+	fileh.close()
+	os.replace(path+'.tmp', path)
+
+def open_gesture_index(path=None):
+	if path == None:
+		path = gesture_index_path()
+	if os.path.isfile(path) == False:
+		build_gesture_index(path)
+	fileh = open(path, 'rb')
+	gidx = mmap.mmap(fileh.fileno(), 0, access=mmap.ACCESS_READ)
+	fileh.close()
+	if gidx[:8] != GIDX_MAGIC or len(gidx) != 12 + struct.unpack('<I', gidx[8:12])[0] * GIDX_REC:
+		gidx.close()
+		raise ValueError('Corrupt gesture index: '+path)
+	return gidx
+
+def lookup_gesture(gkey, gidx):
+	lo = 0
+	hi = (len(gidx) - 12) // GIDX_REC
+	while lo < hi:
+		mid = (lo + hi) // 2
+		rec = 12 + mid * GIDX_REC
+		if gidx[rec:rec+20] < gkey:
+			lo = mid + 1
+		else:
+			hi = mid
+	rec = 12 + lo * GIDX_REC
+	if gidx[rec:rec+20] == gkey:
+		return list(gidx[rec+20:rec+GIDX_REC].rstrip(b'\xff'))
+
+# Checks completeness, order and every record's hash; returns a list of problems
+def verify_gesture_index(path=None):
+	gidx = open_gesture_index(path)
+	problems = []
+	count = struct.unpack('<I', gidx[8:12])[0]
+	if count != GIDX_COUNT:
+		problems.append('%d patterns, expected %d' % (count, GIDX_COUNT))
+	last = b''
+	for n in range(count):
+		rec = gidx[12+n*GIDX_REC:12+(n+1)*GIDX_REC]
+		if rec[:20] <= last:
+			problems.append('record %d out of order' % n)
+		if hashlib.sha1(rec[20:].rstrip(b'\xff')).digest() != rec[:20]:
+			problems.append('record %d hash mismatch' % n)
+		last = rec[:20]
+	for p in [b'\x00\x01\x02\x05\x08', b'\x06\x04\x02\x05', bytes(range(9))]:
+		if lookup_gesture(hashlib.sha1(p).digest(), gidx) != list(p):
+			problems.append('lookup failed for %s' % list(p))
+	gidx.close()
+	return problems
+# # # # #
+
 # Decode gesture.key  # # # # # # # # # # # # # # # # # # # # #
-def decode_gesturekey():
+def decode_gesturekey(con):
 	fileh = open(OUTPUT+SEP+'db'+SEP+'gesture.key', 'rb')
 	ges_data = fileh.read()
+	fileh.close()
 	if len(ges_data) == 20:
 		GKEY = hexlify(ges_data).decode('UTF-8')
-		REPORT.append(['Gesture pattern', '<a href="http://android.saz.lt/cgi-bin/online_pattern.py?encoded=%s" target="_blank">%s</a>' % (GKEY, GKEY)])
+		gidx = open_gesture_index()
+		GPAT = lookup_gesture(ges_data, gidx)
+		gidx.close()
+		if GPAT != None:
+			REPORT.append(['Gesture pattern', '%s (%s)' % ('-'.join([str(x) for x in GPAT]), GKEY)])
+		else:
+			REPORT.append(['Gesture pattern', 'Unknown (%s)' % GKEY])
 # # # # #
 
-REP_FOOTER = '</table>\n<p align="center"><i># <a href="http://android.saz.lt" target="_blank">http://android.saz.lt</a> #</i></p>\n</body></html>'
+# Decoder queries are read in batches of FETCH_ROWS and formatted as they arrive,
+# so no decoder holds a whole table in memory
+FETCH_ROWS = 1000
+
+def iter_rows(c):
+	while True:
+		rows = c.fetchmany(FETCH_ROWS)
+		if rows == []:
+			break
+		for row in rows:
+			yield row
+
+# Media store # # # # # # # # # # # # # # # # # # # # # # # # #
+# Media BLOBs are kept once per content, as media/<2 hex>/<sha256><ext> in the case
+# folder, and records refer to that path. Decoders only hash; a writer thread puts
+# new files on disk through a bounded queue. Workers decoding other files may write
+# the same content at the same time, so files are written aside and renamed in place.
+# BLOB cells larger than CHUNK_SIZE are read through SQLite blob I/O in CHUNK_SIZE
+# pieces, hashed and written as they are read, so none is held whole.
+MEDIA_QUEUE = 256	# BLOBs waiting for the writer thread
+MEDIA = None		# MediaStore of the running decoder worker
+
+class MediaStore:
+	def __init__(self, output):
+		self.output = output
+		self.known = set()
+		self.error = None
+		self.queue = queue.Queue(MEDIA_QUEUE)
+		self.thread = threading.Thread(target=self._writer, daemon=True)
+		self.thread.start()
+
+	def add(self, data, ext):
+		digest = hashlib.sha256(data).hexdigest()
+		path = 'media'+SEP+digest[:2]+SEP+digest+ext
+		if path not in self.known:
+			self.known.add(path)
+			self.queue.put((path, data))
+		return path
+
+	def add_blob(self, con, table, column, rowid, ext):
+		if hasattr(con, 'blobopen') == False:
+			return self.add(con.execute('SELECT %s FROM %s WHERE rowid=?' % (column, table), (rowid,)).fetchone()[0], ext)
+		with con.blobopen(table, column, rowid, readonly=True) as blob:
+			if len(blob) <= CHUNK_SIZE:
+				return self.add(blob.read(), ext)
+			os.makedirs(self.output+'media', exist_ok=True)
+			fileh = tempfile.NamedTemporaryFile(dir=self.output+'media', suffix='.part', delete=False)
+			try:
+				sha = hashlib.sha256()
+				for chunk in iter(lambda: blob.read(CHUNK_SIZE), b''):
+					sha.update(chunk)
+					fileh.write(chunk)
+				fileh.close()
+				digest = sha.hexdigest()
+				path = 'media'+SEP+digest[:2]+SEP+digest+ext
+				if path not in self.known and os.path.isfile(self.output+path) == False:
+					os.makedirs(os.path.dirname(self.output+path), exist_ok=True)
+					os.replace(fileh.name, self.output+path)
+				self.known.add(path)
+			finally:
+				fileh.close()
+				if os.path.isfile(fileh.name):
+					os.remove(fileh.name)
+		return path
+
+	def _writer(self):
+		while True:
+			item = self.queue.get()
+			if item == None:
+				break
+			if self.error != None:
+				continue
+			path = self.output+item[0]
+			try:
+				if os.path.isfile(path) == False:
+					os.makedirs(os.path.dirname(path), exist_ok=True)
+					fileh = open(path+'.%d.part' % os.getpid(), 'wb')
+					fileh.write(item[1])
+					fileh.close()
+					os.replace(path+'.%d.part' % os.getpid(), path)
+			except Exception as e:
+				self.error = e
+
+	def close(self):
+		self.queue.put(None)
+		self.thread.join()
+		if self.error != None:
+			print('\033[91m Media store failed: %r\033[0m' % self.error)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# TIMESTAMPS
+# Device databases keep times as Unix seconds, milliseconds, microseconds or
+# nanoseconds, or as WebKit/Chrome microseconds since 1601-01-01. The unit follows
+# from the magnitude (for dates 1973-2286 the ranges do not overlap), and times are
+# stored as Unix epoch seconds with the fraction kept. Report strings are formatted
+# once per distinct second in TIME_ZONE (None: the examiner's local time).
+#
+WEBKIT_EPOCH = 11644473600	# Seconds from 1601-01-01 to 1970-01-01
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+TIME_ZONE = None
+TIME_CACHE = 65536		# Formatted seconds kept
+
+# (lower bound, divisor, offset): value/divisor - offset gives Unix seconds
+TIME_UNITS = [
+(1e17, 1e9, 0),			# Unix nanoseconds
+(WEBKIT_EPOCH*1e6, 1e6, WEBKIT_EPOCH),	# WebKit/Chrome microseconds
+(1e14, 1e6, 0),			# Unix microseconds
+(1e11, 1e3, 0),			# Unix milliseconds
+(0, 1, 0)				# Unix seconds
+]
+
+def time_unit(value):
+	for unit in TIME_UNITS:
+		if abs(value) >= unit[0]:
+			return unit
+	return TIME_UNITS[-1]
+
+def norm_time(value):
+	if value == None or value == '':
+		return None
+	value = float(value)
+	unit = time_unit(value)
+	return value/unit[1] - unit[2]
+
+# One column of a fetched batch; when its smallest and largest values share a unit,
+# the whole column is converted with that unit in one pass
+def norm_times(values):
+	present = [float(x) for x in values if x != None and x != '']
+	if present == []:
+		return [None for x in values]
+	unit = time_unit(min(present, key=abs))
+	if unit != time_unit(max(present, key=abs)):
+		return [norm_time(x) for x in values]
+	div, off = unit[1], unit[2]
+	if len(present) == len(values):
+		return [x/div - off for x in present]
+	return [float(x)/div - off if x != None and x != '' else None for x in values]
+
+# Like iter_rows, with column 'column' of each batch normalized: yields (row, time)
+def iter_timed_rows(c, column):
+	while True:
+		rows = c.fetchmany(FETCH_ROWS)
+		if rows == []:
+			break
+		for item in zip(rows, norm_times([x[column] for x in rows])):
+			yield item
+
+@lru_cache(maxsize=TIME_CACHE)
+def fmt_second(sec):
+	return datetime.fromtimestamp(sec, TIME_ZONE).strftime(TIME_FORMAT)
+
+def fmt_time(t):
+	if t == None:
+		return ''
+	try:
+		return fmt_second(int(t // 1))
+	except (TypeError, ValueError, OverflowError, OSError):
+		return str(t)		# out of range for the platform's time functions
+
+# 'local', 'UTC', an offset such as '+02:00', or a tz database name
+def set_time_zone(name):
+	global TIME_ZONE, TIME_FORMAT
+	if name == 'local':
+		TIME_ZONE = None
+	elif name.upper() == 'UTC':
+		TIME_ZONE = timezone.utc
+	elif re.match('^[+-][0-9]{2}:?[0-9]{2}$', name):
+		offset = timedelta(hours=int(name[1:3]), minutes=int(name[-2:]))
+		TIME_ZONE = timezone(offset if name[0] == '+' else -offset)
+	else:
+		from zoneinfo import ZoneInfo
+		TIME_ZONE = ZoneInfo(name)
+	TIME_FORMAT = '%Y-%m-%d %H:%M:%S' if TIME_ZONE == None else '%Y-%m-%d %H:%M:%S %Z'
+	fmt_second.cache_clear()
+
+REP_SIGNATURE = '<p align="center"><i># <a href="http://android.saz.lt" target="_blank">http://android.saz.lt</a> #</i></p>\n</body></html>'
+REP_FOOTER = '</table>\n' + REP_SIGNATURE
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# DECODER REPORT PAGES
+# All decoder pages share one header template. Rows are buffered and written in
+# large blocks, cells are HTML-escaped unless they are RawHTML, and once a page holds
+# PAGE_ROWS rows the table continues on name_2.html, name_3.html, ...
+#
+PAGE_ROWS = 5000		# Table rows per report page
+WRITE_BUFFER = 262144	# Characters of rows collected before each write
+
+REP_HEADER = '<!DOCTYPE html><html><head>\n<title>%s Andriller Report for %s</title>\n<style>body,td,tr {font-family: Vernada, Arial, sans-serif; font-size: 12px;}</style></head>\n<body>\n<a href="REPORT.html">[Back]</a>\n<p align="center"><i># This report was generated using Andriller on %s #</i></p>\n<h3 align="center">[%s] %s</h3>\n%s<table border="1" cellpadding="2" cellspacing="0" align="center">\n<tr bgcolor="#72A0C1">%s</tr>\n'
+
+# Cell content that is already HTML
+class RawHTML(str):
+	pass
+
+def esc(value):
+	if value == None:
+		return ''
+	return html.escape(str(value))
+
+def esc_lines(values):
+	return RawHTML('<br/>'.join([esc(x) for x in values]))
+
+class ReportWriter:
+	# columns: [(heading, attributes of its th/td cells)]
+	def __init__(self, name, title, columns, page_rows=PAGE_ROWS):
+		self.name = name
+		self.title = title
+		self.page_rows = page_rows
+		self.heading = ''.join(['<th%s>%s</th>' % (' '+x[1] if x[1] else '', esc(x[0])) for x in columns])
+		self.cells = ['<td%s>' % (' '+x[1] if x[1] else '') for x in columns]
+		self.first = self.page_name(1)
+		self.count = 0
+		self.page = 0
+		self.page_count = 0
+		self.fileh = None
+		self.buf = []
+		self.buf_size = 0
+
+	def page_name(self, page):
+		if page == 1:
+			return self.name+'.html'
+		return '%s_%d.html' % (self.name, page)
+
+	def _open_page(self):
+		self.page += 1
+		self.page_count = 0
+		self.fileh = open(OUTPUT+self.page_name(self.page), 'w', encoding='UTF-8')
+		nav = ''
+		if self.page > 1:
+			nav = '<p align="center">Page %d | <a href="%s">Previous page</a></p>\n' % (self.page, self.page_name(self.page-1))
+		self.fileh.write(REP_HEADER % (esc(self.title), esc(IMEI), esc(LOCAL_TIME), esc(self.title), esc(IMEI), nav, self.heading))
+
+	def _close_page(self, more):
+		self.flush()
+		nav = ''
+		if more:
+			nav = '<p align="center"><a href="%s">Next page</a></p>\n' % self.page_name(self.page+1)
+		self.fileh.write('</table>\n' + nav + REP_SIGNATURE)
+		self.fileh.close()
+
+	def row(self, *values):
+		if self.fileh == None:
+			self._open_page()
+		elif self.page_count == self.page_rows:
+			self._close_page(True)
+			self._open_page()
+		line = '<tr>' + ''.join([td + (x if isinstance(x, RawHTML) else esc(x)) + '</td>' for td, x in zip(self.cells, values)]) + '</tr>\n'
+		self.buf.append(line)
+		self.buf_size += len(line)
+		self.count += 1
+		self.page_count += 1
+		if self.buf_size >= WRITE_BUFFER:
+			self.flush()
+
+	def flush(self):
+		if self.buf != []:
+			self.fileh.write(''.join(self.buf))
+			self.buf = []
+			self.buf_size = 0
+
+	def close(self):
+		if self.fileh == None:
+			self._open_page()
+		self._close_page(False)
+		return self.count
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# CASE STORE
+# Decoders write typed records into case.db in the case folder, and the HTML, CSV and
+# JSON reports are generated from it afterwards. Records are buffered per table and
+# inserted with executemany, one transaction per STORE_BATCH rows; the decoder worker
+# processes each hold their own connection. Times are Unix epoch seconds (see TIMESTAMPS).
+# Message texts and captions also go into the 'search' FTS5 table, in the same
+# transaction as their records, so the index is complete when decoding ends.
+#
+STORE_BATCH = 10000		# Records per insert transaction
+STORE = None		# CaseStore of this process, used by the decoders
+
+CASE_TABLES = [
+('contacts', ['contact_id INTEGER', 'name TEXT', 'numbers TEXT', 'emails TEXT', 'other TEXT']),
+('calls', ['source TEXT', 'id INTEGER', 'type TEXT', 'number TEXT', 'name TEXT', 'time REAL', 'duration INTEGER', 'contact TEXT']),
+('sms', ['id INTEGER', 'number TEXT', 'body TEXT', 'type TEXT', 'time REAL', 'contact TEXT']),
+('fb_messages', ['sender_id TEXT', 'sender TEXT', 'image TEXT', 'text TEXT', 'recipients TEXT', 'time REAL']),
+('fb_photos', ['source TEXT', 'id INTEGER', 'owner TEXT', 'src_small TEXT', 'src_big TEXT', 'caption TEXT', 'time REAL', 'thumbnail TEXT']),
+('wa_contacts', ['name TEXT', 'number TEXT', 'status TEXT']),
+('wa_messages', ['id INTEGER', 'number TEXT', 'text TEXT', 'time REAL', 'direction TEXT', 'media_name TEXT', 'media_type TEXT', 'thumbnail TEXT', 'latitude REAL', 'longitude REAL', 'contact TEXT']),
+('phonebook', ['source TEXT', 'contact_id TEXT', 'name TEXT', 'number TEXT', 'e164 TEXT']),
+('carved', ['source TEXT', 'source_table TEXT', 'region TEXT', 'page INTEGER', 'byte_offset INTEGER', 'record TEXT'])
+]
+CASE_INDEXES = [
+('calls', 'number'), ('calls', 'time'),
+('sms', 'number'), ('sms', 'time'),
+('fb_messages', 'sender_id'), ('fb_messages', 'time'),
+('fb_photos', 'owner'), ('fb_photos', 'time'),
+('wa_contacts', 'number'),
+('wa_messages', 'number'), ('wa_messages', 'time'),
+('phonebook', 'e164'),
+('carved', 'source')
+]
+# table -> (source label, text, time and counterpart positions in its records)
+SEARCH_SOURCES = {
+'sms': ('SMS', 2, 4, 1),
+'wa_messages': ('WhatsApp', 2, 3, 1),
+'fb_messages': ('Facebook message', 3, 5, 1),
+'fb_photos': ('Facebook photo', 5, 6, 2)
+}
+SEARCH_TABLE = "CREATE VIRTUAL TABLE search USING fts5(text, source UNINDEXED, time UNINDEXED, counterpart UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+
+class CaseStore:
+	def __init__(self, path):
+		self.con = sq.connect(path, timeout=600)
+		self.con.execute("PRAGMA synchronous=NORMAL")
+		self.pending = {}
+		self.insert = dict([(x[0], "INSERT INTO %s VALUES (%s)" % (x[0], ','.join(['?' for y in x[1]]))) for x in CASE_TABLES])
+		self.search = self.con.execute("SELECT count(*) FROM sqlite_master WHERE name='search'").fetchone()[0] != 0
+
+	# Empty store; indexes are only built by index(), once all records are in
+	def create(self):
+		self.con.execute("PRAGMA journal_mode=WAL")
+		for table, columns in CASE_TABLES:
+			self.con.execute("DROP TABLE IF EXISTS %s" % table)
+			self.con.execute("CREATE TABLE %s (%s)" % (table, ', '.join(columns)))
+		self.con.execute("DROP TABLE IF EXISTS search")
+		try:
+			self.con.execute(SEARCH_TABLE)
+			self.search = True
+		except sq.OperationalError:
+			# SQLite built without FTS5
+			print("\033[91m No full-text search index: this SQLite has no FTS5\033[0m")
+			self.search = False
+		self.con.commit()
+
+	def index(self):
+		for table, column in CASE_INDEXES:
+			self.con.execute("CREATE INDEX IF NOT EXISTS %s_%s ON %s (%s)" % (table, column, table, column))
+		if self.search:
+			# one b-tree per term instead of one per flushed batch
+			self.con.execute("INSERT INTO search(search) VALUES('optimize')")
+		self.con.execute("ANALYZE")
+		self.con.commit()
+
+	def add(self, table, record):
+		rows = self.pending.setdefault(table, [])
+		rows.append(record)
+		if len(rows) >= STORE_BATCH:
+			self.flush(table)
+
+	def flush(self, table=None):
+		for table in ([table] if table != None else list(self.pending)):
+			rows = self.pending.pop(table, [])
+			if rows != []:
+				with self.con:
+					self.con.executemany(self.insert[table], rows)
+					if self.search and table in SEARCH_SOURCES:
+						label, text, stamp, party = SEARCH_SOURCES[table]
+						self.con.executemany("INSERT INTO search VALUES (?,?,?,?)", [(x[text], label, x[stamp], x[party]) for x in rows if x[text] != None and x[text] != ''])
+
+	def count(self, table):
+		return self.con.execute("SELECT count(*) FROM %s" % table).fetchone()[0]
+
+	def close(self):
+		self.flush()
+		self.con.close()
+
+def open_case_store(output):
+	global STORE
+	STORE = CaseStore(output+'case.db')
+	return STORE
+
+# Full-text search  # # # # # # # # # # # # # # # # # # # # # #
+SEARCH_LIMIT = 50		# Hits returned per query
+
+# Best hits first, as (source, time, counterpart, snippet); terms are FTS5 query
+# syntax, and are searched as plain words when that does not parse
+def search_case(store, terms, limit=SEARCH_LIMIT):
+	query = "SELECT source,time,counterpart,snippet(search,0,'[',']','...',16) FROM search WHERE search MATCH ? ORDER BY rank LIMIT ?"
+	try:
+		return store.con.execute(query, (terms, limit)).fetchall()
+	except sq.OperationalError:
+		words = ' '.join(['"%s"' % x.replace('"', '""') for x in terms.split()])
+		return store.con.execute(query, (words, limit)).fetchall()
+
+def print_search(CASE_DIR, terms):
+	if os.path.isfile(os.path.join(CASE_DIR, 'case.db')) == False:
+		print("\033[91m No case.db in %s; decode it first\033[0m" % CASE_DIR)
+		return
+	store = CaseStore(os.path.join(CASE_DIR, 'case.db'))
+	if store.search == False:
+		print("\033[91m No search index in %s; decode it again\033[0m" % CASE_DIR)
+		store.close()
+		return
+	t_beg = time.time()
+	hits = search_case(store, terms)
+	t_run = time.time() - t_beg
+	store.close()
+	for hit in hits:
+		print(' %s  %-16s %-20s %s' % (fmt_time(hit[1]), hit[0], hit[2] if hit[2] != None else '', hit[3].replace('\n', ' ')))
+	print("\033[94m %d hits for '%s' in %.1f ms\033[0m" % (len(hits), terms, t_run*1000))
+
+# Indexes a synthetic SMS corpus through the case store, then times a few queries.
+# Words are drawn from a SEARCH_VOCAB word vocabulary with a long-tailed (log-uniform)
+# frequency, so queries cover common, ordinary and rare words.
+SEARCH_VOCAB = 50000
+
+def bench_search(messages=2000000):
+	bench_dir = tempfile.mkdtemp(prefix='andriller_bench_')
+	rand = random.Random(1)
+	store = CaseStore(bench_dir+SEP+'case.db')
+	store.create()
+	t_beg = time.time()
+	for n in range(messages):
+		body = ' '.join(['w%d' % int(SEARCH_VOCAB ** rand.random()) for k in range(rand.randint(4, 16))])
+		store.add('sms', (n, '+4477009%05d' % (n % 50000), body, 'Inbox', 1380000000+n, None))
+	store.flush()
+	store.index()
+	t_run = time.time() - t_beg
+	print(" Indexed %d messages in %.2fs, %d messages/s, %.0f MB" % (messages, t_run, messages/t_run, os.path.getsize(bench_dir+SEP+'case.db')/1048576.0))
+	for terms in ['w1', 'w25', 'w300', 'w4000', 'w40000', 'w300 w4000', '"w2 w3"', 'w4000*', 'nowhere']:
+		t_beg = time.time()
+		hits = search_case(store, terms)
+		t_run = time.time() - t_beg
+		matches = store.con.execute("SELECT count(*) FROM search WHERE search MATCH ?", (terms,)).fetchone()[0]
+		print(" %-12s %8d matches, best %d in %.1f ms" % (terms, matches, len(hits), t_run*1000))
+	store.close()
+	shutil.rmtree(bench_dir)
+
+# Brute force lockscreen PIN  # # # # # # # # # # # # # # # # #
+# password.key holds SHA-1 (40 hex) followed by MD5 (32 hex) of PIN+salt, where the
+# salt is lockscreen.password_salt from settings.db written as unsigned 64-bit hex.
+# The search space is cut into blocks that a process pool works through, shortest
+# PINs first; the pool is terminated as soon as one block returns a match.
+# Passwords use the same key layout, so only numeric password types are searched.
+PIN_MIN = 4			# Shortest PIN tried, in digits
+PIN_MAX = 6			# Longest PIN tried, in digits; longer searches with --pin-max
+PIN_BLOCK = 200000	# PIN candidates per pool task
+PIN_WORKERS = os.cpu_count() or 1
+
+def crack_pin_block(task):
+	pwsha1, salt, digits, start, stop = task
+	sha1 = hashlib.sha1
+	for pin in range(start, stop):
+		pin = b'%0*d' % (digits, pin)
+		if sha1(pin+salt).digest() == pwsha1:
+			return pin.decode('ascii')
+
+def pin_blocks(pwsha1, salt, min_digits, max_digits):
+	for digits in range(min_digits, max_digits+1):
+		for start in range(0, 10**digits, PIN_BLOCK):
+			yield (pwsha1, salt, digits, start, min(start+PIN_BLOCK, 10**digits))
+
+def crack_pin(pwkey, pwsalt, min_digits=PIN_MIN, max_digits=PIN_MAX, workers=PIN_WORKERS):
+	pwkey = pwkey.strip().upper()
+	pwsha1 = bytes.fromhex(pwkey[:40])
+	salt = ('%x' % (pwsalt & 0xffffffffffffffff)).encode('ascii')	# encoded once
+	pool = Pool(workers)
+	try:
+		for pin in pool.imap_unordered(crack_pin_block, pin_blocks(pwsha1, salt, min_digits, max_digits)):
+			if pin != None:
+				# the MD5 half must agree as well, or it is a different key layout
+				if len(pwkey) < 72 or hashlib.md5((pin.encode('ascii')+salt)).hexdigest().upper() == pwkey[40:72]:
+					return pin
+	finally:
+		pool.terminate()
+		pool.join()
 
-# Brute force 4-digit password  # # # # # # # # # # # # # # # #
 def decode_pwkey(pwkey, pwsalt):
-	for pin in range(0,10000):
-		pin = str(pin).zfill(4)
-		salt = '%x' % pwsalt
-		h = hashlib.sha1((str(pin)+str(salt)).encode('ascii')).hexdigest()
-		if h.upper() == pwkey[:40]:
-			return pin
+	return crack_pin(pwkey, pwsalt, PIN_MIN, PIN_MAX)
+
+# lockscreen.password_type (DevicePolicyManager quality) -> label
+PASSWORD_TYPES = {65536: 'pattern', 131072: 'numeric', 196608: 'numeric (complex)', 262144: 'alphabetic', 327680: 'alphanumeric', 393216: 'complex'}
+NUMERIC_TYPES = [131072, 196608]
+
+# From settings.db, or locksettings.db on Android 4.2 and later; None when not set
+def lock_password_type(c):
+	rows = c.execute("SELECT value FROM secure WHERE name = 'lockscreen.password_type'").fetchall()
+	if rows == [] and 'locksettings.db' in DLLS:
+		con = open_db_readonly('locksettings.db')
+		if con != None:
+			try:
+				rows = con.execute("SELECT value FROM locksettings WHERE name = 'lockscreen.password_type' ORDER BY user").fetchall()
+			except sq.Error:
+				rows = []
+			con.close()
+	try:
+		return int(rows[0][0])
+	except (IndexError, TypeError, ValueError):
+		return None
+
+# Times an exhaustive search (a key no PIN matches) over one PIN length
+def bench_pin(digits, workers=PIN_WORKERS):
+	t_beg = time.time()
+	crack_pin('0'*72, 0, digits, digits, workers)
+	t_run = time.time() - t_beg
+	print(" PIN cracker: %d-digit space, %d candidates in %.2fs, %d candidates/s (%d workers)" % (digits, 10**digits, t_run, 10**digits/t_run, workers))
 # # # # #
 
 # Decode settings.db  # # # # # # # # # # # # # # # # # # # # #
-def decode_settingsdb():
-	con = sq.connect(OUTPUT+SEP+'db'+SEP+'settings.db')
+def decode_settingsdb(con):
 	c = con.cursor()
 	c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='secure'")
 	if c.fetchone() != None:
 		c.execute("SELECT value FROM secure WHERE name = 'bluetooth_address'")
-		BT_MAC = c.fetchone()
+		BT_MAC = (c.fetchone() or [None])[0]
 		c.execute("SELECT value FROM secure WHERE name = 'bluetooth_name'")
-		BT_NAME = c.fetchone()
+		BT_NAME = (c.fetchone() or [None])[0]
 		c.execute("SELECT value FROM secure WHERE name = 'android_id'")
-		AN_ID = c.fetchone(); REPORT.insert(1, ["Android ID", AN_ID])
+		AN_ID = (c.fetchone() or [None])[0]; REPORT.insert(1, ["Android ID", AN_ID])
 		c.execute("SELECT value FROM secure WHERE name = 'lockscreen.password_salt'")
 		try:
 			PW_SALT = int(c.fetchone()[0])
 		except:
 			PW_SALT = None
-		con.close()
 		if BT_MAC != None:
 			for findlt in REPORT:
 				if 'Local time' in findlt:
@@ -330,367 +1457,217 @@ def decode_settingsdb():
 			if 'password.key' in DLLS:
 				fileh = open(OUTPUT+SEP+'db'+SEP+'password.key', 'r')
 				PW_KEY = fileh.read(); fileh.close()
-				if len(PW_KEY) == 72:
+				PW_TYPE = lock_password_type(c)
+				if PW_TYPE != None and PW_TYPE not in NUMERIC_TYPES:
+					REPORT.append(["Lockscreen password", "%s, not searched" % PASSWORD_TYPES.get(PW_TYPE, 'type %d' % PW_TYPE)])
+				elif len(PW_KEY.strip()) == 72:
 					PW_PIN = decode_pwkey(PW_KEY, PW_SALT)
-					if PW_PIN != None or PW_PIN != '':
+					if PW_PIN != None:
 						REPORT.append(["Lockscreen PIN", PW_PIN])
+					else:
+						REPORT.append(["Lockscreen PIN", "not found in %d to %d digits" % (PIN_MIN, PIN_MAX)])
 
 # # # # # 
 
 # Decode contacts2.db (Pbook) # # # # # # # # # # # # # # # # #
-def decode_contacts2db():
-	rep_title = 'Contacts'
-	con = sq.connect(OUTPUT+SEP+'db'+SEP+'contacts2.db')
+def decode_contacts2db(con):
 	c = con.cursor()
 	c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='data'")
 	if c.fetchone() != None:
-		c.execute("SELECT raw_contact_id, mimetypes.mimetype, data1 FROM data JOIN mimetypes ON (data.mimetype_id=mimetypes._id) ORDER BY raw_contact_id")
+		# data4 of a phone_v2 row is the number in E.164 form, where the device set it
+		c2_e164 = 'data4' if 'data4' in [x[1] for x in c.execute("PRAGMA table_info(data)")] else 'NULL'
+		c.execute("SELECT raw_contact_id, mimetypes.mimetype, data1, %s FROM data JOIN mimetypes ON (data.mimetype_id=mimetypes._id) ORDER BY raw_contact_id" % c2_e164)
 		#c.execute("SELECT raw_contact_id, mimetypes.mimetype, data1 FROM data JOIN mimetypes ON (data.mimetype_id=mimetypes._id) JOIN visible_contacts ON (data.raw_contact_id=visible_contacts._id) ORDER BY raw_contact_id")
-		c2_data = c.fetchall()
-		con.close()
-		if c2_data != '':
-			fileh = open(OUTPUT+'contacts.html', 'w', encoding='UTF-8')
-			fileh.write('<!DOCTYPE html><html><head>\n<title>%s Andriller Report for %s</title>\n<style>body,td,tr {font-family: Vernada, Arial, sans-serif; font-size: 12px;}</style></head>\n<body>\n<a href="REPORT.html">[Back]</a>\n<p align="center"><i># This report was generated using Andriller on %s #</i></p>\n<h3 align="center">[%s] %s</h3>\n<table border="1" cellpadding="2" cellspacing="0" align="center">\n<tr bgcolor="#72A0C1"><th nowrap>#</th><th nowrap>Name</th><th nowrap>Number</th><th nowrap>Email</th><th>Other</th></tr>' % (str(rep_title), str(IMEI), str(LOCAL_TIME), str(rep_title), str(IMEI)))
-			pbook = []; tD = {}
-			for c2_item in c2_data:
-				c2key = str(c2_item[0])
+		# rows arrive ordered by raw_contact_id, so each contact is stored once its rows are read
+		for c2key, c2_items in groupby(iter_rows(c), key=lambda x: x[0]):
+			pb = {}
+			pb_phones = []
+			for c2_item in c2_items:
 				c2typ = c2_item[1].split('/')[1]
 				c2dat = c2_item[2]
 				if c2dat != None and c2dat != '':
-					if tD.get('index_key') == c2key:
-						if c2typ in tD:
-							tD[c2typ] = tD[c2typ]+'<br/>'+c2dat
-						else:
-							tD[c2typ] = c2dat
-					else:
-						if len(tD) > 0:
-							pbook.append(tD); tD = {}
-							tD['index_key'] = c2key
-							tD[c2typ] = c2dat
-						else:
-							tD['index_key'] = c2key
-							tD[c2typ] = c2dat
-			pbook.append(tD); del tD
-			for pb in pbook:
-				pb_index = pb.pop('index_key')
-				try:
-					pb_name = pb.pop('name')
-				except KeyError:
-					pb_name = ''
-				try:
-					pb_number = pb.pop('phone_v2')
-				except KeyError:
-					pb_number = ''
-				try:
-					pb_email = pb.pop('email_v2')
-				except KeyError:
-					pb_email = ''
-				try:
-					pb_other = ''.join([(x+': '+pb[x]+'<br/>\n') for x in pb])
-				except:
-					pb_other = ''
-				fileh.write('<tr><td nowrap>%s</td><td nowrap>%s</td><td nowrap>%s</td><td nowrap>%s</td><td>%s</td></tr>\n' % (pb_index, pb_name, pb_number, pb_email, pb_other))
-			fileh.write(REP_FOOTER)
-			fileh.close()
-			REPORT.append(['Communications data', '<a href="contacts.html">%s (%d)</a>' % (rep_title, len(pbook))])
+					pb.setdefault(c2typ, []).append(str(c2dat))
+					if c2typ == 'phone_v2':
+						pb_phones.append((str(c2dat), c2_item[3]))
+			if pb == {}:
+				continue
+			pb_name = '\n'.join(pb.pop('name', []))
+			pb_number = '\n'.join(pb.pop('phone_v2', []))
+			pb_email = '\n'.join(pb.pop('email_v2', []))
+			STORE.add('contacts', (c2key, pb_name, pb_number, pb_email, dumps(pb) if pb != {} else None))
+			for pb_phone, pb_e164 in pb_phones:
+				STORE.add('phonebook', ('contacts2.db', c2key, pb_name.split('\n')[0], pb_phone, pb_e164))
 # # # # #
 
+CALL_TYPES = {1: 'Received', 2: 'Dialled', 3: 'Missed', 5: 'Rejected'}
+
+# Call log rows are laid out the same in contacts2.db (calls) and logs.db (logs)
+def store_call_rows(source, rows):
+	for c2_item, c2_time in rows:
+		c2_type = CALL_TYPES.get(c2_item[1], 'Type('+str(c2_item[1])+')')		# type
+		c2_number = str(c2_item[2])		# number
+		if int(c2_number) <= 0:
+			c2_number = 'UNKNOWN'
+		STORE.add('calls', (source, c2_item[0], c2_type, c2_number, c2_item[3], c2_time, c2_item[5], None))
+
 # Decode contacts2.db (Calls) # # # # # # # # # # # # # # # # #
-def decode_calls_contacts2db():
-	rep_title = 'Call logs'
-	con = sq.connect(OUTPUT+'db'+SEP+'contacts2.db')
+def decode_calls_contacts2db(con):
 	c = con.cursor()
 	c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='calls'")
 	if c.fetchone() != None:	# check if table exists
 		c.execute("SELECT _id,type,number,name,date,duration FROM calls ORDER by date DESC")
-		c2_data = c.fetchall()
-		con.close()
-		if c2_data != []:
-			fileh = open(OUTPUT+'call_logs.html', 'w', encoding='UTF-8')
-			fileh.write('<!DOCTYPE html><html><head>\n<title>%s Andriller Report for %s</title>\n<style>body,td,tr {font-family: Vernada, Arial, sans-serif; font-size: 12px;}</style></head>\n<body>\n<a href="REPORT.html">[Back]</a>\n<p align="center"><i># This report was generated using Andriller on %s #</i></p>\n<h3 align="center">[%s] %s</h3>\n<table border="1" cellpadding="2" cellspacing="0" align="center">\n<tr bgcolor="#72A0C1"><th>#</th><th>Type</th><th>Number</th><th>Name</th><th>Time</th><th>Duration</th></tr>' % (str(rep_title), str(IMEI), str(LOCAL_TIME), str(rep_title), str(IMEI)))
-			for c2_item in c2_data:
-				c2_id = str(c2_item[0])		# id
-				c2_type_raw = c2_item[1]	# type
-				if c2_type_raw == 1:
-					c2_type = 'Received'
-				elif c2_type_raw == 2:
-					c2_type = 'Dialled'
-				elif c2_type_raw == 3:
-					c2_type = 'Missed'
-				elif c2_type_raw == 5:
-					c2_type = 'Rejected'
-				else:
-					c2_type = 'Type('+str(c2_type_raw)+')'
-				c2_number = str(c2_item[2])		# number
-				if int(c2_number) <= 0:
-					c2_number = 'UNKNOWN'
-				c2_name = c2_item[3]		# name
-				if c2_name == None:
-					c2_name = ''
-				c2_date = datetime.fromtimestamp(int(str(c2_item[4])[:10])).strftime('%Y-%m-%d %H:%M:%S')
-				c2_dur = str(timedelta(seconds=c2_item[5]))		# duration
-				fileh.write('<tr><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td></tr>\n' % (str(c2_id), str(c2_type), str(c2_number), str(c2_name), str(c2_date), str(c2_dur), ))
-			fileh.write(REP_FOOTER)
-			fileh.close()
-			REPORT.append(['Communications data', '<a href="call_logs.html">%s (%d)</a>' % (rep_title, len(c2_data))])
+		store_call_rows('contacts2.db', iter_timed_rows(c, 4))
 # # # # #
 
 # Decode logs.db (Samsung Calls(SEC)) # # # # # # # # # # # # # # # # #
-def decode_logsdb():
-	rep_title = 'Samsung Call logs'
-	con = sq.connect(OUTPUT+'db'+SEP+'logs.db')
+def decode_logsdb(con):
 	c = con.cursor()
 	c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='logs'")
 	if c.fetchone() != None:
 		c.execute("SELECT _id,type,number,name,date,duration FROM logs WHERE logtype='100' ORDER by date DESC")
-		sec_data = c.fetchall()
-		con.close()
-		fileh = open(OUTPUT+'sec_call_logs.html', 'w', encoding='UTF-8')
-		fileh.write('<!DOCTYPE html><html><head>\n<title>%s Andriller Report for %s</title>\n<style>body,td,tr {font-family: Vernada, Arial, sans-serif; font-size: 12px;}</style></head>\n<body>\n<a href="REPORT.html">[Back]</a>\n<p align="center"><i># This report was generated using Andriller on %s #</i></p>\n<h3 align="center">[%s] %s</h3>\n<table border="1" cellpadding="2" cellspacing="0" align="center">\n<tr bgcolor="#72A0C1"><th>#</th><th>Type</th><th>Number</th><th>Name</th><th>Time</th><th>Duration</th></tr>' % (str(rep_title), str(IMEI), str(LOCAL_TIME), str(rep_title), str(IMEI)))
-		for sec_item in sec_data:
-			sec_id = str(sec_item[0])		# id
-			sec_type_raw = sec_item[1]	# type
-			if sec_type_raw == 1:
-				sec_type = 'Received'
-			elif sec_type_raw == 2:
-				sec_type = 'Dialled'
-			elif sec_type_raw == 3:
-				sec_type = 'Missed'
-			elif sec_type_raw == 5:
-				sec_type = 'Rejected'
-			else:
-				sec_type = 'Type('+str(sec_type_raw)+')'
-			sec_number = str(sec_item[2])		# number
-			if int(sec_number) <= 0:
-				sec_number = 'UNKNOWN'
-			sec_name = sec_item[3]		# name
-			if sec_name == None:
-				sec_name = ''
-			sec_date = datetime.fromtimestamp(int(str(sec_item[4])[:10])).strftime('%Y-%m-%d %H:%M:%S')
-			sec_dur = str(timedelta(seconds=sec_item[5]))		# duration
-			fileh.write('<tr><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td></tr>\n' % (str(sec_id), str(sec_type), str(sec_number), str(sec_name), str(sec_date), str(sec_dur), ))
-		fileh.write(REP_FOOTER)
-		fileh.close()
-		REPORT.append(['Communications data', '<a href="sec_call_logs.html">%s (%d)</a>' % (rep_title, len(sec_data))])
+		store_call_rows('logs.db', iter_timed_rows(c, 4))
 # # # # #
 
+SMS_TYPES = {1: 'Inbox', 2: 'Sent', 3: 'Draft', 5: 'Sending failed', 6: 'Sent'}
+
 # Decode mmssms.db  # # # # # # # # # # # # # # # # # # # # # #
-def decode_mmssmsdb():
-	rep_title = 'SMS Messages'
-	con = sq.connect(OUTPUT+'db'+SEP+'mmssms.db')
+def decode_mmssmsdb(con):
 	c = con.cursor()
 	c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='sms'")
 	if c.fetchone() != None:
 		c.execute("SELECT address,body,date,type,_id FROM sms ORDER by sms.date DESC")
-		sms_data = c.fetchall()
-		con.close()
-		fileh = open(OUTPUT+'mmssms.html', 'w', encoding='UTF-8')
-		fileh.write('<!DOCTYPE html><html><head>\n<title>%s Andriller Report for %s</title>\n<style>body,td,tr {font-family: Vernada, Arial, sans-serif; font-size: 12px;}</style></head>\n<body>\n<a href="REPORT.html">[Back]</a>\n<p align="center"><i># This report was generated using Andriller on %s #</i></p>\n<h3 align="center">[%s] %s</h3>\n<table border=1 cellpadding=2 cellspacing=0 align=center>\n<tr bgcolor=#72A0C1><th>#</th><th>Number</th><th width="500">Message</th><th>Type</th><th nowrap>Time</th></tr>\n' % (str(rep_title), str(IMEI), str(LOCAL_TIME), str(rep_title), str(IMEI)))
-		for sms_item in sms_data:
-			sms_number = str(sms_item[0])
-			sms_text = str(sms_item[1])
-			sms_time = datetime.fromtimestamp(int(str(sms_item[2])[:10])).strftime('%Y-%m-%d %H:%M:%S')
-			if sms_item[3] == 1:
-				sms_typ = "Inbox"
-			elif sms_item[3] == 2:
-				sms_typ = "Sent"
-			elif sms_item[3] == 3:
-				sms_typ = "Draft"
-			elif sms_item[3] == 5:
-				sms_typ = "Sending failed"
-			elif sms_item[3] == 6:
-				sms_typ = "Sent"
-			else:
-				sms_typ = "Type"+"("+str(sms_item[3])+")"
-			sms_index = sms_item[4]
-			fileh.write('<tr><td>%s</td><td>%s</td><td width="500">%s</td><td>%s</td><td nowrap>%s</td></tr>\n' % (str(sms_index),sms_number,sms_text,sms_typ,sms_time))
-		fileh.write(REP_FOOTER)
-		fileh.close()
-		REPORT.append(['Communications data', '<a href="mmssms.html">%s (%d)</a>' % (rep_title, len(sms_data))])
+		for sms_item, sms_time in iter_timed_rows(c, 2):
+			sms_typ = SMS_TYPES.get(sms_item[3], 'Type('+str(sms_item[3])+')')
+			STORE.add('sms', (sms_item[4], sms_item[0], sms_item[1], sms_typ, sms_time, None))
 # # # # # 
 
 # Decode threads_db2 # # # # # # # # # # # # # # # # # # #
-def decode_threads_db2():
-	rep_title = 'Facebook: Messages'
-	con = sq.connect(OUTPUT+SEP+'db'+SEP+'threads_db2')
+def decode_threads_db2(con):
 	c = con.cursor()
 	c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='messages'")
 	if c.fetchone() != None:
-		c.execute("SELECT sender,threads.participants,text,messages.timestamp_ms FROM messages JOIN threads ON (messages.thread_id=threads.thread_id) WHERE NOT messages.timestamp_ms='0' ORDER BY messages.timestamp_ms DESC")
-		fbt_data = c.fetchall()
+		# user_key -> (name, picture url), looked up per message instead of scanning all users
+		fbt_users = {}
 		c.execute("SELECT user_key,name,profile_pic_square FROM thread_users")
-		fbt_users = c.fetchall()
-		con.close()
-		if fbt_data != '':
-			fileh = open(OUTPUT+SEP+'fb_messages.html', 'w', encoding='UTF-8')
-			fileh.write('<!DOCTYPE html><html><head>\n<title>%s Andriller Report for %s</title>\n<style>body,td,tr {font-family: Vernada, Arial, sans-serif; font-size: 12px;}</style></head>\n<body>\n<a href="REPORT.html">[Back]</a>\n<p align="center"><i># This report was generated using Andriller on %s #</i></p>\n<h3 align="center">[%s] %s</h3>\n<table border="1" cellpadding="2" cellspacing="0" align="center">\n<tr bgcolor="#72A0C1"><th nowrap>Sender</th><th nowrap>Image</th><th width="500">Message</th><th nowrap>Recipient(s)</th><th>Time</th></tr>' % (str(rep_title), str(IMEI), str(LOCAL_TIME), str(rep_title), str(IMEI)))
-			for fbt_item in fbt_data:
+		for fbu_item in iter_rows(c):
+			try:
+				fbt_users[fbu_item[0]] = (fbu_item[1], loads(fbu_item[2])[0].get('url'))
+			except:
+				fbt_users[fbu_item[0]] = (fbu_item[1], '')
+		c.execute("SELECT thread_id,participants FROM threads")
+		fbt_threads = dict(iter_rows(c))
+		fbt_senders = {}	# sender JSON -> (name, user_key), parsed once per distinct sender
+		fbt_recips = {}		# (thread_id, sender) -> recipients, parsed once per thread and sender
+		c.execute("SELECT sender,messages.thread_id,text,messages.timestamp_ms FROM messages JOIN threads ON (messages.thread_id=threads.thread_id) WHERE NOT messages.timestamp_ms='0' ORDER BY messages.timestamp_ms DESC")
+		for fbt_item, fbt_time in iter_timed_rows(c, 3):
+			if fbt_item[0] not in fbt_senders:
 				if fbt_item[0] != None:
-					fbt_sender_nm = loads(fbt_item[0]).get('name')
-					fbt_sender_id = loads(fbt_item[0]).get('user_key')
+					fbt_sender = loads(fbt_item[0])
+					fbt_senders[fbt_item[0]] = (fbt_sender.get('name'), fbt_sender.get('user_key'))
 				else:
-					fbt_sender_nm = ''
-					fbt_sender_id = ''
-				for fbimgs in fbt_users:
-					if fbimgs[0] == fbt_sender_id:
-						fbt_img = loads(fbimgs[2])[0].get('url')
-				fbt_text = fbt_item[2]
-				fbt_time = datetime.fromtimestamp(int(str(fbt_item[3])[:10])).strftime('%Y-%m-%d %H:%M:%S')
+					fbt_senders[fbt_item[0]] = ('', '')
+			fbt_sender_nm, fbt_sender_id = fbt_senders[fbt_item[0]]
+			fbt_img = fbt_users.get(fbt_sender_id, ('', ''))[1]
+			fbt_key = (fbt_item[1], fbt_sender_id)
+			if fbt_key not in fbt_recips:
 				fbt_part = []
-				for fbtdic in loads(fbt_item[1]):
+				for fbtdic in loads(fbt_threads[fbt_item[1]]):
 					fbt_part.append(fbtdic.get('name')+' (ID:'+fbtdic.get('user_key').split(':')[1]+')')
 				try:
 					fbt_part.remove(fbt_sender_nm+' (ID:'+fbt_sender_id.split(':')[1]+')')
 				except:
 					pass
-				fbt_parti = '<br/>'.join(fbt_part)
-				fileh.write('<tr><td nowrap><a href="http://www.facebook.com/profile.php?id=%s">%s</a></td><td><img src="%s"></td><td width="500">%s</td><td nowrap>%s</td><td nowrap>%s</td></tr>\n' % (fbt_sender_id.split(':')[1], fbt_sender_nm, fbt_img, fbt_text, fbt_parti, str(fbt_time)))
-			fileh.write(REP_FOOTER)
-			fileh.close()
-			REPORT.append(['Applications data', '<a href="fb_messages.html">%s (%d)</a>' % (rep_title, len(fbt_data))])
+				fbt_recips[fbt_key] = '\n'.join(fbt_part)
+			STORE.add('fb_messages', (fbt_sender_id.split(':')[-1], fbt_sender_nm, fbt_img, fbt_item[2], fbt_recips[fbt_key], fbt_time))
+
+# Decodes a synthetic threads_db2 of the given size in a temporary folder
+def bench_threads_db2(messages=500000, users=5000, threads=2000):
+	bench_dir = tempfile.mkdtemp(prefix='andriller_bench_')
+	os.mkdir(bench_dir+SEP+'db')
+	con = sq.connect(bench_dir+SEP+'db'+SEP+'threads_db2')
+	con.execute("CREATE TABLE thread_users (user_key TEXT, name TEXT, profile_pic_square TEXT)")
+	con.execute("CREATE TABLE threads (thread_id TEXT, participants TEXT)")
+	con.execute("CREATE TABLE messages (msg_id TEXT, thread_id TEXT, sender TEXT, text TEXT, timestamp_ms INTEGER)")
+	fb_user = lambda n: {'name': 'User %d' % n, 'user_key': 'FACEBOOK:%d' % (100000+n)}
+	con.executemany("INSERT INTO thread_users VALUES (?,?,?)", [('FACEBOOK:%d' % (100000+n), 'User %d' % n, dumps([{'url': 'http://example.com/%d.jpg' % n}])) for n in range(users)])
+	con.executemany("INSERT INTO threads VALUES (?,?)", [('t%d' % t, dumps([fb_user((t*7+k) % users) for k in range(4)])) for t in range(threads)])
+	con.executemany("INSERT INTO messages VALUES (?,?,?,?,?)", (('m%d' % n, 't%d' % (n % threads), dumps(fb_user(((n % threads)*7 + n % 4) % users)), 'Message %d' % n, 1380000000000+n*1000) for n in range(messages)))
+	con.commit()
+	con.close()
+	CaseStore(bench_dir+SEP+'case.db').create()
+	decode_worker_init(bench_dir+SEP, 'BENCHMARK', time.strftime('%Y-%m-%d %H:%M:%S %Z'))
+	con = open_db_readonly('threads_db2')
+	t_beg = time.time()
+	decode_threads_db2(con)
+	STORE.flush()
+	t_run = time.time() - t_beg
+	con.close()
+	STORE.close()
+	shutil.rmtree(bench_dir)
+	print(" threads_db2: %d messages, %d users decoded in %.2fs, %d messages/s" % (messages, users, t_run, messages/t_run))
 # # # # #
 
-# Decode photos_db # # # # # # # # # # # # # # # # # # # # # # #
-def decode_photos_db():
-	rep_title = 'Facebook: Viewed Photos'
-	con = sq.connect(OUTPUT+'db'+SEP+'photos_db')
+# Facebook photos tables are laid out the same in photos_db and fb.db
+def store_fb_photos(con, source):
 	c = con.cursor()
 	c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='photos'")
 	if c.fetchone() != None:
-		c.execute("SELECT _id,owner,src_small,src_big,caption,created,thumbnail FROM photos ORDER BY _id DESC")
-		fbp_data = c.fetchall()
-		if len(fbp_data) > 0:
-			os.mkdir(OUTPUT+'fb_media'); os.mkdir(OUTPUT+'fb_media'+SEP+'Thumbs')
-			fileh = open(OUTPUT+'fb_photos2.html', 'w', encoding='UTF-8')
-			fileh.write('<!DOCTYPE html><html><head>\n<title>%s Andriller Report for %s</title>\n<style>body,td,tr {font-family: Vernada, Arial, sans-serif; font-size: 12px;}</style></head>\n<body>\n<a href="REPORT.html">[Back]</a>\n<p align="center"><i># This report was generated using Andriller on %s #</i></p>\n<h3 align="center">[%s] %s</h3>\n<table border="1" cellpadding="2" cellspacing="0" align="center">\n<tr bgcolor="#72A0C1"><th>#</th><th>Picture</th><th>Owner</th><th width="500">Caption</th><th nowrap>Date (uploaded)</th></tr>' % (str(rep_title), str(IMEI), str(LOCAL_TIME), str(rep_title), str(IMEI)))
-			for fbp_item in fbp_data:
-				fbp_id = fbp_item[0]
-				fbp_owner = str(fbp_item[1])
-				fbp_thm = fbp_item[2]
-				fbp_img = fbp_item[3]
-				if fbp_item[4] == None:
-					fbp_cap = ''
-				else:
-					fbp_cap = str(fbp_item[4])
-				fbp_date = datetime.fromtimestamp(int(str(fbp_item[5])[:10])).strftime('%Y-%m-%d %H:%M:%S')
-				if fbp_item[6] != None:
-					filewa = open(OUTPUT+'fb_media'+SEP+'Thumbs'+SEP+str(fbp_id)+'.jpg', 'wb')
-					filewa.write(fbp_item[6]); filewa.close()					
-					fbp_thumb = 'fb_media'+SEP+'Thumbs'+SEP+str(fbp_id)+'.jpg'
-				else:
-					fbp_thumb = fbp_item[2]
-				fileh.write('<tr><td>%s</td><td><a href="%s" target="_blank"><img src="%s"></a></td><td><a href="http://www.facebook.com/profile.php?id=%s" target="_blank">%s</a></td><td width="500">%s</td><td nowrap>%s</td></tr>\n' % (str(fbp_id), str(fbp_img), str(fbp_thm), str(fbp_owner), str(fbp_owner), fbp_cap, fbp_date))
-			fileh.write(REP_FOOTER)
-			fileh.close()
-			REPORT.append(['Applications data', '<a href="fb_photos2.html">%s (%d)</a>' % (rep_title, len(fbp_data))])
+		c.execute("SELECT _id,owner,src_small,src_big,caption,created,thumbnail IS NOT NULL,rowid FROM photos ORDER BY _id DESC")
+		for fbp_item, fbp_time in iter_timed_rows(c, 5):
+			fbp_id = fbp_item[0]
+			fbp_thumb = None
+			if fbp_item[6] == 1:		# thumbnail
+				fbp_thumb = MEDIA.add_blob(con, 'photos', 'thumbnail', fbp_item[7], '.jpg')
+			STORE.add('fb_photos', (source, fbp_id, fbp_item[1], fbp_item[2], fbp_item[3], fbp_item[4], fbp_time, fbp_thumb))
 
+# Decode photos_db # # # # # # # # # # # # # # # # # # # # # # #
+def decode_photos_db(con):
+	store_fb_photos(con, 'photos_db')
 # # # # #
 
 # Decode fb.db  # # # # # # # # # # # # # # # # # # # # # # # #
-def decode_fbdb():
-	rep_title = 'Facebook: Viewed Photos'
-	con = sq.connect(OUTPUT+'db'+SEP+'fb.db')
-	c = con.cursor()
-	c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='photos'")
-	if c.fetchone() != None:
-		c.execute("SELECT _id,owner,src_small,src_big,caption,created,thumbnail FROM photos ORDER BY _id DESC")
-		fbp_data = c.fetchall()
-		if len(fbp_data) > 0:
-			os.mkdir(OUTPUT+'fb_media'); os.mkdir(OUTPUT+'fb_media'+SEP+'Thumbs')
-			fileh = open(OUTPUT+'fb_photos.html', 'w', encoding='UTF-8')
-			fileh.write('<!DOCTYPE html><html><head>\n<title>%s Andriller Report for %s</title>\n<style>body,td,tr {font-family: Vernada, Arial, sans-serif; font-size: 12px;}</style></head>\n<body>\n<a href="REPORT.html">[Back]</a>\n<p align="center"><i># This report was generated using Andriller on %s #</i></p>\n<h3 align="center">[%s] %s</h3>\n<table border="1" cellpadding="2" cellspacing="0" align="center">\n<tr bgcolor="#72A0C1"><th>#</th><th>Picture</th><th>Owner</th><th width="500">Caption</th><th nowrap>Date (uploaded)</th></tr>' % (str(rep_title), str(IMEI), str(LOCAL_TIME), str(rep_title), str(IMEI)))
-			for fbp_item in fbp_data:
-				fbp_id = fbp_item[0]
-				fbp_owner = str(fbp_item[1])
-				fbp_thm = fbp_item[2]
-				fbp_img = fbp_item[3]
-				if fbp_item[4] == None:
-					fbp_cap = ''
-				else:
-					fbp_cap = str(fbp_item[4])
-				fbp_date = datetime.fromtimestamp(int(str(fbp_item[5])[:10])).strftime('%Y-%m-%d %H:%M:%S')
-				if fbp_item[6] != None:
-					filewa = open(OUTPUT+'fb_media'+SEP+'Thumbs'+SEP+str(fbp_id)+'.jpg', 'wb')
-					filewa.write(fbp_item[6]); filewa.close()					
-					fbp_thumb = 'fb_media'+SEP+'Thumbs'+SEP+str(fbp_id)+'.jpg'
-				else:
-					fbp_thumb = fbp_item[2]
-				fileh.write('<tr><td>%s</td><td><a href="%s" target="_blank"><img src="%s"></a></td><td><a href="http://www.facebook.com/profile.php?id=%s" target="_blank">%s</a></td><td width="500">%s</td><td nowrap>%s</td></tr>\n' % (str(fbp_id), str(fbp_img), str(fbp_thm), str(fbp_owner), str(fbp_owner), fbp_cap, fbp_date))
-			fileh.write(REP_FOOTER)
-			fileh.close()
-			REPORT.append(['Applications data', '<a href="fb_photos.html">%s (%d)</a>' % (rep_title, len(fbp_data))])
-
+def decode_fbdb(con):
+	store_fb_photos(con, 'fb.db')
 # # # # # 
 
 # Decode wa.db  # # # # # # # # # # # # # # # # # # # # # # # #
-def decode_wadb():
-	rep_title = 'WhatsApp Contacts'
-	con = sq.connect(OUTPUT+'db'+SEP+'wa.db')
+def decode_wadb(con):
 	c = con.cursor()
 	c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='wa_contacts'")
 	if c.fetchone() != None:
-		c.execute("select display_name,number,status from wa_contacts where is_whatsapp_user='1'")
-		wa_data = c.fetchall()
-		con.close()
-		fileh = open(OUTPUT+'wa_contacts.html', 'w', encoding='UTF-8')
-		fileh.write('<!DOCTYPE html><html><head>\n<title>%s Andriller Report for %s</title>\n<style>body,td,tr {font-family: Vernada, Arial, sans-serif; font-size: 12px;}</style></head>\n<body>\n<a href="REPORT.html">[Back]</a>\n<p align="center"><i># This report was generated using Andriller on %s #</i></p>\n<h3 align="center">[%s] %s</h3>\n<table border="1" cellpadding="2" cellspacing="0" align="center">\n<tr bgcolor="#72A0C1"><th>Name</th><th>Number</th><th>Status</th></tr>' % (str(rep_title), str(IMEI), str(LOCAL_TIME), str(rep_title), str(IMEI)))
-		for wa_item in wa_data:
-			wa_name = wa_item[0]
-			wa_number = wa_item[1]
-			wa_status = wa_item[2]
-			if wa_status == None:
-				wa_status = ''
-			fileh.write('<tr><td>%s</td><td>%s</td><td>%s</td></tr>\n' % (wa_name,wa_number,wa_status))
-		fileh.write(REP_FOOTER)
-		fileh.close()
-		REPORT.append(['Applications data', '<a href="wa_contacts.html">%s (%d)</a>' % (rep_title, len(wa_data))])
+		c.execute("select display_name,number,status,jid from wa_contacts where is_whatsapp_user='1'")
+		for wa_item in iter_rows(c):
+			STORE.add('wa_contacts', wa_item[:3])
+			# a user JID is the international number without '+'
+			wa_e164 = '+'+wa_item[3].split('@')[0] if wa_item[3] != None and wa_item[3].endswith('@s.whatsapp.net') else None
+			STORE.add('phonebook', ('wa.db', wa_item[3], wa_item[0], wa_item[1], wa_e164))
 # # # # # 
 
 # Decode msgstore.db  # # # # # # # # # # # # # # # # # # # # #
-def decode_msgstoredb():
-	rep_title = 'WhatsApp Messages'
-	con = sq.connect(OUTPUT+'db'+SEP+'msgstore.db')
+def decode_msgstoredb(con):
 	c = con.cursor()
 	c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='messages'")
 	if c.fetchone() != None:
-		#os.mkdir(OUTPUT+SEP+'wa_media'+SEP+'Sent'); os.mkdir(OUTPUT+SEP+'wa_media'+SEP+'Received')
-		os.mkdir(OUTPUT+'wa_media'); os.mkdir(OUTPUT+'wa_media'+SEP+'Thumbs')
-		c.execute("SELECT _id, key_remote_jid, data, timestamp, key_from_me, media_size, media_mime_type, media_name, raw_data, latitude, longitude FROM messages WHERE NOT status='-1' ORDER BY timestamp DESC")
-		wam_data = c.fetchall()
-		con.close()
-		fileh = open(OUTPUT+'wa_messages.html', 'w', encoding='UTF-8')
-		fileh.write('<!DOCTYPE html><html><head>\n<title>%s Andriller Report for %s</title>\n<style>body,td,tr {font-family: Vernada, Arial, sans-serif; font-size: 12px;}</style></head>\n<body>\n<a href="REPORT.html">[Back]</a>\n<p align="center"><i># This report was generated using Andriller on %s #</i></p>\n<h3 align="center">[%s] %s</h3>\n<table border="1" cellpadding="2" cellspacing="0" align="center">\n<tr bgcolor="#72A0C1"><th>#</th><th>Number</th><th width="500">Message</th><th nowrap>Time</th><th>Type</th></tr>' % (str(rep_title), str(IMEI), str(LOCAL_TIME), str(rep_title), str(IMEI)))
-		for wam_item in wam_data:
+		c.execute("SELECT _id, key_remote_jid, data, timestamp, key_from_me, media_size, media_mime_type, media_name, raw_data IS NOT NULL, latitude, longitude, rowid FROM messages WHERE NOT status='-1' ORDER BY timestamp DESC")
+		for wam_item, wam_time in iter_timed_rows(c, 3):
 			wam_id = wam_item[0]
 			wam_number = wam_item[1].split('@')[0]
 			if wam_number[0] != 0:
 				wam_number = '+'+wam_number
-			wam_text = wam_item[2]		# data
-			wam_date = datetime.fromtimestamp(int(str(wam_item[3])[:10])).strftime('%Y-%m-%d %H:%M:%S')		# timestamp
 			if wam_item[4] == 1:		# key_from_me
 				wam_dir = 'Sent'
 			else:
 				wam_dir = 'Inbox'
-			if wam_item[8] != None:			# raw_data
-				if wam_item[7] != None:		# media_name
-					wam_fname = wam_item[7]
+			wam_thumb = None
+			if wam_item[8] == 1:			# raw_data
+				if wam_item[7] != None and os.path.splitext(wam_item[7])[1] != '':		# media_name
+					wam_ext = os.path.splitext(wam_item[7])[1]
 				elif wam_item[6] != None:
-					wam_fname = str(wam_item[0])+'.'+wam_item[6].split('/')[1]	# media_mime_type
+					wam_ext = '.'+wam_item[6].split('/')[1]	# media_mime_type
 				else:
-					wam_fname = str(wam_item[0])+'.jpg'
-				filewa = open(OUTPUT+SEP+'wa_media'+SEP+'Thumbs'+SEP+wam_fname, 'wb')
-				filewa.write(wam_item[8]); filewa.close()	# raw_data, writes file
-				wam_text = '<img src="'+'wa_media'+SEP+'Thumbs'+SEP+wam_fname+'">'
-				if wam_item[6] != None:
-					wam_text = 'Type: '+str(wam_item[6])+'<br/>'+wam_text
-				if wam_item[7] != None:
-					wam_text = 'Filename: '+str(wam_item[7])+'<br/>'+wam_text
-				if wam_item[9] != 0 and wam_item[10] != 0:		# latitude, longtitude
-					wam_text = '<a href="http://maps.google.com/maps?q='+str(wam_item[9])+','+str(wam_item[10])+'" target="_blank">Map Location: '+str(wam_item[9])+','+str(wam_item[10])+'<br/>'+wam_text+'</a>'
-			fileh.write('<tr><td>%s</td><td>%s</td><td width="500">%s</td><td nowrap>%s</td><td>%s</td></tr>\n' % (wam_id, wam_number, wam_text, wam_date, wam_dir))
-		fileh.write(REP_FOOTER)
-		fileh.close()
-		REPORT.append(['Applications data', '<a href="wa_messages.html">%s (%d)</a>' % (rep_title, len(wam_data))])
+					wam_ext = '.jpg'
+				wam_thumb = MEDIA.add_blob(con, 'messages', 'raw_data', wam_item[11], wam_ext)
+			STORE.add('wa_messages', (wam_id, wam_number, wam_item[2], wam_time, wam_dir, wam_item[7], wam_item[6], wam_thumb, wam_item[9], wam_item[10], None))
 # # # # # 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -710,44 +1687,1358 @@ decoders = [
 (decode_msgstoredb, 'msgstore.db')
 ]
 
+# Decoders that share a database file run together on one read-only connection, and
+# the files are spread over a process pool. Records go to the case store from every
+# worker; any REPORT rows a decoder adds are merged back in the order of the 'decoders'
+# list, whichever finishes first. The report pages are written from the store after.
+DEC_WORKERS = os.cpu_count() or 1
+DEC_INLINE = ['gesture.key', 'settings.db']	# These edit the device information rows, so run here first
+DEC_TIMES = []		# (decoder, seconds, error) of the last DECODE_ALL
+
+def open_db_readonly(DB_NAME):
+	DB_FILE = os.path.abspath(OUTPUT+'db'+SEP+DB_NAME)
+	with open(DB_FILE, 'rb') as fileh:
+		if fileh.read(16) != b'SQLite format 3\x00':
+			return None
+	if os.path.isfile(DB_FILE+'-wal'):
+		# SQLite needs a -shm index to read a WAL; it is made next to linked copies in
+		# wal_view/ rather than next to the acquired files
+		VIEW_DIR = os.path.abspath(OUTPUT+'wal_view')
+		os.makedirs(VIEW_DIR, exist_ok=True)
+		for suffix in ['', '-wal']:
+			try:
+				os.link(DB_FILE+suffix, VIEW_DIR+SEP+DB_NAME+suffix)
+			except FileExistsError:
+				pass
+			except OSError:
+				shutil.copyfile(DB_FILE+suffix, VIEW_DIR+SEP+DB_NAME+suffix)
+		DB_FILE = VIEW_DIR+SEP+DB_NAME
+	elif os.path.isfile(DB_FILE+'-journal') and os.path.getsize(DB_FILE+'-journal') > 0:
+		# a hot journal can only be rolled back by a writer, so the pair is copied
+		# (never linked) to wal_view/ and opened there; the acquired files, uncommitted
+		# pages and all, are left for carving
+		VIEW_DIR = os.path.abspath(OUTPUT+'wal_view')
+		os.makedirs(VIEW_DIR, exist_ok=True)
+		if os.path.isfile(VIEW_DIR+SEP+DB_NAME) == False:
+			for suffix in ['-journal', '']:
+				shutil.copyfile(DB_FILE+suffix, VIEW_DIR+SEP+DB_NAME+suffix+'.%d' % os.getpid())
+				os.replace(VIEW_DIR+SEP+DB_NAME+suffix+'.%d' % os.getpid(), VIEW_DIR+SEP+DB_NAME+suffix)
+		return sq.connect('file:%s' % pathname2url(VIEW_DIR+SEP+DB_NAME), uri=True)
+	return sq.connect('file:%s?mode=ro' % pathname2url(DB_FILE), uri=True)
+
+def run_decoder(func, con):
+	t_beg = time.time()
+	try:
+		func(con)
+		STORE.flush()
+		return (time.time() - t_beg, None)
+	except Exception as e:
+		STORE.flush()
+		return (time.time() - t_beg, repr(e))
+
+def decode_worker_init(output, imei, local_time):
+	global OUTPUT, IMEI, LOCAL_TIME
+	OUTPUT = output; IMEI = imei; LOCAL_TIME = local_time
+	open_case_store(output)
+
+def decode_worker(task):
+	global REPORT, MEDIA
+	DB_NAME, funcs = task
+	REPORT_BASE = REPORT
+	results = []
+	con = open_db_readonly(DB_NAME)
+	MEDIA = MediaStore(OUTPUT)
+	try:
+		for func in funcs:
+			REPORT = []
+			t_run, error = run_decoder(func, con)
+			results.append((func.__name__, REPORT, t_run, error))
+	finally:
+		REPORT = REPORT_BASE
+		MEDIA.close()
+		MEDIA = None
+		if con != None:
+			con.close()
+	return results
+
 # Loop for decoding all DB's
-def DECODE_ALL(DLLS):
+def DECODE_ALL(DLLS, workers=DEC_WORKERS):
+	groups = {}
 	for dec in decoders:
 		if dec[1] in DLLS:
-			try:
-				print('\033[95m Decoding: ' + dec[1] + '\033[0m', end='\r')
-				dec[0]()
-			except:
-				pass
+			groups.setdefault(dec[1], []).append(dec[0])
+	del DEC_TIMES[:]
+	store = CaseStore(OUTPUT+'case.db')
+	store.create()
+	store.close()
+	open_case_store(OUTPUT)
+	for DB_NAME in DEC_INLINE:
+		if DB_NAME in groups:
+			print('\033[95m Decoding: ' + DB_NAME + '\033[0m', end='\r')
+			con = open_db_readonly(DB_NAME)
+			for func in groups.pop(DB_NAME):
+				DEC_TIMES.append((func.__name__,) + run_decoder(func, con))
+			if con != None:
+				con.close()
+	# largest files first, so the slowest decoder does not start last
+	tasks = sorted(groups.items(), key=lambda x: os.path.getsize(OUTPUT+'db'+SEP+x[0]), reverse=True)
+	dec_rows = {}
+	if workers > 1 and len(tasks) > 1:
+		STORE.close()
+		pool = Pool(min(workers, len(tasks)), decode_worker_init, (OUTPUT, IMEI, LOCAL_TIME))
+		done = pool.imap_unordered(decode_worker, tasks)
+	else:
+		pool = None
+		done = map(decode_worker, tasks)
+	for results in done:
+		for name, rows, t_run, error in results:
+			print('\033[95m Decoding: ' + name + '\033[0m', end='\r')
+			dec_rows[name] = rows
+			DEC_TIMES.append((name, t_run, error))
+	if pool != None:
+		pool.close()
+		pool.join()
+		open_case_store(OUTPUT)
+	for dec in decoders:
+		REPORT.extend(dec_rows.pop(dec[0].__name__, []))
+	raw_rows = EXPORT_OTHER(DLLS, workers, RAW_ROWS)
+	CARVE_ALL(DLLS, workers)
+	shutil.rmtree(OUTPUT+'wal_view', ignore_errors=True)
+	resolve_contacts(STORE)
+	STORE.index()
+	write_case_reports(STORE)
+	run_report('report carved', write_carved_reports, STORE)
+	run_report('report timeline', write_timeline, STORE)
+	REPORT.extend(raw_rows)
+	run_report('exports', write_case_exports, STORE)
+	STORE.close()
 	print(' '.join([' ' for x in range(20)]), end='\r')
+	for name, t_run, error in DEC_TIMES:
+		if error == None:
+			print(' %s: %.2fs' % (name, t_run))
+		else:
+			print('\033[91m %s: %.2fs, failed: %s\033[0m' % (name, t_run, error))
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# OTHER DATABASES
+# Acquired SQLite files that no decoder reads are exported as they are: every table
+# in sqlite_master becomes raw_<db>_<table>.html pages and export/<db>/<table>.csv
+# and .jsonl, streamed in FETCH_ROWS batches. Tables are exported by a process pool,
+# each up to RAW_ROWS rows. BLOBs go to the media store, and the exports hold their
+# path in it.
+#
+RAW_ROWS = 100000		# Rows exported per table; None for all
+BLOB_TYPES = [(b'\xff\xd8\xff', '.jpg'), (b'\x89PNG', '.png'), (b'GIF8', '.gif'), (b'%PDF', '.pdf'), (b'PK\x03\x04', '.zip'), (b'SQLite format 3\x00', '.db')]
+
+# Path of a BLOB in the media store
+class MediaPath(str):
+	pass
+
+def raw_value(value):
+	if isinstance(value, bytes):
+		ext = ([x[1] for x in BLOB_TYPES if value.startswith(x[0])] or ['.bin'])[0]
+		return MediaPath(MEDIA.add(value, ext))
+	return value
+
+def raw_cell(value):
+	if isinstance(value, MediaPath):
+		return RawHTML('<a href="%s" target="_blank">%s</a>' % (esc(value), esc(os.path.basename(value))))
+	return value
+
+def raw_name(name):
+	return re.sub(r'[^\w.-]', '_', name)
+
+def export_table(task):
+	global MEDIA
+	DB_NAME, table, limit = task
+	t_beg = time.time()
+	con = open_db_readonly(DB_NAME)
+	MEDIA = MediaStore(OUTPUT)
+	page = None
+	try:
+		c = con.cursor()
+		quoted = '"%s"' % table.replace('"', '""')
+		total = c.execute("SELECT count(*) FROM %s" % quoted).fetchone()[0]
+		c.execute("SELECT * FROM %s%s" % (quoted, ' LIMIT %d' % limit if limit != None else ''))
+		names = [x[0] for x in c.description]
+		os.makedirs(OUTPUT+'export'+SEP+raw_name(DB_NAME), exist_ok=True)
+		base = OUTPUT+'export'+SEP+raw_name(DB_NAME)+SEP+raw_name(table)
+		csvh = open(base+'.csv', 'w', encoding='UTF-8', newline='')
+		writer = csv.writer(csvh)
+		writer.writerow(names)
+		jsonh = open(base+'.jsonl', 'w', encoding='UTF-8')
+		page = ReportWriter('raw_%s_%s' % (raw_name(DB_NAME), raw_name(table)), '%s: %s' % (DB_NAME, table), [(x, '') for x in names])
+		for row in iter_rows(c):
+			row = [raw_value(x) for x in row]
+			writer.writerow(row)
+			jsonh.write(dumps(dict(zip(names, row)), ensure_ascii=False) + '\n')
+			page.row(*[raw_cell(x) for x in row])
+		page.close()
+		csvh.close()
+		jsonh.close()
+		return (DB_NAME, table, page.first, page.count, total, time.time() - t_beg, None)
+	except Exception as e:
+		return (DB_NAME, table, None, 0, 0, time.time() - t_beg, repr(e))
+	finally:
+		MEDIA.close()
+		MEDIA = None
+		con.close()
 
+# Exports the tables of every acquired database that no decoder reads; returns their
+# REPORT rows, one per database
+def EXPORT_OTHER(DLLS, workers=DEC_WORKERS, limit=RAW_ROWS):
+	decoded = set([x[1] for x in decoders])
+	tasks = []
+	for DB_NAME in DLLS:
+		if DB_NAME in decoded or DB_NAME.endswith(tuple(SIDECARS)):
+			continue
+		con = open_db_readonly(DB_NAME)
+		if con == None:		# not SQLite
+			continue
+		try:
+			tables = [x[0] for x in con.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL%' ORDER BY name")]
+		except sq.Error as e:
+			DEC_TIMES.append(('export %s' % DB_NAME, 0, repr(e)))
+			tables = []
+		con.close()
+		tasks.extend([(DB_NAME, x, limit) for x in tables])
+	if tasks == []:
+		return []
+	print('\033[95m Exporting other databases\033[0m', end='\r')
+	if workers > 1 and len(tasks) > 1:
+		pool = Pool(min(workers, len(tasks)), decode_worker_init, (OUTPUT, IMEI, LOCAL_TIME))
+		done = pool.imap(export_table, tasks)
+	else:
+		pool = None
+		done = map(export_table, tasks)
+	links = {}
+	t_run = {}
+	for DB_NAME, table, first, count, total, t_table, error in done:
+		t_run[DB_NAME] = t_run.get(DB_NAME, 0) + t_table
+		if error != None:
+			DEC_TIMES.append(('export %s: %s' % (DB_NAME, table), t_table, error))
+			continue
+		shown = '%d' % count if count == total else '%d of %d' % (count, total)
+		links.setdefault(DB_NAME, []).append(RawHTML('<a href="%s">%s (%s)</a>' % (esc(first), esc(table), shown)))
+	if pool != None:
+		pool.close()
+		pool.join()
+	for DB_NAME in t_run:
+		DEC_TIMES.append(('export %s (%d tables)' % (DB_NAME, len(links.get(DB_NAME, []))), t_run[DB_NAME], None))
+	return [['Other data (%s)' % x, links[x]] for x in links]
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# CARVING
+# Deleted records are recovered from the acquired database, its -wal and -journal
+# without copying them: each file is memory-mapped and only these regions are read:
+#  - freelist pages (trunk and leaf) of the database,
+#  - unallocated space and freeblocks of its table leaf pages,
+#  - every page image in the WAL, and the rollback journal.
+# Records are matched against the live schema of the tables the decoders read: a
+# regex built from the column types finds candidate record headers at C speed, and
+# each candidate is then parsed and checked in full. Page ranges are spread over a
+# process pool. Records still present in the live table (WAL included) are dropped.
+#
+CARVE_TARGETS = [
+('contacts2.db', 'calls'),
+('logs.db', 'logs'),
+('mmssms.db', 'sms'),
+('threads_db2', 'messages'),
+('wa.db', 'wa_contacts'),
+('msgstore.db', 'messages')
+]
+CARVE_PAGES = 2048		# Database pages or WAL frames per scan task
+CARVE_WORKERS = os.cpu_count() or 1
+SIDECARS = ['-wal', '-journal']
+
+# Device paths of the sidecars that may sit next to each SQLite database
+def sidecar_paths(DB_PATHS):
+	return [x+y for x in DB_PATHS if x.endswith('.key') == False for y in SIDECARS]
+
+# Column classes by declared type, following SQLite's affinity rules
+def column_class(decl):
+	decl = decl.upper()
+	if 'INT' in decl:
+		return 'int'
+	if 'CHAR' in decl or 'CLOB' in decl or 'TEXT' in decl:
+		return 'text'
+	if 'BLOB' in decl or decl == '':
+		return 'any'
+	if 'REAL' in decl or 'FLOA' in decl or 'DOUB' in decl:
+		return 'real'
+	return 'any'
+
+def byte_class(values):
+	return '[' + ''.join(['\\x%02x' % x for x in values]) + ']'
+
+ODD_BYTES = [x for x in range(1, 128, 2)]
+EVEN_BYTES = [x for x in range(0, 128, 2)]
+SERIAL_PATTERNS = {
+'ipk': '\\x00',
+'int': byte_class([0, 1, 2, 3, 4, 5, 6, 8, 9]),
+'real': byte_class(range(0, 10)),
+'text': '(?:%s|[\\x80-\\xff]{1,2}%s)' % (byte_class([0] + list(range(13, 128, 2))), byte_class(ODD_BYTES)),
+'blob': '(?:%s|[\\x80-\\xff]{1,2}%s)' % (byte_class([0] + list(range(12, 128, 2))), byte_class(EVEN_BYTES)),
+'any': '(?:%s|[\\x80-\\xff]{1,2}[\\x00-\\x7f])' % byte_class(list(range(0, 10)) + list(range(12, 128)))
+}
+
+# (table, column names, column classes) of a live table; an INTEGER PRIMARY KEY is
+# stored as NULL in the record, as its value is the rowid
+def carve_schema(con, table):
+	info = con.execute("PRAGMA table_info(%s)" % table).fetchall()
+	if info == []:
+		return None
+	pks = [x for x in info if x[5] > 0]
+	classes = []
+	for col in info:
+		if len(pks) == 1 and col[5] == 1 and col[2].upper() == 'INTEGER':
+			classes.append('ipk')
+		else:
+			classes.append(column_class(col[2]))
+	return (table, [x[1] for x in info], classes)
+
+def carve_pattern(classes):
+	sizes = range(len(classes)+1, min(127, len(classes)*3+1)+1)
+	return re.compile((byte_class(sizes) + ''.join([SERIAL_PATTERNS[x] for x in classes])).encode('latin-1'), re.DOTALL)
+
+# A freeblock header (next offset, size of at least 4), then the serial types that
+# follow the overwritten record header size byte and INTEGER PRIMARY KEY serial type
+def carve_head_pattern(classes):
+	rest = classes[1:] if classes[0] == 'ipk' else classes
+	head = '[\\x00-\\xff]{2}(?:[\\x00-\\xff][\\x04-\\xff]|[\\x01-\\xff][\\x00-\\xff])'
+	if classes[0] == 'ipk':
+		head += '\\x00?'
+	return re.compile((head + ''.join([SERIAL_PATTERNS[x] for x in rest])).encode('latin-1'), re.DOTALL)
+
+def read_varint(buf, pos):
+	value = 0
+	for i in range(8):
+		byte = buf[pos+i]
+		value = (value << 7) | (byte & 0x7f)
+		if byte < 0x80:
+			return value, pos+i+1
+	return (value << 8) | buf[pos+8], pos+9
+
+SERIAL_SIZES = [0, 1, 2, 3, 4, 6, 8, 8, 0, 0]
+
+SERIAL_OK = {
+'ipk': lambda x: x == 0,
+'int': lambda x: x < 10 and x != 7,
+'real': lambda x: x < 10,
+'text': lambda x: x == 0 or (x >= 13 and x % 2 == 1),
+'blob': lambda x: x == 0 or (x >= 12 and x % 2 == 0),
+'any': lambda x: x not in (10, 11)
+}
 
-if DLLS != []:
-	print("\033[94m>>>>>>>>>> Decoding data...\033[0m")
-	DECODE_ALL(DLLS)
+# Parses the record whose header starts at pos; returns (values, end) or None
+def carve_record(buf, pos, end, classes):
+	hlen = buf[pos]
+	serials = []
+	p = pos+1
+	while p < pos+hlen:
+		serial, p = read_varint(buf, p)
+		serials.append(serial)
+	if p != pos+hlen or len(serials) != len(classes):
+		return None
+	return carve_values(buf, serials, p, end)
+
+# A freed cell starts with its payload size and rowid, then the record header. The
+# freeblock's own 4-byte header overwrites the start, so the record header size byte
+# is usually lost, and with it the first serial type when that column is an
+# INTEGER PRIMARY KEY (always NULL). The remaining serial types are read from +4.
+# Adjacent freed cells are merged into one freeblock, but each had its own start
+# overwritten first, so the cells that follow are read the same way.
+def carve_freeblock_head(buf, pos, end, classes):
+	for lost in (1, 2):
+		if lost == 2 and classes[0] != 'ipk':
+			break
+		serials = [0] if lost == 2 else []
+		p = pos+4
+		try:
+			while len(serials) < len(classes):
+				serial, p = read_varint(buf, p)
+				serials.append(serial)
+		except IndexError:
+			return None
+		if all([SERIAL_OK[y](x) for x, y in zip(serials, classes)]):
+			record = carve_values(buf, serials, p, end)
+			if record != None:
+				return record
+	return None
+
+def carve_values(buf, serials, p, end):
+	values = []
+	for serial in serials:
+		if serial in (10, 11):
+			return None
+		size = SERIAL_SIZES[serial] if serial < 12 else (serial-12)//2
+		if p+size > end:
+			return None
+		raw = buf[p:p+size]
+		if serial == 0:
+			value = None
+		elif serial == 8 or serial == 9:
+			value = serial - 8
+		elif serial < 7:
+			value = int.from_bytes(raw, 'big', signed=True)
+		elif serial == 7:
+			value = struct.unpack('>d', raw)[0]
+		elif serial % 2 == 1:
+			try:
+				value = raw.decode('UTF-8')
+			except UnicodeDecodeError:
+				return None
+			if '\x00' in value:
+				return None
+		else:
+			value = '<blob %d bytes>' % size
+		values.append(value)
+		p += size
+	if all([x == None or x == 0 or x == '' for x in values]):
+		return None
+	return values, p
+
+def carve_region(buf, start, end, targets, page, region, found):
+	for table, names, classes, pattern, head in targets:
+		pos = start
+		while pos < end:
+			match = pattern.search(buf, pos, end)
+			if match == None:
+				break
+			try:
+				record = carve_record(buf, match.start(), end, classes)
+			except IndexError:
+				record = None
+			if record == None:
+				pos = match.start()+1
+				continue
+			found.append((table, region, page, match.start(), record[0]))
+			pos = record[1]
+
+# Whether an intact record (ending before limit) starts within start..end, which a
+# weaker match overlapping it has misread
+def carve_intact(buf, start, end, limit, pattern, classes):
+	match = pattern.search(buf, start, end)
+	while match != None:
+		try:
+			if carve_record(buf, match.start(), limit, classes) != None:
+				return True
+		except IndexError:
+			pass
+		match = pattern.search(buf, match.start()+1, end)
+	return False
+
+# A freeblock that borders the cell content area is merged into the unallocated gap,
+# so freed cells are also found there with their start overwritten. Without the
+# header size byte a match is weaker, so it is only kept when its freeblock header
+# points forward, its size covers the record, two or more values are set, and no
+# intact record starts inside it.
+def carve_freed(buf, off, start, end, page_size, targets, page, region, found):
+	for table, names, classes, pattern, head in targets:
+		pos = start
+		while pos < end:
+			match = head.search(buf, pos, end)
+			if match == None:
+				break
+			block = match.start()
+			nxt, size = struct.unpack('>HH', buf[block:block+4])
+			record = None
+			if (nxt == 0 or block-off < nxt < page_size) and block+size <= off+page_size:
+				record = carve_freeblock_head(buf, block, min(block+size, end), classes)
+			if record == None or len([x for x in record[0] if x not in (None, 0, '')]) < 2 \
+				or carve_intact(buf, block, record[1], end, pattern, classes):
+				pos = block+1
+				continue
+			found.append((table, region, page, block, record[0]))
+			pos = record[1]
+
+# Unallocated space and freeblocks of one table leaf page image starting at off; a
+# WAL frame is also scanned whole, as its cells may be gone from later frames
+def carve_page(buf, off, page_size, page, region, targets, found):
+	hdr = off+100 if page == 1 else off
+	if buf[hdr] != 0x0d:		# table leaf page
+		return
+	cells = struct.unpack('>H', buf[hdr+3:hdr+5])[0]
+	content = struct.unpack('>H', buf[hdr+5:hdr+7])[0] or 65536
+	if hdr+8+2*cells < off+content <= off+page_size:
+		carve_region(buf, hdr+8+2*cells, off+content, targets, page, region or 'unallocated', found)
+		carve_freed(buf, off, hdr+8+2*cells, off+content, page_size, targets, page, region or 'unallocated', found)
+	block = struct.unpack('>H', buf[hdr+1:hdr+3])[0]
+	seen = 0
+	while block != 0 and block+4 <= page_size and seen < page_size//4:
+		nxt, size = struct.unpack('>HH', buf[off+block:off+block+4])
+		block_end = min(off+block+size, off+page_size)
+		for table, names, classes, pattern, head in targets:
+			pos = off+block
+			while pos+4 < block_end:
+				record = carve_freeblock_head(buf, pos, block_end, classes)
+				if record == None:
+					break
+				found.append((table, region or 'freeblock', page, pos, record[0]))
+				pos = record[1]
+		carve_region(buf, off+block+4, block_end, targets, page, region or 'freeblock', found)
+		block = nxt
+		seen += 1
+
+CARVE_MAPS = {}		# path -> (file, mmap), kept open by each scan worker
+
+def carve_map(path):
+	if path not in CARVE_MAPS:
+		fileh = open(path, 'rb')
+		CARVE_MAPS[path] = (fileh, mmap.mmap(fileh.fileno(), 0, access=mmap.ACCESS_READ))
+	return CARVE_MAPS[path][1]
+
+def carve_worker(task):
+	DB_NAME, path, kind, first, last, page_size, free_pages, schemas = task
+	targets = [(x[0], x[1], x[2], carve_pattern(x[2]), carve_head_pattern(x[2])) for x in schemas]
+	buf = carve_map(path)
+	found = []
+	if kind == 'db':
+		free_pages = set(free_pages)
+		for page in range(first, last+1):
+			off = (page-1)*page_size
+			if page in free_pages:
+				carve_region(buf, off, off+page_size, targets, page, 'freelist', found)
+				continue
+			carve_page(buf, off, page_size, page, None, targets, found)
+	elif kind == 'wal':
+		for frame in range(first, last+1):
+			off = 32 + frame*(page_size+24)
+			page = struct.unpack('>I', buf[off:off+4])[0]
+			carve_region(buf, off+24, off+24+page_size, targets, page, 'wal', found)
+			carve_page(buf, off+24, page_size, page, 'wal', targets, found)
+	else:
+		carve_region(buf, first, last, targets, None, kind, found)
+	return DB_NAME, found
+
+def freelist_pages(buf, page_size, pages):
+	free = []
+	trunk = struct.unpack('>I', buf[32:36])[0]
+	while 0 < trunk <= pages and len(free) < pages:
+		off = (trunk-1)*page_size
+		free.append(trunk)
+		count = struct.unpack('>I', buf[off+4:off+8])[0]
+		if count > page_size//4 - 2:
+			break
+		free.extend([x for x in struct.unpack('>%dI' % count, buf[off+8:off+8+4*count]) if 0 < x <= pages])
+		trunk = struct.unpack('>I', buf[off:off+4])[0]
+	return free
+
+# Scan tasks of one acquired database and its sidecars
+def carve_tasks(DB_NAME, schemas):
+	tasks = []
+	DB_FILE = os.path.abspath(OUTPUT+'db'+SEP+DB_NAME)
+	fileh = open(DB_FILE, 'rb')
+	buf = mmap.mmap(fileh.fileno(), 0, access=mmap.ACCESS_READ)
+	page_size = struct.unpack('>H', buf[16:18])[0]
+	page_size = 65536 if page_size == 1 else page_size
+	pages = len(buf) // page_size
+	free = freelist_pages(buf, page_size, pages)
+	buf.close()
+	fileh.close()
+	for first in range(1, pages+1, CARVE_PAGES):
+		last = min(first+CARVE_PAGES-1, pages)
+		tasks.append((DB_NAME, DB_FILE, 'db', first, last, page_size, [x for x in free if first <= x <= last], schemas))
+	if os.path.isfile(DB_FILE+'-wal') and os.path.getsize(DB_FILE+'-wal') > 32:
+		fileh = open(DB_FILE+'-wal', 'rb')
+		wal_page = struct.unpack('>I', fileh.read(12)[8:12])[0]
+		fileh.close()
+		if wal_page > 0:
+			frames = (os.path.getsize(DB_FILE+'-wal') - 32) // (wal_page+24)
+			for first in range(0, frames, CARVE_PAGES):
+				tasks.append((DB_NAME, DB_FILE+'-wal', 'wal', first, min(first+CARVE_PAGES, frames)-1, wal_page, [], schemas))
+	if os.path.isfile(DB_FILE+'-journal') and os.path.getsize(DB_FILE+'-journal') > 0:
+		tasks.append((DB_NAME, DB_FILE+'-journal', 'journal', 0, os.path.getsize(DB_FILE+'-journal'), page_size, [], schemas))
+	return tasks
+
+# Hashes of the live rows, as they would be carved (INTEGER PRIMARY KEY as NULL)
+def live_records(con, table, classes):
+	live = set()
+	c = con.cursor()
+	c.execute("SELECT * FROM %s" % table)
+	for row in iter_rows(c):
+		live.add(hash(tuple([None if y == 'ipk' else '<blob %d bytes>' % len(x) if isinstance(x, bytes) else x for x, y in zip(row, classes)])))
+	return live
+
+def CARVE_ALL(DLLS, workers=CARVE_WORKERS):
+	t_beg = time.time()
+	tasks = []
+	schemas = {}
+	for DB_NAME, table in CARVE_TARGETS:
+		if DB_NAME not in DLLS:
+			continue
+		con = open_db_readonly(DB_NAME)
+		if con == None:
+			continue
+		try:
+			schema = carve_schema(con, table)
+		except sq.Error:
+			schema = None
+		if schema != None:
+			schemas.setdefault(DB_NAME, []).append(schema)
+		con.close()
+	for DB_NAME in schemas:
+		tasks.extend(carve_tasks(DB_NAME, schemas[DB_NAME]))
+	if tasks == []:
+		return
+	print('\033[95m Carving deleted records\033[0m', end='\r')
+	if workers > 1 and len(tasks) > 1:
+		pool = Pool(min(workers, len(tasks)))
+		done = pool.imap_unordered(carve_worker, tasks)
+	else:
+		pool = None
+		done = map(carve_worker, tasks)
+	found = {}
+	for DB_NAME, records in done:
+		found.setdefault(DB_NAME, []).extend(records)
+	if pool != None:
+		pool.close()
+		pool.join()
+	total = 0
+	for DB_NAME in schemas:
+		con = open_db_readonly(DB_NAME)
+		for table, names, classes in schemas[DB_NAME]:
+			seen = live_records(con, table, classes)
+			for rec_table, region, page, offset, values in sorted([x for x in found.get(DB_NAME, []) if x[0] == table], key=lambda x: (x[1], x[2] or 0, x[3])):
+				key = hash(tuple(values))
+				if key in seen:
+					continue
+				seen.add(key)
+				STORE.add('carved', (DB_NAME, table, region, page, offset, dumps(dict(zip(names, values)), ensure_ascii=False)))
+				total += 1
+		con.close()
+	STORE.flush()
+	DEC_TIMES.append(('carving (%d records)' % total, time.time() - t_beg, None))
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# CONTACT RESOLUTION
+# The contacts2.db and wa.db decoders list every phone number of every contact in
+# the phonebook table, with its E.164 form where the device keeps one (data4, the
+# WhatsApp JID). Once all decoders are done, the numbers go into two dicts: one by
+# E.164 number, and one by the last PHONE_TAIL digits for numbers that were saved
+# in national form (a unique tail is enough to match '07700 900001' to
+# '+447700900001'). Calls, SMS and WhatsApp messages then get their contact name in
+# one UPDATE per table, with the lookup done by a Python SQL function.
+#
+COUNTRY_CODE = None		# Set with --country-code: national numbers then become +<code>...
+PHONE_TAIL = 9			# Trailing digits that identify a number across formats
+PHONE_JUNK = re.compile(r'[^\d+]')
+
+# E.164 form of a number where it can be told ('+' or '00' prefix, or a national
+# number with COUNTRY_CODE set), the bare digits otherwise
+@lru_cache(maxsize=65536)
+def norm_number(number):
+	if number == None:
+		return None
+	digits = PHONE_JUNK.sub('', str(number).split('@')[0])
+	plus = digits.startswith('+')
+	digits = digits.replace('+', '')
+	if digits == '':
+		return None
+	if plus:
+		return '+'+digits
+	if digits.startswith('00') and len(digits) > 4:
+		return '+'+digits[2:]
+	if COUNTRY_CODE != None and digits.startswith('0') and len(digits) > PHONE_TAIL:
+		return '+'+COUNTRY_CODE+digits[1:]
+	return digits
+
+class PhoneBook:
+	def __init__(self):
+		self.numbers = {}	# normalized number -> name
+		self.tails = {}		# last PHONE_TAIL digits -> (name, source); name None when contacts share them
+
+	# Sources are added in order of trust (contacts2.db before wa.db): a number that
+	# an earlier source already has in another format keeps that source's name
+	def add(self, number, name, source):
+		if number == None or name == None or name == '':
+			return
+		digits = number.lstrip('+')
+		if len(digits) >= PHONE_TAIL:
+			tail = digits[-PHONE_TAIL:]
+			if tail not in self.tails:
+				self.tails[tail] = (name, source)
+			elif self.tails[tail][1] != source:
+				name = self.tails[tail][0] or name
+			elif self.tails[tail][0] != name:
+				self.tails[tail] = (None, source)
+		self.numbers.setdefault(number, name)
+
+	def name(self, number):
+		number = norm_number(number)
+		if number == None:
+			return None
+		if number in self.numbers:
+			return self.numbers[number]
+		digits = number.lstrip('+')
+		if len(digits) >= PHONE_TAIL:
+			return self.tails.get(digits[-PHONE_TAIL:], (None, None))[0]
+		return None
+
+# Normalizes the phonebook table, then fills the contact column of the record tables
+def resolve_contacts(store):
+	t_beg = time.time()
+	phonebook = PhoneBook()
+	store.con.create_function('norm_number', 1, norm_number, deterministic=True)
+	with store.con:
+		store.con.execute("UPDATE phonebook SET e164=norm_number(number) WHERE e164 IS NULL OR e164=''")
+	c = store.con.cursor()
+	c.execute("SELECT e164,name,source FROM phonebook ORDER BY source,rowid")
+	for pb_item in iter_rows(c):
+		phonebook.add(norm_number(pb_item[0]), pb_item[1], pb_item[2])
+	if phonebook.numbers == {}:
+		return
+	store.con.create_function('contact_name', 1, phonebook.name, deterministic=True)
+	resolved = 0
+	total = 0
+	with store.con:
+		for table in ['calls', 'sms', 'wa_messages']:
+			store.con.execute("UPDATE %s SET contact=contact_name(number)" % table)
+			resolved += store.con.execute("SELECT count(*) FROM %s WHERE contact IS NOT NULL" % table).fetchone()[0]
+			total += store.count(table)
+	DEC_TIMES.append(('contact resolution (%d of %d records)' % (resolved, total), time.time() - t_beg, None))
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # REPORTING
 #
-print("\033[94m>>>>>>>>>> Generating report:\033[0m")
+# Cell builders get rows as stored; any column may be NULL
+def contact_cells(row):
+	pb_other = loads(row[4]) if row[4] != None else {}
+	return (row[0], esc_lines((row[1] or '').split('\n')), esc_lines((row[2] or '').split('\n')), esc_lines((row[3] or '').split('\n')), RawHTML(''.join([esc(x)+': '+esc_lines(pb_other[x])+'<br/>\n' for x in pb_other])))
+
+def fmt_duration(seconds):
+	try:
+		return str(timedelta(seconds=seconds or 0))
+	except (TypeError, OverflowError):
+		return str(seconds)
+
+def call_cells(row):
+	return (row[0], row[1], row[2], row[3], fmt_time(row[4]), fmt_duration(row[5]))
+
+def sms_cells(row):
+	return (row[0], row[1], row[2], row[3], row[4], fmt_time(row[5]))
+
+def fb_message_cells(row):
+	fbt_sender = RawHTML('<a href="http://www.facebook.com/profile.php?id=%s">%s</a>' % (esc(row[0]), esc(row[1])))
+	return (fbt_sender, RawHTML('<img src="%s">' % esc(row[2])), row[3], esc_lines((row[4] or '').split('\n')), fmt_time(row[5]))
+
+def fb_photo_cells(row):
+	# the thumbnail kept on the device, else the picture online
+	fbp_pic = RawHTML('<a href="%s" target="_blank"><img src="%s"></a>' % (esc(row[2]), esc(row[6] if row[6] != None else row[1])))
+	fbp_owner = RawHTML('<a href="http://www.facebook.com/profile.php?id=%s" target="_blank">%s</a>' % (esc(row[0]), esc(row[0])))
+	return (row[4], fbp_pic, fbp_owner, row[3], fmt_time(row[5]))
+
+def wa_message_cells(row):
+	wam_text = row[2]
+	if row[6] != None:		# thumbnail
+		wam_text = '<img src="%s">' % esc(row[6])
+		if row[5] != None:
+			wam_text = 'Type: '+esc(row[5])+'<br/>'+wam_text
+		if row[4] != None:
+			wam_text = 'Filename: '+esc(row[4])+'<br/>'+wam_text
+		if row[7] and row[8]:		# latitude, longtitude
+			wam_text = '<a href="http://maps.google.com/maps?q=%s,%s" target="_blank">Map Location: %s,%s<br/>%s</a>' % (row[7], row[8], row[7], row[8], wam_text)
+		wam_text = RawHTML(wam_text)
+	return (row[0], row[1], row[10], wam_text, fmt_time(row[3]), row[9])
 
-file_handle = open(OUTPUT+SEP+'REPORT.html', 'w', encoding='UTF-8')
+CALL_COLUMNS = [('#', ''), ('Type', ''), ('Number', ''), ('Name', ''), ('Time', ''), ('Duration', '')]
+FB_PHOTO_COLUMNS = [('#', ''), ('Picture', ''), ('Owner', ''), ('Caption', 'width="500"'), ('Date (uploaded)', 'nowrap')]
 
-report_t = '<!DOCTYPE html><html><head>\n<title>Andriller Report for %s</title>\n<style>body,td,tr {font-family: Vernada, Arial, sans-serif; font-size: 12px;}</style></head><body>\n<p align="center"><i># This report was generated using Andriller version %s on %s #</i></p><h3 align="center">[Andriller Report] %s %s | %s</h3>\n<table border="1" cellpadding=2 cellspacing="0" align="center">\n<tr bgcolor="#72A0C1"><th>Type</th><th>Data</th></tr>\n' % (str(IMEI), ANDRILLER_VERSION, str(LOCAL_TIME), DEVICE_MANUF, str(DEVICE_MODEL), str(IMEI))
+# (REPORT section, title, page name, query, columns, row -> cells), in REPORT order
+CASE_REPORTS = [
+('Communications data', 'Contacts', 'contacts', "SELECT contact_id,name,numbers,emails,other FROM contacts ORDER BY contact_id", [('#', 'nowrap'), ('Name', 'nowrap'), ('Number', 'nowrap'), ('Email', 'nowrap'), ('Other', '')], contact_cells),
+('Communications data', 'Call logs', 'call_logs', "SELECT id,type,number,ifnull(contact,name),time,duration FROM calls WHERE source='contacts2.db' ORDER BY time DESC,rowid", CALL_COLUMNS, call_cells),
+('Communications data', 'Samsung Call logs', 'sec_call_logs', "SELECT id,type,number,ifnull(contact,name),time,duration FROM calls WHERE source='logs.db' ORDER BY time DESC,rowid", CALL_COLUMNS, call_cells),
+('Communications data', 'SMS Messages', 'mmssms', "SELECT id,number,contact,body,type,time FROM sms ORDER BY time DESC,rowid", [('#', ''), ('Number', ''), ('Name', ''), ('Message', 'width="500"'), ('Type', ''), ('Time', 'nowrap')], sms_cells),
+('Applications data', 'Facebook: Messages', 'fb_messages', "SELECT sender_id,sender,image,text,recipients,time FROM fb_messages ORDER BY time DESC,rowid", [('Sender', 'nowrap'), ('Image', 'nowrap'), ('Message', 'width="500"'), ('Recipient(s)', 'nowrap'), ('Time', 'nowrap')], fb_message_cells),
+('Applications data', 'Facebook: Viewed Photos', 'fb_photos2', "SELECT owner,src_small,src_big,caption,id,time,thumbnail FROM fb_photos WHERE source='photos_db' ORDER BY id DESC", FB_PHOTO_COLUMNS, fb_photo_cells),
+('Applications data', 'Facebook: Viewed Photos', 'fb_photos', "SELECT owner,src_small,src_big,caption,id,time,thumbnail FROM fb_photos WHERE source='fb.db' ORDER BY id DESC", FB_PHOTO_COLUMNS, fb_photo_cells),
+('Applications data', 'WhatsApp Contacts', 'wa_contacts', "SELECT name,number,status FROM wa_contacts ORDER BY rowid", [('Name', ''), ('Number', ''), ('Status', '')], tuple),
+('Applications data', 'WhatsApp Messages', 'wa_messages', "SELECT id,number,text,time,media_name,media_type,thumbnail,latitude,longitude,direction,contact FROM wa_messages ORDER BY time DESC,rowid", [('#', ''), ('Number', ''), ('Name', ''), ('Message', 'width="500"'), ('Time', 'nowrap'), ('Type', '')], wa_message_cells)
+]
+
+# Runs one report stage like run_decoder runs a decoder: a failure is recorded in
+# DEC_TIMES and the other pages are still written
+def run_report(name, func, *args):
+	t_beg = time.time()
+	try:
+		func(*args)
+		error = None
+	except Exception as e:
+		error = repr(e)
+	DEC_TIMES.append((name, time.time() - t_beg, error))
+
+def write_case_page(store, section, title, name, query, columns, cells):
+	c = store.con.cursor()
+	c.execute(query)
+	page = None
+	try:
+		for row in iter_rows(c):
+			if page == None:
+				page = ReportWriter(name, title, columns)
+			page.row(*cells(row))
+	finally:
+		if page != None:
+			page.close()
+			REPORT.append([section, RawHTML('<a href="%s">%s (%d)</a>' % (esc(page.first), esc(title), page.count))])
+
+# HTML pages of the records in the case store, one REPORT row each
+def write_case_reports(store):
+	for report in CASE_REPORTS:
+		run_report('report %s' % report[2], write_case_page, store, *report)
+
+# One page per carved table, each record shown as its non-empty fields
+def write_carved_reports(store):
+	c = store.con.cursor()
+	c.execute("SELECT DISTINCT source,source_table FROM carved ORDER BY source,source_table")
+	for source, table in c.fetchall():
+		c.execute("SELECT region,page,byte_offset,record FROM carved WHERE source=? AND source_table=? ORDER BY rowid", (source, table))
+		page = ReportWriter('carved_%s_%s' % (re.sub(r'[^\w]', '_', source), table), 'Recovered: %s %s' % (source, table), [('Region', ''), ('Page', ''), ('Offset', ''), ('Record', 'width="700"')])
+		for row in iter_rows(c):
+			record = loads(row[3])
+			page.row(row[0], row[1], row[2], RawHTML('<br/>'.join([esc(x)+': '+esc(record[x]) for x in record if record[x] != None and record[x] != ''])))
+		page.close()
+		REPORT.append(['Recovered data', RawHTML('<a href="%s">%s %s (%d)</a>' % (esc(page.first), esc(source), esc(table), page.count))])
+
+# Every table of the case store as export/<table>.csv and export/<table>.json
+def write_case_exports(store):
+	for table, columns in CASE_TABLES:
+		if store.count(table) == 0:
+			continue
+		os.makedirs(OUTPUT+'export', exist_ok=True)
+		names = [x.split()[0] for x in columns]
+		c = store.con.cursor()
+		c.execute("SELECT %s FROM %s ORDER BY rowid" % (','.join(names), table))
+		fileh = open(OUTPUT+'export'+SEP+table+'.csv', 'w', encoding='UTF-8', newline='')
+		writer = csv.writer(fileh)
+		writer.writerow(names)
+		writer.writerows(iter_rows(c))
+		fileh.close()
+		c.execute("SELECT %s FROM %s ORDER BY rowid" % (','.join(names), table))
+		fileh = open(OUTPUT+'export'+SEP+table+'.json', 'w', encoding='UTF-8')
+		sep = '[\n'
+		for row in iter_rows(c):
+			fileh.write(sep + dumps(dict(zip(names, row)), ensure_ascii=False))
+			sep = ',\n'
+		fileh.write('\n]\n' if sep != '[\n' else '[]\n')
+		fileh.close()
+# # # # #
 
-file_handle.write(report_t)
+# Timeline  # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Each source query walks its time index newest first, and heapq.merge interleaves
+# the streams row by row, so the timeline is never sorted or held in memory whole.
+# Streams yield (time, event, number, name, content); undated records are left out.
+TIMELINE_SOURCES = [
+('Call', "SELECT time,type,number,ifnull(contact,name),duration FROM calls WHERE source='contacts2.db' AND time IS NOT NULL ORDER BY time DESC", lambda r: (r[0], 'Call ('+r[1]+')', r[2], r[3], fmt_duration(r[4]))),
+('Samsung call', "SELECT time,type,number,ifnull(contact,name),duration FROM calls WHERE source='logs.db' AND time IS NOT NULL ORDER BY time DESC", lambda r: (r[0], 'Samsung call ('+r[1]+')', r[2], r[3], fmt_duration(r[4]))),
+('SMS', "SELECT time,type,number,body,contact FROM sms WHERE time IS NOT NULL ORDER BY time DESC", lambda r: (r[0], 'SMS ('+r[1]+')', r[2], r[4], r[3])),
+('WhatsApp', "SELECT time,direction,number,text,media_name,contact FROM wa_messages WHERE time IS NOT NULL ORDER BY time DESC", lambda r: (r[0], 'WhatsApp ('+r[1]+')', r[2], r[5], r[3] if r[3] != None else r[4])),
+('Facebook', "SELECT time,sender_id,sender,text FROM fb_messages WHERE time IS NOT NULL ORDER BY time DESC", lambda r: (r[0], 'Facebook message', r[1], r[2], r[3]))
+]
+
+def timeline_stream(store, query, event):
+	c = store.con.cursor()
+	c.execute(query)
+	return map(event, iter_rows(c))
 
-for torep in REPORT:
-	file_handle.write('<tr><td>%s:</td><td>' % torep[0])
-	if type(torep[1]) is list:
-		for tore in torep[1]:
-			file_handle.write('%s<br/>' % tore)
-		file_handle.write('</td></tr>\n')
+def write_timeline(store):
+	streams = [timeline_stream(store, x[1], x[2]) for x in TIMELINE_SOURCES]
+	page = None
+	fileh = None
+	for tl_item in heapq.merge(*streams, key=lambda x: x[0], reverse=True):
+		if page == None:
+			page = ReportWriter('timeline', 'Timeline', [('Time', 'nowrap'), ('Event', 'nowrap'), ('Number', 'nowrap'), ('Name', 'nowrap'), ('Content', 'width="500"')])
+			fileh = open(OUTPUT+'timeline.jsonl', 'w', encoding='UTF-8')
+		page.row(fmt_time(tl_item[0]), tl_item[1], tl_item[2], tl_item[3], tl_item[4])
+		fileh.write(dumps(dict(zip(['time', 'event', 'number', 'name', 'content'], tl_item)), ensure_ascii=False) + '\n')
+	if page != None:
+		fileh.close()
+		page.close()
+		REPORT.append(['Timeline', RawHTML('<a href="%s">%s (%d)</a>' % (esc(page.first), 'Timeline', page.count))])
+
+def write_report():
+	print("\033[94m>>>>>>>>>> Generating report:\033[0m")
+
+	file_handle = open(OUTPUT+SEP+'REPORT.html', 'w', encoding='UTF-8')
+
+	report_t = '<!DOCTYPE html><html><head>\n<title>Andriller Report for %s</title>\n<style>body,td,tr {font-family: Vernada, Arial, sans-serif; font-size: 12px;}</style></head><body>\n<p align="center"><i># This report was generated using Andriller version %s on %s #</i></p><h3 align="center">[Andriller Report] %s %s | %s</h3>\n<table border="1" cellpadding=2 cellspacing="0" align="center">\n<tr bgcolor="#72A0C1"><th>Type</th><th>Data</th></tr>\n' % (esc(IMEI), ANDRILLER_VERSION, esc(LOCAL_TIME), esc(DEVICE_MANUF), esc(DEVICE_MODEL), esc(IMEI))
+
+	file_handle.write(report_t)
+
+	# values come from the device; only RawHTML rows (links to pages) go in as they are
+	for torep in REPORT:
+		file_handle.write('<tr><td>%s:</td><td>' % esc(torep[0]))
+		if type(torep[1]) is list:
+			for tore in torep[1]:
+				file_handle.write('%s<br/>' % (tore if isinstance(tore, RawHTML) else esc(tore)))
+			file_handle.write('</td></tr>\n')
+		else:
+			file_handle.write('%s</td></tr>\n' % (torep[1] if isinstance(torep[1], RawHTML) else esc(torep[1])))
+
+	file_handle.write(REP_FOOTER)
+	file_handle.close()
+
+	# Print generated report path:
+	print('\033[92m'+os.path.abspath(OUTPUT+'REPORT.html')+'\033[0m')
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# CASE FOLDERS
+# The device details gathered during acquisition are kept in case.json, so the
+# decoders and reports can be re-run later from the case folder alone.
+#
+CASE_FILES = ['manifest.tsv', 'md5sums']	# Files in db/ that are not acquired data
+
+def save_case_info():
+	fileh = open(OUTPUT+'case.json', 'w', encoding='UTF-8')
+	dump({'serial': ADB_SER, 'imei': IMEI, 'manufacturer': DEVICE_MANUF, 'model': DEVICE_MODEL, 'local_time': LOCAL_TIME, 'report': REPORT}, fileh, indent=1)
+	fileh.close()
+
+# Accepts '<manuf>_<model>_<date>_<time>' or its 'db' sub-folder
+def load_case(CASE_DIR):
+	global OUTPUT, IMEI, LOCAL_TIME, DEVICE_MANUF, DEVICE_MODEL, REPORT, DLLS
+	CASE_DIR = os.path.normpath(CASE_DIR)
+	if os.path.basename(CASE_DIR) == 'db':
+		CASE_DIR = os.path.dirname(CASE_DIR) or '.'
+	OUTPUT = CASE_DIR+SEP
+	if os.path.isfile(OUTPUT+'case.json'):
+		fileh = open(OUTPUT+'case.json', encoding='UTF-8')
+		case = load(fileh)
+		fileh.close()
 	else:
-		file_handle.write('%s</td></tr>\n' % torep[1])
+		# acquisitions made before case.json existed: the folder name is all there is
+		name = os.path.basename(CASE_DIR).split('_')
+		case = {'imei': 'Unknown', 'manufacturer': name[0], 'model': '_'.join(name[1:-2]), 'local_time': ' '.join(name[-2:]).replace('.', ':'), 'report': []}
+	IMEI = case['imei']
+	DEVICE_MANUF = case['manufacturer']
+	DEVICE_MODEL = case['model']
+	LOCAL_TIME = case['local_time']
+	REPORT = case['report']
+	DLLS = sorted([x for x in os.listdir(OUTPUT+'db') if x not in CASE_FILES and x.endswith(RESUME_FILES) == False and os.path.isfile(OUTPUT+'db'+SEP+x)])
+
+# Returns False if the case could not be decoded, so the next one can still be
+def redecode_case(CASE_DIR):
+	if os.path.isdir(os.path.join(CASE_DIR, 'db')) == False and os.path.basename(os.path.normpath(CASE_DIR)) != 'db':
+		print("\033[91m Not a case folder: %s\033[0m" % CASE_DIR)
+		return False
+	try:
+		load_case(CASE_DIR)
+		print("\033[94m>>>>>>>>>> Decoding data: %s\033[0m" % OUTPUT)
+		DECODE_ALL(DLLS)
+		write_report()
+	except Exception as e:
+		print("\033[91m Decoding %s failed: %r\033[0m" % (CASE_DIR, e))
+		if STORE != None:
+			try:
+				STORE.con.close()
+			except sq.Error:
+				pass
+		return False
+	return True
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# MULTIPLE DEVICES
+# With --all-devices every device listed by 'adb devices' is acquired by its own
+# copy of this script, pinned with --serial, so each acquisition keeps its own
+# globals and case folder. At most max_devices run at once and share the
+# bandwidth limit evenly. Each child's output goes to acquire_<serial>.log, and
+# its latest line is shown on the dashboard.
+#
+DASH_REFRESH = 0.5	# Seconds between dashboard redraws
+ANSI_CODE = re.compile(r'\033\[[0-9;]*m')
+
+def list_devices():
+	devices = []
+	for line in co([ADB, 'devices']).decode('UTF-8', 'replace').replace('\r', '').split('\n')[1:]:
+		if '\t' in line:
+			devices.append(tuple(line.split('\t')[:2]))		# (serial, state)
+	return devices
+
+class DeviceJob:
+	def __init__(self, serial, cmd):
+		self.serial = serial
+		self.cmd = cmd
+		self.proc = None
+		self.status = 'waiting'
+		self.t_beg = None
+		self.t_end = None
+
+	def start(self):
+		self.t_beg = time.time()
+		self.status = 'starting'
+		self.log = open('acquire_%s.log' % re.sub(r'[^\w.-]', '_', self.serial), 'wb')
+		# one pipe for both, drained as the child runs, so a chatty stderr cannot fill up
+		self.proc = Popen(self.cmd, stdout=PIPE, stderr=STDOUT, env=dict(os.environ, PYTHONUNBUFFERED='1'))
+		self.reader = threading.Thread(target=self._read, daemon=True)
+		self.reader.start()
+
+	def _read(self):
+		for line in iter(self.proc.stdout.readline, b''):
+			self.log.write(line)
+			# status lines are redrawn in place with '\r'; keep the last one
+			for part in reversed(re.split(r'[\r\n]', ANSI_CODE.sub('', line.decode('UTF-8', 'replace')))):
+				if part.strip() != '':
+					self.status = part.strip()
+					break
+
+	def poll(self):
+		if self.proc == None or self.t_end != None:
+			return self.t_end != None
+		if self.proc.poll() == None:
+			return False
+		self.reader.join()
+		self.log.close()
+		self.t_end = time.time()
+		if self.proc.returncode != 0:
+			self.status = 'FAILED (%d) %s' % (self.proc.returncode, self.status[:40])
+		elif self.status.endswith('REPORT.html'):
+			self.status = 'done ' + self.status
+		return True
+
+	def line(self):
+		if self.t_beg == None:
+			elapsed = ''
+		else:
+			elapsed = '%5ds' % ((self.t_end or time.time()) - self.t_beg)
+		status = self.status if len(self.status) <= 72 else '...' + self.status[-69:]
+		return ' %-20s %6s  %s' % (self.serial, elapsed, status)
+
+def draw_dashboard(jobs, redraw):
+	if redraw:
+		sys.stdout.write('\033[%dA' % len(jobs))
+	for job in jobs:
+		sys.stdout.write('\033[2K' + job.line() + '\n')
+	sys.stdout.flush()
+
+def acquire_all_devices(child_args, max_devices, bandwidth):
+	devices = list_devices()
+	ready = [x[0] for x in devices if x[1] == 'device']
+	for serial, state in devices:
+		if state != 'device':
+			print("\033[91m Skipping %s: %s\033[0m" % (serial, state))
+	if ready == []:
+		print("\033[91m No Android device found!\033[0m")
+		return 1
+	rate = None
+	if bandwidth != None:
+		rate = int(bandwidth / min(max_devices, len(ready)))
+	jobs = []
+	for serial in ready:
+		cmd = [sys.executable, os.path.abspath(__file__), '--serial', serial] + child_args
+		if rate != None:
+			cmd += ['--rate-limit', str(rate)]
+		jobs.append(DeviceJob(serial, cmd))
+	print("\033[94m>>>>>>>>>> Acquiring %d devices, %d at a time\033[0m" % (len(jobs), max_devices))
+	tty = sys.stdout.isatty()
+	shown = {}
+	redraw = False
+	while True:
+		running = [x for x in jobs if x.proc != None and x.poll() == False]
+		for job in jobs:
+			if job.proc == None and len(running) < max_devices:
+				job.start()
+				running.append(job)
+		if tty:
+			draw_dashboard(jobs, redraw)
+			redraw = True
+		else:
+			for job in jobs:
+				if shown.get(job.serial) != job.status:
+					shown[job.serial] = job.status
+					print(job.line())
+		if all([x.t_end != None for x in jobs]):
+			break
+		time.sleep(DASH_REFRESH)
+	failed = [x.serial for x in jobs if x.proc.returncode != 0]
+	if failed != []:
+		print("\033[91m Failed: %s (see acquire_<serial>.log)\033[0m" % ', '.join(failed))
+	return len(failed) != 0
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# MAIN
+#
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Andriller - forensic acquisition tool for Android devices.')
+	parser.add_argument('--pin-max', type=int, metavar='DIGITS', help='longest lockscreen PIN searched (default %d; every extra digit takes 10 times longer)' % PIN_MAX)
+	parser.add_argument('--bench-pin', type=int, metavar='DIGITS', help='benchmark the lockscreen PIN cracker on a DIGITS long search space, then exit')
+	parser.add_argument('--build-gesture-index', action='store_true', help='(re)build the gesture pattern index, then exit')
+	parser.add_argument('--verify-gesture-index', action='store_true', help='check the gesture pattern index, then exit')
+	parser.add_argument('--bench-threads-db2', action='store_true', help='benchmark the Facebook messages decoder on a synthetic threads_db2, then exit')
+	parser.add_argument('--serial', metavar='SERIAL', help='acquire the device with this adb serial, when several are connected')
+	parser.add_argument('--all-devices', action='store_true', help='acquire every connected device concurrently, one process per device')
+	parser.add_argument('--max-devices', type=int, default=4, metavar='N', help='with --all-devices: devices acquired at the same time (default 4)')
+	parser.add_argument('--bandwidth', type=float, metavar='MB/S', help='with --all-devices: total transfer rate shared by the running devices')
+	parser.add_argument('--rate-limit', type=int, metavar='BYTES/S', help=argparse.SUPPRESS)
+	parser.add_argument('--incremental', nargs='?', const='stat', choices=['stat', 'hash'], help="reuse files unchanged since this device's last case: compare size and mtime ('stat', default) or also a SHA-256 computed on the device ('hash')")
+	parser.add_argument('--acquisition', choices=['stream', 'staged', 'chunked'], default=ACQ_MODE, help="how files are transferred: one tar stream (default), staged 'adb pull' copies, or verified resumable chunks")
+	parser.add_argument('--dl-workers', type=int, metavar='N', help='staged files pulled and hashed at the same time (default %d)' % DL_WORKERS)
+	parser.add_argument('--resume', metavar='CASE', help='continue an interrupted chunked acquisition into its case folder')
+	parser.add_argument('--image', nargs='?', const='userdata', metavar='PARTITION', help="rooted devices: also image a partition ('userdata' by default, or a /dev/block path) into a compressed, seekable image/<name>.img.gz")
+	parser.add_argument('--country-code', metavar='CODE', help="calling code (such as 44) that numbers saved in national form are read with, when matching them to contacts")
+	parser.add_argument('--timezone', metavar='ZONE', help="time zone of report times: 'local' (default), 'UTC', an offset such as '+02:00', or a name such as 'Europe/London'")
+	parser.add_argument('--raw-rows', type=int, metavar='N', help='rows exported per table of databases without a decoder (default %d, 0 for all)' % RAW_ROWS)
+	parser.add_argument('--decode', nargs='+', metavar='CASE', help='re-run the decoders and reports on existing case folders, without a device')
+	parser.add_argument('--search', nargs=2, metavar=('CASE', 'TERMS'), help="full-text search of a decoded case's messages and captions (FTS5 syntax: words, \"phrases\", prefix*, AND/OR/NOT), then exit")
+	parser.add_argument('--bench-search', action='store_true', help='benchmark the full-text search index on a synthetic corpus, then exit')
+	args = parser.parse_args()
+
+	# Intro info
+	print("\033[93m>>>>>>>>>> Andriller version: %s\033[0m" % ANDRILLER_VERSION)
+	print("\033[93m>>>>>>>>>> Build date: %s\033[0m" % A_BUILD_DATE)
+	print("\033[93m>>>>>>>>>> http://android.saz.lt\033[0m")
+
+	if args.timezone != None:
+		set_time_zone(args.timezone)
+	if args.pin_max != None:
+		PIN_MAX = args.pin_max
+	if args.country_code != None:
+		COUNTRY_CODE = args.country_code.lstrip('+')
+	if args.raw_rows != None:
+		RAW_ROWS = args.raw_rows if args.raw_rows > 0 else None
+	if args.dl_workers != None:
+		DL_WORKERS = max(1, args.dl_workers)
+	if args.bench_pin != None:
+		bench_pin(args.bench_pin)
+		sys.exit()
+	if args.bench_threads_db2:
+		bench_threads_db2()
+		sys.exit()
+	if args.bench_search:
+		bench_search()
+		sys.exit()
+	if args.search != None:
+		print_search(args.search[0], args.search[1])
+		sys.exit()
+	if args.build_gesture_index:
+		build_gesture_index(gesture_index_path())
+		print(" Gesture index: " + gesture_index_path())
+		sys.exit()
+	if args.verify_gesture_index:
+		problems = verify_gesture_index()
+		for problem in problems:
+			print("\033[91m " + problem + "\033[0m")
+		sys.exit(len(problems) != 0)
+	if args.decode != None:
+		failed = [x for x in args.decode if redecode_case(x) == False]
+		if failed != []:
+			sys.exit("\033[91m Not decoded: %s\033[0m" % ', '.join(failed))
+		sys.exit()
+
+	# Check OS and define adb
+	download_adb = ' ERROR! \n\'./adb\' file is not present!\n Download it from http://android.saz.lt/download/adb.zip; \n Unzip, and place them into this directory;\n Run the program again.'
+	OS_CHECK = sys.platform
+	if OS_CHECK == 'linux' or OS_CHECK == 'linux2':
+		if call(['which', 'adb']) == 0:
+			ADB = "adb"
+		else:
+			ADB = './adb'
+			if os.path.isfile(ADB) == True:
+				os.chmod(ADB, '0755')
+			else:
+				sys.exit(download_adb)
+	elif OS_CHECK == 'win32':
+		ADB = "adb.exe"
+		if os.path.isfile(ADB) == False:
+			sys.exit(download_adb)
+	elif OS_CHECK == 'darwin':
+		ADB = "./adb_mac"
+		if os.path.isfile(ADB) == False:
+			sys.exit(download_adb)
+	try:
+		ADB; co([ADB, 'start-server'])
+	except NameError:
+		sys.exit(" Cannot determine OS!")
+
+	if args.all_devices:
+		child_args = ['--timezone', args.timezone] if args.timezone != None else []
+		if args.country_code != None:
+			child_args += ['--country-code', args.country_code]
+		if args.pin_max != None:
+			child_args += ['--pin-max', str(args.pin_max)]
+		if args.raw_rows != None:
+			child_args += ['--raw-rows', str(args.raw_rows)]
+		if args.dl_workers != None:
+			child_args += ['--dl-workers', str(args.dl_workers)]
+		if args.incremental != None:
+			child_args += ['--incremental', args.incremental]
+		child_args += ['--acquisition', args.acquisition]
+		if args.image != None:
+			child_args += ['--image', args.image]
+		sys.exit(acquire_all_devices(child_args, max(1, args.max_devices), args.bandwidth*1048576 if args.bandwidth != None else None))
+	if args.serial != None:
+		ADB_SERIAL = args.serial
+	elif len([x for x in list_devices() if x[1] == 'device']) > 1:
+		sys.exit("\033[91m More than one device connected; choose one with --serial, or use --all-devices.\033[0m")
+	RATE_LIMIT = args.rate_limit
+	INCREMENTAL = args.incremental
+	ACQ_MODE = 'chunked' if args.resume != None else args.acquisition
+
+	# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+	# Unrooted (shell) devices, to print device information, limited extractions 
+	#
+	print("\033[94m>>>>>>>>>> General Device Information.\033[0m")
+
+	# Check for connected Android device
+	if 'unknown' in co(adb('get-state')).decode('UTF-8'):
+		sys.exit("\033[91m No Android device found!\033[0m")
+	else:
+		ADB_SER = co(adb('get-serialno')).decode('UTF-8').replace('\n', '').replace('\r', '')
+		print(" ADB serial: " + ADB_SER); REPORT.append(["ADB serial", ADB_SER])
+
+	# Open the shell session
+	SHELL = AdbSession()
+
+	# Check permissions
+	QPERM = SHELL.run('id')
+	if 'root' in QPERM:
+		PERM = 'root'
+	else:
+		QPERMSU = SHELL.run('su', '-c', 'id')
+		if 'root' in QPERMSU:
+			PERM = 'root(su)'
+		else:
+			PERM = 'shell'
+	try:
+		print(" Shell permissions: " + PERM); REPORT.append(["Shell permissions", PERM])
+	except NameError:
+		sys.exit("\033[91m Android permission cannot be established!\033[0m")
+
+	PROPS = DeviceProps(SHELL)
+
+	# Make & Model
+	DEVICE_MANUF = PROPS.prop('ro.product.manufacturer', 'Unknown')
+	DEVICE_MODEL = PROPS.prop('ro.product.model', 'Unknown')
+	print(" Device model: %s %s" % (DEVICE_MANUF, DEVICE_MODEL)); REPORT.append(["Manufacturer", DEVICE_MANUF]); REPORT.append(["Model", DEVICE_MODEL])
+
+	# IMEI
+	IMEI = PROPS.dumpsys_field('iphonesubinfo', 'Device ID')
+	if IMEI == None:
+		IMEI = (PROPS.dumpsys('iphonesubinfo').split() or ['Unknown'])[-1]
+	print(" IMEI: " + IMEI); REPORT.append(["IMEI", IMEI])
+
+	# A version
+	ANDROID_VER = PROPS.prop('ro.build.version.release')
+	if ANDROID_VER != None:
+		print(" Android version: " + ANDROID_VER); REPORT.append(["Android version", ANDROID_VER])
+
+	# Build ID
+	BUILD_ID = PROPS.prop('ro.build.display.id')
+	if BUILD_ID != None:
+		print(" Build number: " + BUILD_ID); REPORT.append(["Build name", BUILD_ID])
+
+	# Other properties, where set
+	for label, key in DEVICE_PROPS:
+		value = PROPS.prop(key)
+		if value != None:
+			REPORT.append([label, value])
+
+	# Wifi
+	wifi_mac = re.search(r'MAC: ([0-9A-Fa-f]{2}(?::[0-9A-Fa-f]{2}){5}),', PROPS.dumpsys('wifi'))
+	if wifi_mac != None:
+		WIFI_MAC = wifi_mac.group(1).lower()
+		print(" Wi-fi MAC: " + WIFI_MAC); REPORT.append(["Wifi MAC", WIFI_MAC])
+
+	# Time and date
+	LOCAL_TIME = time.strftime('%Y-%m-%d %H:%M:%S %Z')
+	try:
+		print(" Local time: " + LOCAL_TIME); REPORT.append(["Local time", LOCAL_TIME])
+	except:
+		pass
+	ANDROID_TIME = SHELL.run('date', "'+%F %T %Z'").replace('\r', '').replace('\n', '')
+	try:
+		print(" Android time: " + ANDROID_TIME); REPORT.append(["Android time", ANDROID_TIME])
+	except:
+		pass
+
+	# SIM card extraction 
+	SIM_LOC = '/data/system/SimCard.dat'
+	if SHELL.run('ls', SIM_LOC).replace('\r', '').replace('\n', '') == SIM_LOC:
+		SIM_DATA = SHELL.run('cat', SIM_LOC).replace('\r', '')
+		for sim_d in SIM_DATA.split('\n'):
+			if 'CurrentSimSerialNumber' in sim_d:
+				SIM_ICCID = sim_d.split('=')[1]
+				if SIM_ICCID != '' and SIM_ICCID != 'null':
+					REPORT.append(['SIM ICCID', SIM_ICCID])
+			if 'CurrentSimPhoneNumber' in sim_d:
+				SIM_MSISDN = sim_d.split('=')[1]
+				if SIM_MSISDN != '' and SIM_MSISDN != 'null':
+					REPORT.append(['SIM MSISDN', SIM_MSISDN])
+			if 'CurrentSimOperatorName' in sim_d:
+				SIM_OP = sim_d.split('=')[1]
+				if SIM_OP != '' and SIM_OP != 'null':
+					REPORT.append(['SIM Operator', SIM_OP])
+			if 'PreviousSimSerialNumber' in sim_d:
+				PRV_SIM_ICCID = sim_d.split('=')[1]
+				if PRV_SIM_ICCID != '' and PRV_SIM_ICCID != 'null':
+					REPORT.append(['SIM ICCID (Previous)', PRV_SIM_ICCID])
+			if 'PreviousSimPhoneNumber' in sim_d:
+				PRV_SIM_MSISDN = sim_d.split('=')[1]
+				if PRV_SIM_MSISDN != '' and PRV_SIM_MSISDN != 'null':
+					REPORT.append(['SIM MSISDN (Previous)', PRV_SIM_MSISDN])
+
+	#
+	# Accounts
+	ACCOUNTS = []
+	for acc in re.finditer(r'Account \{name=(.*?), type=(.*?)\}', PROPS.dumpsys('account')):
+		ACCOUNTS.append(acc.group(2)+": "+acc.group(1))
+	if ACCOUNTS != '':
+		print("\033[94m>>>>>>>>>> Sync'ed Accounts.\033[0m")
+		for account in ACCOUNTS:
+			print(account)
+		REPORT.append(["Accounts", ACCOUNTS])
+
+	# Create output directory
+	OR_DATE = time.strftime('%Y-%m-%d')
+	OR_TIME = time.strftime('%H.%M.%S')
+	if args.resume != None:
+		OUTPUT = os.path.normpath(args.resume)+SEP
+		if os.path.isdir(OUTPUT+'db') == False:
+			sys.exit("\033[91m Not a case folder: %s\033[0m" % args.resume)
+		try:
+			fileh = open(OUTPUT+'case.json', encoding='UTF-8')
+			RESUME_SER = load(fileh).get('serial')
+			fileh.close()
+		except (OSError, ValueError):
+			RESUME_SER = ADB_SER
+		if RESUME_SER != ADB_SER:
+			sys.exit("\033[91m %s was acquired from %s, not %s!\033[0m" % (args.resume, RESUME_SER, ADB_SER))
+	elif ADB_SERIAL != None:
+		# devices of one model acquired together would otherwise share a folder name
+		OUTPUT = DEVICE_MANUF+"_"+DEVICE_MODEL+"_"+re.sub(r'[^\w.-]', '_', ADB_SERIAL)+"_"+OR_DATE+"_"+OR_TIME+SEP
+	else:
+		OUTPUT = DEVICE_MANUF+"_"+DEVICE_MODEL+"_"+OR_DATE+"_"+OR_TIME+SEP
+	if args.resume == None:
+		try:
+			os.mkdir(OUTPUT)
+			os.mkdir(OUTPUT+SEP+'db')
+		except:
+			sys.exit(" Insufficient permissions to create a folder in this directory!")
+	# written again after decoding; until then it records which device the folder is for
+	save_case_info()
+
+	# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+	# ROOT EXTRACTION
+	#
+	if 'root' in QPERM:
+		SUC = ''
+		ROOT = SHELL
+		print("\033[94m>>>>>>>>>> Downloading databases...\033[0m")
+	elif 'root' in QPERMSU:
+		SUC = 'su -c'
+		ROOT = AdbSession(su=True)
+		print("\033[94m>>>>>>>>>> Downloading databases...\033[0m")
+	if 'root' in PERM:
+		download_databases(DBLS + sidecar_paths(DBLS), ACQ_MODE, DL_WORKERS)
+		if args.image != None:
+			image_partition(args.image)
+		ROOT.close()
+	elif args.image != None:
+		print("\033[91m Imaging needs root; skipped.\033[0m")
+	SHELL.close()
+
+	save_case_info()
 
-file_handle.write(REP_FOOTER)
-file_handle.close()
+	if DLLS != []:
+		print("\033[94m>>>>>>>>>> Decoding data...\033[0m")
+		DECODE_ALL(DLLS)
 
-# Print generated report path:
-print('\033[92m'+os.getcwd()+SEP+OUTPUT+'REPORT.html\033[0m')
+	write_report()
@@ -0,0 +1,138 @@
+import os
+import time
+
+import pytest
+
+import Andriller
+
+FAKE_ADB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_adb')
+
+
+# A rooted fake device whose files are the paths under tmp_path/device
+@pytest.fixture
+def device(tmp_path, monkeypatch):
+	for name in ('FAKE_ADB_SERIALS', 'FAKE_ADB_NOSU', 'FAKE_ADB_NOSESSION', 'FAKE_ADB_LINK'):
+		monkeypatch.delenv(name, raising=False)
+	monkeypatch.setenv('FAKE_ADB_ROOT', '1')
+	monkeypatch.setenv('FAKE_ADB_LOG', str(tmp_path / 'adb.log'))
+	monkeypatch.setattr(Andriller, 'ADB', FAKE_ADB, raising=False)
+	monkeypatch.setattr(Andriller, 'ADB_SERIAL', None)
+	monkeypatch.setattr(Andriller, 'ADB_SER', 'FAKE0001', raising=False)
+	monkeypatch.setattr(Andriller, 'PERM', 'root', raising=False)
+	monkeypatch.setattr(Andriller, 'SUC', '', raising=False)
+	monkeypatch.setattr(Andriller, 'RATE_LIMIT', None)
+	monkeypatch.setattr(Andriller, 'INCREMENTAL', None)
+	monkeypatch.setattr(Andriller, 'PULL_CHUNK', 4096)
+	monkeypatch.setattr(Andriller, 'STAGE_TIMES', dict([(x, []) for x in Andriller.STAGE_TIMES]))
+	(tmp_path / 'device').mkdir()
+	shell = Andriller.AdbSession()
+	monkeypatch.setattr(Andriller, 'ROOT', shell, raising=False)
+	yield tmp_path
+	shell.close()
+
+
+def device_file(tmp_path, name, size):
+	path = tmp_path / 'device' / name
+	path.write_bytes(os.urandom(size))
+	return str(path)
+
+
+def acquire(monkeypatch, case, paths, mode):
+	(case / 'db').mkdir(parents=True, exist_ok=True)
+	monkeypatch.setattr(Andriller, 'OUTPUT', str(case) + os.sep, raising=False)
+	monkeypatch.setattr(Andriller, 'DLLS', [])
+	Andriller.download_databases(paths, mode)
+	return Andriller.read_manifest(str(case / 'db' / 'manifest.tsv'))
+
+
+def chunk_reads(tmp_path):
+	log = (tmp_path / 'adb.log').read_text().split('\n')
+	(tmp_path / 'adb.log').write_text('')
+	return [x for x in log if ' exec-out ' in x and 'dd if=' in x]
+
+
+# The link drops on the second file; --resume only fetches the chunks still missing
+def test_chunked_resume(device, monkeypatch):
+	first = device_file(device, 'first.db', 12000)
+	second = device_file(device, 'second.db', 9000)
+	(device / 'link').write_text('4')
+	monkeypatch.setenv('FAKE_ADB_LINK', str(device / 'link'))
+	manifest = acquire(monkeypatch, device / 'case', [first, second], 'chunked')
+	assert list(manifest) == [first]
+	assert (device / 'case' / 'db' / 'first.db.journal').is_file()
+	assert len(chunk_reads(device)) == 4 + Andriller.CHUNK_RETRIES
+	monkeypatch.delenv('FAKE_ADB_LINK')
+	manifest = acquire(monkeypatch, device / 'case', [first, second], 'chunked')
+	reads = chunk_reads(device)
+	assert len(reads) == 2 and all(['second.db' in x for x in reads])
+	assert sorted(manifest) == sorted([first, second])
+	for path in (first, second):
+		name = os.path.basename(path)
+		assert (device / 'case' / 'db' / name).read_bytes() == open(path, 'rb').read()
+		assert manifest[path]['size'] == str(os.path.getsize(path))
+	assert sorted(os.listdir(str(device / 'case' / 'db'))) == ['first.db', 'manifest.tsv', 'second.db']
+
+
+# A file that grows after it was sized is sized again and read over; the files
+# after it are still acquired
+def test_chunked_file_changed(device, monkeypatch):
+	first = device_file(device, 'first.db', 12000)
+	second = device_file(device, 'second.db', 9000)
+	stat_databases = Andriller.stat_databases
+	def stat_then_grow(paths):
+		stat = stat_databases(paths)
+		if len(paths) == 2:
+			with open(first, 'ab') as fileh:
+				fileh.write(os.urandom(1000))
+		return stat
+	monkeypatch.setattr(Andriller, 'stat_databases', stat_then_grow)
+	manifest = acquire(monkeypatch, device / 'case', [first, second], 'chunked')
+	assert sorted(manifest) == sorted([first, second])
+	assert manifest[first]['size'] == '13000'
+	assert (device / 'case' / 'db' / 'first.db').read_bytes() == open(first, 'rb').read()
+	assert (device / 'case' / 'db' / 'second.db').read_bytes() == open(second, 'rb').read()
+
+
+# Staged pulls running side by side keep to the limit together
+def test_staged_rate_limit(device, monkeypatch):
+	paths = [device_file(device, 'file%d.db' % x, 50000) for x in range(4)]
+	monkeypatch.setattr(Andriller, 'RATE_LIMIT', 200000)
+	t_beg = time.time()
+	manifest = acquire(monkeypatch, device / 'case', paths, 'staged')
+	assert time.time() - t_beg >= 0.9
+	assert sorted(manifest) == sorted(paths)
+	log = (device / 'adb.log').read_text()
+	assert ' pull ' not in log and log.count(' exec-out cat ') == 4
+	for path in paths:
+		assert (device / 'case' / 'db' / os.path.basename(path)).read_bytes() == open(path, 'rb').read()
+
+
+# A second acquisition with INCREMENTAL='hash' links the files whose device SHA-256
+# matches the earlier case and streams only the changed one
+def test_incremental_hash(device, monkeypatch):
+	first = device_file(device, 'first.db', 12000)
+	second = device_file(device, 'second.db', 9000)
+	for name in ('IMEI', 'DEVICE_MANUF', 'DEVICE_MODEL', 'LOCAL_TIME'):
+		monkeypatch.setattr(Andriller, name, '', raising=False)
+	monkeypatch.setattr(Andriller, 'REPORT', [], raising=False)
+	manifest = acquire(monkeypatch, device / 'cases' / 'case1', [first, second], 'stream')
+	Andriller.save_case_info()
+	assert [manifest[x]['origin'] for x in (first, second)] == ['pulled', 'pulled']
+	# same size and mtime, new contents: only the device hash tells them apart
+	stat = os.stat(second)
+	with open(second, 'r+b') as fileh:
+		fileh.write(b'changed')
+	os.utime(second, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+	chunk_reads(device)
+	monkeypatch.setattr(Andriller, 'INCREMENTAL', 'hash')
+	manifest = acquire(monkeypatch, device / 'cases' / 'case2', [first, second], 'stream')
+	assert manifest[first]['origin'] == 'reused:case1'
+	assert manifest[second]['origin'] == 'pulled'
+	assert manifest[second]['mtime'] == Andriller.read_manifest(str(device / 'cases' / 'case1' / 'db' / 'manifest.tsv'))[second]['mtime']
+	case2 = device / 'cases' / 'case2' / 'db'
+	assert os.stat(str(case2 / 'first.db')).st_nlink == 2
+	assert os.path.samefile(str(case2 / 'first.db'), str(device / 'cases' / 'case1' / 'db' / 'first.db'))
+	assert os.stat(str(case2 / 'second.db')).st_nlink == 1
+	assert (case2 / 'second.db').read_bytes() == open(second, 'rb').read()
+	transfers = [x for x in (device / 'adb.log').read_text().split('\n') if ' exec-out ' in x or ' pull ' in x]
+	assert transfers != [] and not [x for x in transfers if 'first.db' in x]
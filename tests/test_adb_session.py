@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+import Andriller
+
+FAKE_ADB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_adb')
+
+
+@pytest.fixture(autouse=True)
+def fake_adb(monkeypatch):
+	for name in ('FAKE_ADB_SERIALS', 'FAKE_ADB_ROOT', 'FAKE_ADB_NOSU', 'FAKE_ADB_NOSESSION', 'FAKE_ADB_LOG'):
+		monkeypatch.delenv(name, raising=False)
+	monkeypatch.setattr(Andriller, 'ADB', FAKE_ADB, raising=False)
+	monkeypatch.setattr(Andriller, 'ADB_SERIAL', None)
+
+
+def test_session_framing():
+	shell = Andriller.AdbSession()
+	try:
+		assert shell.proc != None
+		assert shell.run('echo', 'hello') == 'hello\n'
+		assert shell.run('printf', "'no newline'") == 'no newline'
+		assert shell.run('printf', "'a\\nb\\n\\n'") == 'a\nb\n\n'
+		assert shell.run('true') == ''
+		# output that looks like the sentinel, and a command that reads stdin
+		assert shell.run('echo', shell.token + 'x') == shell.token + 'x\n'
+		assert shell.run('cat') == ''
+		assert shell.run('id') == 'uid=2000(shell) gid=2000(shell)\n'
+	finally:
+		shell.close()
+	assert shell.proc == None
+
+
+def test_session_exit_codes():
+	shell = Andriller.AdbSession()
+	try:
+		assert shell._exchange('true') == (0, b'')
+		assert shell._exchange('false') == (1, b'')
+		assert shell._exchange('echo out; (exit 3)') == (3, b'out\n')
+		# the session survives a failing command
+		assert shell.run('echo', 'still here') == 'still here\n'
+	finally:
+		shell.close()
+
+
+def test_session_matches_fallback(monkeypatch):
+	shell = Andriller.AdbSession()
+	framed = [shell.run('echo', 'hello'), shell.run('printf', "'a\\nb'"), shell.run('true')]
+	shell.close()
+	monkeypatch.setenv('FAKE_ADB_NOSESSION', '1')
+	shell = Andriller.AdbSession()
+	assert shell.proc == None
+	assert [shell.run('echo', 'hello'), shell.run('printf', "'a\\nb'"), shell.run('true')] == framed
+
+
+def test_su_session():
+	shell = Andriller.AdbSession(su=True)
+	try:
+		assert shell.proc != None
+		assert shell.run('id').startswith('uid=0(root)')
+	finally:
+		shell.close()
+
+
+def test_su_missing(monkeypatch):
+	monkeypatch.setenv('FAKE_ADB_NOSU', '1')
+	shell = Andriller.AdbSession(su=True)
+	assert shell.proc == None
+
+
+# Without a session the command goes through 'adb shell su -c', and is expanded by
+# the root shell only
+def test_su_fallback_quoting(monkeypatch):
+	monkeypatch.setenv('FAKE_ADB_NOSESSION', '1')
+	shell = Andriller.AdbSession(su=True)
+	assert shell.proc == None
+	assert shell.run('echo', '"it\'s"', "'$(id -u)'", '$FAKE_ADB_UID', '$(id)') == "it's $(id -u) 0 uid=0(root) gid=0(root)\n"
+
+
+def test_serial_pinned(monkeypatch, tmp_path):
+	monkeypatch.setenv('FAKE_ADB_SERIALS', 'FAKE0001,FAKE0002')
+	monkeypatch.setenv('FAKE_ADB_LOG', str(tmp_path / 'adb.log'))
+	monkeypatch.setattr(Andriller, 'ADB_SERIAL', 'FAKE0002')
+	shell = Andriller.AdbSession()
+	try:
+		assert shell.run('echo', 'hi') == 'hi\n'
+	finally:
+		shell.close()
+	assert (tmp_path / 'adb.log').read_text() == 'adb -s FAKE0002 shell\n'
@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import struct
+
+import Andriller
+
+
+def make_sms_db(path, rows):
+	con = sqlite3.connect(path)
+	con.execute("PRAGMA secure_delete=OFF")
+	con.execute("CREATE TABLE sms (_id INTEGER PRIMARY KEY, address TEXT, body TEXT, date INTEGER, type INTEGER)")
+	for i in range(1, rows+1):
+		con.execute("INSERT INTO sms VALUES (?,?,?,?,?)", (i, '+4477009%05d' % i, 'message number %d' % i, 1380000000000+i*1000, 1+i%2))
+	con.commit()
+	return con
+
+
+def carve(path, table):
+	con = sqlite3.connect(path)
+	schema = Andriller.carve_schema(con, table)
+	live = Andriller.live_records(con, table, schema[2])
+	con.close()
+	with open(path, 'rb') as fileh:
+		buf = fileh.read()
+	page_size = struct.unpack('>H', buf[16:18])[0]
+	task = ('sms.db', path, 'db', 1, len(buf)//page_size, page_size, [], [schema])
+	name, found = Andriller.carve_worker(task)
+	return set([tuple(x[4]) for x in found if hash(tuple(x[4])) not in live])
+
+
+def bodies(records):
+	return set([x[2] for x in records])
+
+
+def test_carve_freeblocks(tmp_path):
+	path = str(tmp_path / 'sms.db')
+	con = make_sms_db(path, 40)
+	con.execute("DELETE FROM sms WHERE _id IN (5, 9, 13)")
+	con.commit()
+	con.close()
+	assert bodies(carve(path, 'sms')) == set(['message number %d' % x for x in (5, 9, 13)])
+
+
+# Scattered deletes leave freeblocks; deleting the rows next to the cell content area
+# afterwards merges them into unallocated space
+def test_carve_bulk_delete(tmp_path):
+	path = str(tmp_path / 'sms.db')
+	con = make_sms_db(path, 60)
+	deleted = list(range(41, 61, 2)) + list(range(42, 61, 2)) + [5, 9, 13, 17, 21, 25, 29, 33, 37, 39, 40]
+	for i in deleted:
+		con.execute("DELETE FROM sms WHERE _id=?", (i,))
+		con.commit()
+	con.execute("DELETE FROM sms WHERE _id IN (1, 2, 3)")
+	con.commit()
+	con.close()
+	records = carve(path, 'sms')
+	assert bodies(records) == set(['message number %d' % x for x in deleted + [1, 2, 3]])
+	assert (None, '+447700900060', 'message number 60', 1380000060000, 1) in records
+
+
+def test_carve_no_false_matches(tmp_path):
+	path = str(tmp_path / 'sms.db')
+	con = make_sms_db(path, 0)
+	for i in range(3000):
+		con.execute("INSERT INTO sms VALUES (NULL,?,?,?,?)", (os.urandom(6).hex(), os.urandom(40).hex(), i*7919, i%5))
+	con.commit()
+	con.close()
+	assert carve(path, 'sms') == set()
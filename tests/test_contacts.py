@@ -0,0 +1,90 @@
+import pytest
+
+import Andriller
+
+
+# norm_number caches its results, so they are dropped around a COUNTRY_CODE change
+@pytest.fixture
+def country_code(monkeypatch):
+	def set_code(code):
+		monkeypatch.setattr(Andriller, 'COUNTRY_CODE', code)
+		Andriller.norm_number.cache_clear()
+	set_code(None)
+	yield set_code
+	Andriller.norm_number.cache_clear()
+
+
+def test_norm_number(country_code):
+	assert Andriller.norm_number('+44 7700 900-001') == '+447700900001'
+	assert Andriller.norm_number('0044 (7700) 900001') == '+447700900001'
+	assert Andriller.norm_number('447700900001@s.whatsapp.net') == '447700900001'
+	assert Andriller.norm_number('07700 900001') == '07700900001'
+	assert Andriller.norm_number(37060000001) == '37060000001'
+	assert Andriller.norm_number('0044') == '0044'
+	assert Andriller.norm_number('*#06#') == '06'
+	assert Andriller.norm_number('Private') == None
+	assert Andriller.norm_number(None) == None
+
+
+def test_norm_number_country_code(country_code):
+	country_code('44')
+	assert Andriller.norm_number('07700 900001') == '+447700900001'
+	assert Andriller.norm_number('+370 600 00001') == '+37060000001'
+	# short codes and numbers without the trunk prefix stay as they are
+	assert Andriller.norm_number('0800123') == '0800123'
+	assert Andriller.norm_number('7700900001') == '7700900001'
+
+
+def test_tail_match(country_code):
+	phonebook = Andriller.PhoneBook()
+	phonebook.add(Andriller.norm_number('07700 900001'), 'Alice', 'contacts2.db')
+	phonebook.add(Andriller.norm_number('+37060000001'), 'Bob', 'contacts2.db')
+	assert phonebook.name('07700900001') == 'Alice'
+	assert phonebook.name('+44 7700 900001') == 'Alice'
+	assert phonebook.name('0037060000001') == 'Bob'
+	assert phonebook.name('060000001') == 'Bob'
+	assert phonebook.name('+447700900002') == None
+	# too short to match on the tail
+	assert phonebook.name('900001') == None
+	assert phonebook.name(None) == None
+
+
+# Two contacts sharing the last PHONE_TAIL digits leave the tail unresolved; their
+# full numbers still resolve
+def test_ambiguous_tail(country_code):
+	phonebook = Andriller.PhoneBook()
+	phonebook.add('+447700900001', 'Alice', 'contacts2.db')
+	phonebook.add('+617700900001', 'Carol', 'contacts2.db')
+	phonebook.add('+447700900001', 'Alice', 'contacts2.db')
+	assert phonebook.name('07700 900001') == None
+	assert phonebook.name('+447700900001') == 'Alice'
+	assert phonebook.name('+617700900001') == 'Carol'
+	# the same name twice is not ambiguous
+	phonebook.add('+37060000001', 'Bob', 'contacts2.db')
+	phonebook.add('37060000001', 'Bob', 'contacts2.db')
+	assert phonebook.name('+49060000001') == 'Bob'
+
+
+# contacts2.db is added first; a WhatsApp name for the same number does not replace it
+def test_source_trust(country_code):
+	phonebook = Andriller.PhoneBook()
+	phonebook.add(Andriller.norm_number('07700 900001'), 'Alice', 'contacts2.db')
+	phonebook.add(Andriller.norm_number('447700900001@s.whatsapp.net'), 'Ally', 'wa.db')
+	phonebook.add(Andriller.norm_number('+37060000001'), 'Bob', 'wa.db')
+	assert phonebook.name('+447700900001') == 'Alice'
+	assert phonebook.name('447700900001') == 'Alice'
+	assert phonebook.name('07700900001') == 'Alice'
+	assert phonebook.name('+37060000001') == 'Bob'
+	# a different name from a later source does not make the tail ambiguous
+	assert phonebook.tails['700900001'] == ('Alice', 'contacts2.db')
+
+
+# With --country-code, national and international forms are the same number
+def test_country_code_lookup(country_code):
+	country_code('44')
+	phonebook = Andriller.PhoneBook()
+	phonebook.add(Andriller.norm_number('07700 900001'), 'Alice', 'contacts2.db')
+	assert phonebook.numbers == {'+447700900001': 'Alice'}
+	assert phonebook.name('+447700900001') == 'Alice'
+	assert phonebook.name('0044 7700 900001') == 'Alice'
+	assert phonebook.name('07700 900001') == 'Alice'
@@ -0,0 +1,90 @@
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+
+ANDRILLER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Andriller.py')
+
+
+def make_case(path, info):
+	os.makedirs(os.path.join(path, 'db'))
+	with open(os.path.join(path, 'case.json'), 'w') as fileh:
+		fileh.write(info)
+	con = sqlite3.connect(os.path.join(path, 'db', 'mmssms.db'))
+	con.execute("CREATE TABLE sms (_id INTEGER PRIMARY KEY, thread_id INTEGER, address TEXT, person INTEGER, date INTEGER, read INTEGER, type INTEGER, subject TEXT, body TEXT)")
+	con.execute("INSERT INTO sms VALUES (1, 1, '+447700900001', NULL, 1380000000000, 1, 1, NULL, 'hello')")
+	con.commit()
+	con.close()
+
+
+# A case that cannot be decoded is reported, and the cases after it are still decoded
+def test_decode_cases_isolated(tmp_path):
+	info = json.dumps({'imei': '000000000000000', 'manufacturer': 'samsung', 'model': 'GT-I9505', 'local_time': '2013-11-07 10:00:00', 'report': []})
+	make_case(str(tmp_path / 'broken'), info[:-5])
+	make_case(str(tmp_path / 'good'), info)
+	proc = subprocess.run([sys.executable, ANDRILLER, '--decode', 'broken', 'missing', 'good'], cwd=str(tmp_path),
+		stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=300)
+	out = proc.stdout.decode('UTF-8', 'replace')
+	assert proc.returncode == 1, out
+	assert 'Decoding broken failed' in out and 'Not a case folder: missing' in out
+	assert 'Not decoded: broken, missing' in out
+	assert (tmp_path / 'good' / 'REPORT.html').is_file()
+	assert b'hello' in (tmp_path / 'good' / 'mmssms.html').read_bytes()
+
+
+# An acquired database copied mid-transaction: its hot journal is rolled back on a
+# copy, and the acquired files are left as they are and still carved
+def test_decode_hot_journal(tmp_path):
+	info = json.dumps({'imei': '000000000000000', 'manufacturer': 'samsung', 'model': 'GT-I9505', 'local_time': '2013-11-07 10:00:00', 'report': []})
+	make_case(str(tmp_path / 'case'), info)
+	DB_FILE = str(tmp_path / 'case' / 'db' / 'mmssms.db')
+	con = sqlite3.connect(DB_FILE, isolation_level=None)
+	con.execute("PRAGMA secure_delete=OFF")
+	con.execute("INSERT INTO sms VALUES (2, 1, '+447700900003', NULL, 1380000002000, 1, 1, NULL, 'deleted message')")
+	con.execute("DELETE FROM sms WHERE _id=2")
+	con.execute("PRAGMA cache_size=2")
+	con.execute("BEGIN")
+	for i in range(200):
+		con.execute("INSERT INTO sms VALUES (NULL, 1, '+447700900002', NULL, 1380000001000, 1, 1, NULL, ?)", ('pending %d %s' % (i, 'y'*200),))
+	shutil.copyfile(DB_FILE, DB_FILE + '.hot')
+	shutil.copyfile(DB_FILE + '-journal', DB_FILE + '-journal.hot')
+	con.execute("ROLLBACK")
+	con.close()
+	os.replace(DB_FILE + '.hot', DB_FILE)
+	os.replace(DB_FILE + '-journal.hot', DB_FILE + '-journal')
+	with open(DB_FILE, 'rb') as fileh:
+		acquired = fileh.read()
+	proc = subprocess.run([sys.executable, ANDRILLER, '--decode', 'case'], cwd=str(tmp_path),
+		stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=300)
+	out = proc.stdout.decode('UTF-8', 'replace')
+	assert proc.returncode == 0, out
+	assert 'failed' not in out, out
+	page = (tmp_path / 'case' / 'mmssms.html').read_bytes()
+	assert b'hello' in page and b'pending' not in page
+	with open(DB_FILE, 'rb') as fileh:
+		assert fileh.read() == acquired
+	assert os.path.getsize(DB_FILE + '-journal') > 0
+	assert b'deleted message' in (tmp_path / 'case' / 'carved_mmssms_db_sms.html').read_bytes()
+
+
+# Device strings go into REPORT.html escaped; the rows linking to pages stay links
+def test_report_escaped(tmp_path):
+	report = [['Model', '<b>GT-I9505</b>'], ['net.bt.name', '<script>alert(1)</script>'], ['Accounts', ['a@example.com', '<i>b</i>']], ['Local time', '2013-11-07 10:00:00']]
+	info = json.dumps({'imei': '<imei>', 'manufacturer': 'samsung', 'model': '<b>GT-I9505</b>', 'local_time': '2013-11-07 10:00:00', 'report': report})
+	make_case(str(tmp_path / 'case'), info)
+	con = sqlite3.connect(str(tmp_path / 'case' / 'db' / 'settings.db'))
+	con.execute("CREATE TABLE secure (_id INTEGER PRIMARY KEY, name TEXT, value TEXT)")
+	con.executemany("INSERT INTO secure (name, value) VALUES (?,?)", [('bluetooth_address', '00:11:22:33:44:55'), ('bluetooth_name', '<script>x</script>'), ('android_id', 'a1b2c3')])
+	con.commit()
+	con.close()
+	proc = subprocess.run([sys.executable, ANDRILLER, '--decode', 'case'], cwd=str(tmp_path),
+		stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=300)
+	assert proc.returncode == 0, proc.stdout
+	page = (tmp_path / 'case' / 'REPORT.html').read_text(encoding='UTF-8')
+	assert '<script>' not in page and '<b>GT' not in page and '<i>b' not in page and '<imei>' not in page
+	assert '&lt;script&gt;alert(1)&lt;/script&gt;' in page and '&lt;script&gt;x&lt;/script&gt;' in page
+	assert '&lt;i&gt;b&lt;/i&gt;<br/>' in page
+	assert '<td>00:11:22:33:44:55</td>' in page and '<td>a1b2c3</td>' in page
+	assert '<a href="mmssms.html">SMS Messages (1)</a>' in page
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import time
+
+import Andriller
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+SERIALS = 'FAKE0001,FAKE0002,FAKE0003:unauthorized,FAKE0004:offline'
+
+
+def test_list_devices(monkeypatch):
+	monkeypatch.setenv('FAKE_ADB_SERIALS', SERIALS)
+	monkeypatch.setattr(Andriller, 'ADB', os.path.join(TESTS, 'fake_adb'), raising=False)
+	assert Andriller.list_devices() == [('FAKE0001', 'device'), ('FAKE0002', 'device'), ('FAKE0003', 'unauthorized'), ('FAKE0004', 'offline')]
+
+
+def run_job(job, timeout=60):
+	job.start()
+	t_beg = time.time()
+	while not job.poll():
+		assert time.time() - t_beg < timeout, 'job did not finish'
+		time.sleep(0.05)
+
+
+# A child writing more to stderr than a pipe holds must not block
+def test_job_stderr(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	child = "import sys; print('\\rcopying 1\\rcopying 2'); sys.stderr.write('x' * 1048576 + '\\n'); raise SystemExit('no device')"
+	job = Andriller.DeviceJob('FAKE/0001', [sys.executable, '-c', child])
+	run_job(job)
+	assert job.proc.returncode == 1
+	assert job.status == 'FAILED (1) no device'
+	log = (tmp_path / 'acquire_FAKE_0001.log').read_bytes()
+	assert log.startswith(b'\rcopying 1\rcopying 2\n') and log.endswith(b'no device\n')
+
+
+def test_job_done(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	job = Andriller.DeviceJob('FAKE0001', [sys.executable, '-c', "print('\\033[92m/cases/x/REPORT.html\\033[0m')"])
+	run_job(job)
+	assert job.status == 'done /cases/x/REPORT.html'
+
+
+# Every device that is ready gets its own child, pinned to its serial
+def test_all_devices(tmp_path):
+	bin_dir = tmp_path / 'bin'
+	bin_dir.mkdir()
+	(bin_dir / 'adb').symlink_to(os.path.join(TESTS, 'fake_adb'))
+	env = dict(os.environ, PATH=str(bin_dir) + os.pathsep + os.environ['PATH'], FAKE_ADB_SERIALS=SERIALS, FAKE_ADB_LOG=str(tmp_path / 'adb.log'))
+	proc = subprocess.run([sys.executable, os.path.join(os.path.dirname(TESTS), 'Andriller.py'), '--all-devices', '--max-devices', '1'],
+		cwd=str(tmp_path), env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, timeout=300)
+	out = proc.stdout.decode('UTF-8', 'replace')
+	assert proc.returncode == 0, out
+	assert 'Skipping FAKE0003: unauthorized' in out and 'Skipping FAKE0004: offline' in out
+	assert sorted([x.name for x in tmp_path.glob('acquire_*.log')]) == ['acquire_FAKE0001.log', 'acquire_FAKE0002.log']
+	for serial in ('FAKE0001', 'FAKE0002'):
+		assert b'REPORT.html' in (tmp_path / ('acquire_%s.log' % serial)).read_bytes()
+	serials = set([x.split()[2] for x in (tmp_path / 'adb.log').read_text().split('\n') if ' devices' not in x and x != ''])
+	assert serials == set(['FAKE0001', 'FAKE0002'])
@@ -0,0 +1,59 @@
+import hashlib
+import os
+
+import pytest
+
+import Andriller
+
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory):
+	path = str(tmp_path_factory.mktemp('gesture') / 'gesture.idx')
+	Andriller.build_gesture_index(path)
+	return path
+
+
+def lookup(path, pattern):
+	gidx = Andriller.open_gesture_index(path)
+	try:
+		return Andriller.lookup_gesture(hashlib.sha1(bytes(pattern)).digest(), gidx)
+	finally:
+		gidx.close()
+
+
+def test_verify(index):
+	assert Andriller.verify_gesture_index(index) == []
+
+
+def test_lookup(index):
+	for pattern in ([0, 1, 2, 5, 8], [6, 4, 2, 5], [0, 1, 2, 3], list(range(9)), [1, 0, 2, 5], [0, 5, 6, 1], [4, 0, 8, 5, 2]):
+		assert lookup(index, pattern) == pattern
+	# passing over a dot not yet in the pattern, too short, or a dot twice
+	for pattern in ([0, 2, 1, 3], [0, 8, 4, 1], [6, 2, 4, 1], [0, 1, 2], [0, 1, 0, 3], [9, 0, 1, 2]):
+		assert lookup(index, pattern) == None
+
+
+def test_verify_corrupt(index, tmp_path):
+	with open(index, 'rb') as fileh:
+		data = bytearray(fileh.read())
+	data[12 + 1000*Andriller.GIDX_REC + 25] ^= 0xff
+	(tmp_path / 'bad.idx').write_bytes(bytes(data))
+	assert Andriller.verify_gesture_index(str(tmp_path / 'bad.idx')) == ['record 1000 hash mismatch']
+	(tmp_path / 'short.idx').write_bytes(bytes(data[:-Andriller.GIDX_REC]))
+	with pytest.raises(ValueError):
+		Andriller.open_gesture_index(str(tmp_path / 'short.idx'))
+
+
+# Where the index cannot be written next to the script, it is built in the cache folder
+def test_decode_read_only_install(tmp_path, monkeypatch):
+	monkeypatch.setattr(Andriller, 'GESTURE_IDX', str(tmp_path / 'install' / 'gesture.idx'))
+	monkeypatch.setattr(Andriller, 'GESTURE_CACHE', str(tmp_path / 'cache' / 'andriller' / 'gesture.idx'))
+	monkeypatch.setattr(os, 'access', lambda path, mode: False)
+	(tmp_path / 'case' / 'db').mkdir(parents=True)
+	(tmp_path / 'case' / 'db' / 'gesture.key').write_bytes(hashlib.sha1(bytes([6, 4, 2, 5])).digest())
+	monkeypatch.setattr(Andriller, 'OUTPUT', str(tmp_path / 'case') + os.sep, raising=False)
+	monkeypatch.setattr(Andriller, 'REPORT', [])
+	Andriller.decode_gesturekey(None)
+	assert Andriller.REPORT == [['Gesture pattern', '6-4-2-5 (%s)' % hashlib.sha1(bytes([6, 4, 2, 5])).hexdigest()]]
+	assert (tmp_path / 'cache' / 'andriller' / 'gesture.idx').is_file()
+	assert not (tmp_path / 'install').exists()
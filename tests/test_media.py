@@ -0,0 +1,24 @@
+import hashlib
+import os
+import sqlite3
+
+import Andriller
+
+
+def test_add_blob(tmp_path):
+	output = str(tmp_path) + os.sep
+	con = sqlite3.connect(':memory:')
+	con.execute("CREATE TABLE photos (thumbnail BLOB)")
+	large = os.urandom(Andriller.CHUNK_SIZE*3 + 5)
+	for data in (b'\xff\xd8\xff small', large, large, b'\xff\xd8\xff small'):
+		con.execute("INSERT INTO photos VALUES (?)", (data,))
+	media = Andriller.MediaStore(output)
+	paths = [media.add_blob(con, 'photos', 'thumbnail', x, '.jpg') for x in (1, 2, 3, 4)]
+	media.close()
+	assert paths[0] == paths[3] and paths[1] == paths[2]
+	for path, data in zip(paths, (b'\xff\xd8\xff small', large)):
+		digest = hashlib.sha256(data).hexdigest()
+		assert path == os.path.join('media', digest[:2], digest + '.jpg')
+		with open(output + path, 'rb') as fileh:
+			assert fileh.read() == data
+	assert sorted([len(x[2]) for x in os.walk(output + 'media') if x[2] != []]) == [1, 1]
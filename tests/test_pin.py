@@ -0,0 +1,66 @@
+import hashlib
+import os
+import sqlite3
+
+import Andriller
+
+
+def password_key(pin, salt, md5_pin=None):
+	salt = ('%x' % (salt & 0xffffffffffffffff)).encode('ascii')
+	md5_pin = pin if md5_pin == None else md5_pin
+	return (hashlib.sha1(pin.encode('ascii') + salt).hexdigest() + hashlib.md5(md5_pin.encode('ascii') + salt).hexdigest()).upper()
+
+
+def test_crack_pin():
+	salt = 3582477098377895419
+	assert Andriller.crack_pin(password_key('0420', salt), salt, 4, 6, 2) == '0420'
+	assert Andriller.crack_pin(password_key('901234', salt), salt, 4, 6, 2) == '901234'
+	assert Andriller.crack_pin(password_key('90123', salt).lower() + '\n', salt, 4, 6, 2) == '90123'
+
+
+# lockscreen.password_salt is a signed 64-bit value, written as unsigned hex
+def test_crack_pin_negative_salt():
+	salt = -6795186306580627291
+	assert Andriller.crack_pin(password_key('7391', salt), salt, 4, 4, 2) == '7391'
+
+
+def test_crack_pin_md5_mismatch():
+	salt = 1234567890
+	assert Andriller.crack_pin(password_key('1234', salt, '4321'), salt, 4, 4, 2) == None
+
+
+def settings_case(tmp_path, monkeypatch, password_type, key):
+	(tmp_path / 'db').mkdir()
+	(tmp_path / 'db' / 'password.key').write_text(key)
+	con = sqlite3.connect(str(tmp_path / 'db' / 'settings.db'))
+	con.execute("CREATE TABLE secure (_id INTEGER PRIMARY KEY, name TEXT, value TEXT)")
+	con.execute("INSERT INTO secure (name, value) VALUES ('lockscreen.password_salt', '-6795186306580627291')")
+	if password_type != None:
+		con.execute("INSERT INTO secure (name, value) VALUES ('lockscreen.password_type', ?)", (str(password_type),))
+	con.commit()
+	monkeypatch.setattr(Andriller, 'OUTPUT', str(tmp_path) + os.sep, raising=False)
+	monkeypatch.setattr(Andriller, 'DLLS', ['password.key', 'settings.db'])
+	monkeypatch.setattr(Andriller, 'REPORT', [])
+	monkeypatch.setattr(Andriller, 'PIN_MAX', 4)
+	return con
+
+
+def test_decode_settings_numeric(tmp_path, monkeypatch):
+	con = settings_case(tmp_path, monkeypatch, 131072, password_key('2580', -6795186306580627291))
+	Andriller.decode_settingsdb(con)
+	assert ['Lockscreen PIN', '2580'] in Andriller.REPORT
+
+
+def test_decode_settings_not_found(tmp_path, monkeypatch):
+	con = settings_case(tmp_path, monkeypatch, None, password_key('25801', -6795186306580627291))
+	Andriller.decode_settingsdb(con)
+	assert ['Lockscreen PIN', 'not found in 4 to 4 digits'] in Andriller.REPORT
+
+
+# A password has the same key layout, but is not searched
+def test_decode_settings_alphanumeric(tmp_path, monkeypatch):
+	con = settings_case(tmp_path, monkeypatch, 327680, password_key('2580', -6795186306580627291))
+	monkeypatch.setattr(Andriller, 'crack_pin', None)
+	Andriller.decode_settingsdb(con)
+	assert ['Lockscreen password', 'alphanumeric, not searched'] in Andriller.REPORT
+	assert [x for x in Andriller.REPORT if x[0] == 'Lockscreen PIN'] == []
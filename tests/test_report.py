@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+import Andriller
+
+
+@pytest.fixture
+def case(tmp_path, monkeypatch):
+	monkeypatch.setattr(Andriller, 'OUTPUT', str(tmp_path) + os.sep, raising=False)
+	monkeypatch.setattr(Andriller, 'IMEI', '<imei>', raising=False)
+	monkeypatch.setattr(Andriller, 'LOCAL_TIME', '2026-10-18 20:36:28', raising=False)
+	return tmp_path
+
+
+def test_escaping(case):
+	rep = Andriller.ReportWriter('sms', 'SMS & MMS', [('From <number>', ''), ('Text', 'width="500"'), ('Link', '')])
+	rep.row('<script>alert(1)</script>', 'a & "b"', Andriller.RawHTML('<a href="x.html">x</a>'))
+	rep.row(None, 42, Andriller.esc_lines(['<one>', 'two']))
+	assert rep.close() == 2
+	page = (case / 'sms.html').read_text(encoding='UTF-8')
+	assert '<title>SMS &amp; MMS Andriller Report for &lt;imei&gt;</title>' in page
+	assert '<th>From &lt;number&gt;</th><th width="500">Text</th><th>Link</th>' in page
+	assert '<tr><td>&lt;script&gt;alert(1)&lt;/script&gt;</td><td width="500">a &amp; &quot;b&quot;</td><td><a href="x.html">x</a></td></tr>' in page
+	assert '<tr><td></td><td width="500">42</td><td>&lt;one&gt;<br/>two</td></tr>' in page
+	assert '<script>' not in page
+
+
+def test_pages(case):
+	rep = Andriller.ReportWriter('calls', 'Calls', [('Number', '')], page_rows=3)
+	for x in range(7):
+		rep.row('row%d' % x)
+	assert rep.first == 'calls.html'
+	assert rep.close() == 7
+	assert sorted(os.listdir(str(case))) == ['calls.html', 'calls_2.html', 'calls_3.html']
+	pages = [(case / x).read_text(encoding='UTF-8') for x in ('calls.html', 'calls_2.html', 'calls_3.html')]
+	assert [[x for x in range(7) if '<td>row%d</td>' % x in page] for page in pages] == [[0, 1, 2], [3, 4, 5], [6]]
+	assert 'Previous page' not in pages[0]
+	assert '<a href="calls_2.html">Next page</a>' in pages[0]
+	assert 'Page 2 | <a href="calls.html">Previous page</a>' in pages[1]
+	assert '<a href="calls_3.html">Next page</a>' in pages[1]
+	assert 'Page 3 | <a href="calls_2.html">Previous page</a>' in pages[2]
+	assert 'Next page' not in pages[2]
+	for page in pages:
+		assert page.count('</table>') == 1 and page.endswith(Andriller.REP_SIGNATURE)
+
+
+# A page filled exactly does not link to an empty next page
+def test_full_last_page(case):
+	rep = Andriller.ReportWriter('calls', 'Calls', [('Number', '')], page_rows=3)
+	for x in range(6):
+		rep.row('row%d' % x)
+	rep.close()
+	assert sorted(os.listdir(str(case))) == ['calls.html', 'calls_2.html']
+	assert 'Next page' not in (case / 'calls_2.html').read_text(encoding='UTF-8')
+
+
+def test_empty(case):
+	rep = Andriller.ReportWriter('contacts', 'Contacts', [('Name', ''), ('Number', '')], page_rows=3)
+	assert rep.close() == 0
+	assert os.listdir(str(case)) == ['contacts.html']
+	page = (case / 'contacts.html').read_text(encoding='UTF-8')
+	assert '<th>Name</th><th>Number</th></tr>\n</table>\n' in page
+	assert 'Next page' not in page and 'Previous page' not in page
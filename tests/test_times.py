@@ -0,0 +1,65 @@
+import pytest
+
+import Andriller
+
+T = 1700000000.25	# 2023-11-14 22:13:20.25 UTC
+
+
+@pytest.fixture
+def zone(monkeypatch):
+	monkeypatch.setattr(Andriller, 'TIME_ZONE', Andriller.TIME_ZONE)
+	monkeypatch.setattr(Andriller, 'TIME_FORMAT', Andriller.TIME_FORMAT)
+	yield Andriller.set_time_zone
+	Andriller.fmt_second.cache_clear()
+
+
+def test_norm_time_units():
+	assert Andriller.norm_time(1700000000.25) == T
+	assert Andriller.norm_time(1700000000250) == T
+	assert Andriller.norm_time('1700000000250000') == T
+	assert Andriller.norm_time(1700000000250000000) == pytest.approx(T)
+	assert Andriller.norm_time((1700000000.25 + Andriller.WEBKIT_EPOCH)*1e6) == T
+	assert Andriller.norm_time(0) == 0
+	assert Andriller.norm_time(None) == None and Andriller.norm_time('') == None
+
+
+# The unit ranges hold for 1973 to 2286
+def test_norm_time_bounds():
+	for t in (1.1e8, 9.9e9):
+		for value in (t, t*1e3, t*1e6, t*1e9, (t + Andriller.WEBKIT_EPOCH)*1e6):
+			assert Andriller.norm_time(value) == pytest.approx(t)
+	assert Andriller.norm_time(-1700000000250) == -T
+
+
+def test_norm_times():
+	assert Andriller.norm_times([1700000000250, None, '1700000000250', '']) == [T, None, T, None]
+	assert Andriller.norm_times([1700000000, 1700000060]) == [1700000000, 1700000060]
+	assert Andriller.norm_times([None, '']) == [None, None]
+	assert Andriller.norm_times([]) == []
+
+
+# A column mixing units is converted value by value
+def test_norm_times_mixed():
+	webkit = (1700000000.25 + Andriller.WEBKIT_EPOCH)*1e6
+	values = [1700000000.25, 1700000000250, None, 1700000000250000, 1700000000250000000, webkit]
+	assert Andriller.norm_times(values) == [T, T, None, T, pytest.approx(T), T]
+
+
+def test_time_zones(zone):
+	zone('UTC')
+	assert Andriller.fmt_time(T) == '2023-11-14 22:13:20 UTC'
+	zone('+02:00')
+	assert Andriller.fmt_time(T) == '2023-11-15 00:13:20 UTC+02:00'
+	zone('-0530')
+	assert Andriller.fmt_time(T) == '2023-11-14 16:43:20 UTC-05:30'
+	zone('Europe/Vilnius')
+	assert Andriller.fmt_time(T) == '2023-11-15 00:13:20 EET'
+	assert Andriller.fmt_time(T + 86400*200) == '2024-06-02 01:13:20 EEST'
+	zone('local')
+	assert Andriller.TIME_ZONE == None and Andriller.TIME_FORMAT == '%Y-%m-%d %H:%M:%S'
+	assert Andriller.fmt_time(None) == ''
+
+
+def test_unknown_zone(zone):
+	with pytest.raises(KeyError):
+		zone('Nowhere/Atlantis')